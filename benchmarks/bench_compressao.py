@@ -0,0 +1,67 @@
+# benchmarks/bench_compressao.py
+"""
+Bytes transferidos e CPU por requisição para cada codec de compressão
+(nucleo.compressao), sem cache e com as respostas já comprimidas no
+cache (cache_comprimido).
+
+Uso (com o banco migrado e produtos cadastrados, veja seed_produtos):
+    python benchmarks/bench_compressao.py --requisicoes 300
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+django.setup()
+
+from django.core.cache import cache
+from django.test import Client
+from django.test.utils import override_settings
+
+from nucleo.compressao import CODECS
+
+
+def medir(nome, codec, requisicoes, rota, cache_ttl):
+    cliente = Client(HTTP_HOST='localhost', HTTP_ACCEPT_ENCODING=codec)
+
+    with override_settings(COMPRESSAO_CACHE_TTL=cache_ttl):
+        cache.clear()
+        resposta = cliente.get(rota)  # aquecimento (e primeira entrada no cache)
+        tamanho = len(resposta.content)
+
+        cpu = time.process_time()
+        inicio = time.perf_counter()
+        for _ in range(requisicoes):
+            cliente.get(rota)
+        duracao = time.perf_counter() - inicio
+        cpu = time.process_time() - cpu
+
+    print(f'{nome:<22} {tamanho:>10} bytes '
+          f'{cpu / requisicoes * 1e3:>8.2f} ms CPU/req '
+          f'{requisicoes / duracao:>8.0f} req/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requisicoes', type=int, default=300)
+    parser.add_argument('--rota', default='/produtos/')
+    args = parser.parse_args()
+
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+    print(f'GET {args.rota} x {args.requisicoes}\n')
+    for cache_ttl, rotulo in ((0, 'sem cache'), (300, 'cache')):
+        print(f'--- {rotulo} ---')
+        for codec in ['identity', *CODECS]:
+            medir(codec, codec, args.requisicoes, args.rota, cache_ttl)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_indice.py
+"""
+Índice colunar de preço e marca (produtos.indice) com um catálogo
+sintético (sem acessar o banco): tamanho por produto, tempo de
+geração e de consulta por faixa de preço, com e sem marca.
+
+Uso:
+    python benchmarks/bench_indice.py --produtos 1000000 --consultas 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+django.setup()
+
+from produtos.indice import IndiceCatalogo, gravar
+
+
+def medir(nome, funcao, consultas):
+    aleatorio = random.Random(1)
+    resultados = 0
+    inicio = time.perf_counter()
+    for _ in range(consultas):
+        resultados += len(funcao(aleatorio))
+    duracao = (time.perf_counter() - inicio) / consultas
+    print(f'{nome:<32} {duracao * 1e6:>10.1f} µs/consulta {resultados / consultas:>10.0f} ids')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--produtos', type=int, default=1000000)
+    parser.add_argument('--marcas', type=int, default=200)
+    parser.add_argument('--consultas', type=int, default=1000)
+    args = parser.parse_args()
+
+    aleatorio = random.Random(0)
+    linhas = [
+        (aleatorio.randrange(100, 1000000), id_, f'Marca {aleatorio.randrange(args.marcas)}')
+        for id_ in range(1, args.produtos + 1)
+    ]
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = Path(diretorio) / 'produtos.idx'
+        inicio = time.perf_counter()
+        gravar(caminho, 1, linhas)
+        tamanho = caminho.stat().st_size
+        print(f'{args.produtos} produtos: {tamanho / args.produtos:.1f} bytes/produto, '
+              f'gerado em {time.perf_counter() - inicio:.2f} s\n')
+
+        indice = IndiceCatalogo(caminho)
+
+        def faixa_estreita(aleatorio):
+            minimo = aleatorio.randrange(100, 990000)
+            return indice.faixa(minimo, minimo + 1000)
+
+        def faixa_com_marca(aleatorio):
+            minimo = aleatorio.randrange(100, 900000)
+            return indice.faixa(minimo, minimo + 100000, f'marca {aleatorio.randrange(args.marcas)}')
+
+        medir('faixa de R$ 10', faixa_estreita, args.consultas)
+        medir('marca + faixa de R$ 1000', faixa_com_marca, args.consultas)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_json.py
+"""
+Vazão do JSONRenderer/JSONParser do DRF e dos equivalentes de
+nucleo.renderizacao com um payload de 10 mil produtos (em memória,
+sem acessar o banco).
+
+Uso:
+    python benchmarks/bench_json.py --produtos 10000 --repeticoes 5
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+django.setup()
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from nucleo.renderizacao import JSONRapidoParser, JSONRapidoRenderer, orjson
+from produtos.models import Produto
+from produtos.serializers import ProdutoSerializer
+
+
+def gerar_produtos(quantidade):
+    agora = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        Produto(
+            id=indice,
+            nome=f'Produto {indice}',
+            descricao='Descrição completa do produto com bastante texto repetido. ' * 3,
+            marca=f'Marca {indice % 20}',
+            preco=Decimal(indice % 5000) + Decimal('0.99'),
+            criado=agora + timedelta(seconds=indice),
+            atualizado=agora + timedelta(seconds=indice, microseconds=indice),
+            versao=indice,
+        )
+        for indice in range(1, quantidade + 1)
+    ]
+
+
+def medir(nome, funcao, repeticoes, tamanho):
+    funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    duracao = (time.perf_counter() - inicio) / repeticoes
+    print(f'{nome:<34} {duracao * 1e3:>9.1f} ms {tamanho / duracao / 1e6:>9.1f} MB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--produtos', type=int, default=10000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    produtos = gerar_produtos(args.produtos)
+    # como na listagem: dados do serializer (preço como texto, datas ISO)
+    serializados = {
+        'mensagem': f'Total de produtos: {len(produtos)}',
+        'total': len(produtos),
+        'produtos': ProdutoSerializer(produtos, many=True).data,
+    }
+    # valores crus (Decimal e datetime): passam pelo encoder
+    crus = {
+        'produtos': [
+            {
+                'id': p.id, 'nome': p.nome, 'descricao': p.descricao, 'marca': p.marca,
+                'preco': p.preco, 'criado': p.criado, 'atualizado': p.atualizado,
+            }
+            for p in produtos
+        ]
+    }
+
+    drf, rapido = JSONRenderer(), JSONRapidoRenderer()
+    assert drf.render(serializados) == rapido.render(serializados)
+    assert drf.render(crus) == rapido.render(crus)
+
+    print(f'{args.produtos} produtos, orjson: {"sim" if orjson else "não (biblioteca padrão)"}\n')
+    for rotulo, dados in (('serializados', serializados), ('Decimal/datetime', crus)):
+        conteudo = drf.render(dados)
+        medir(f'render DRF ({rotulo})', lambda: drf.render(dados), args.repeticoes, len(conteudo))
+        medir(f'render rápido ({rotulo})', lambda: rapido.render(dados), args.repeticoes, len(conteudo))
+
+    conteudo = drf.render(serializados)
+    medir('parse DRF', lambda: JSONParser().parse(io.BytesIO(conteudo)),
+          args.repeticoes, len(conteudo))
+    medir('parse rápido', lambda: JSONRapidoParser().parse(io.BytesIO(conteudo)),
+          args.repeticoes, len(conteudo))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_limites.py
+"""
+Custo do limite de requisições (nucleo.limites): por verificação, nos
+armazéns "memoria" (mmap compartilhado) e "cache" (cache do Django),
+e por requisição na API, com e sem as faixas de limite.
+
+Uso (com o banco migrado e populado):
+    python benchmarks/bench_limites.py --verificacoes 100000 --requisicoes 2000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+django.setup()
+
+from django.conf import settings
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from nucleo.limites import ArmazemCache, ArmazemMemoria
+
+
+def medir_armazem(nome, armazem_, verificacoes, chaves):
+    armazem_.limpar()
+    inicio = time.perf_counter()
+    for indice in range(verificacoes):
+        armazem_.verificar(f'anonimo:10.0.{indice % chaves}', 10**9, 60, time.time())
+    duracao = time.perf_counter() - inicio
+    print(f'{nome:<28} {duracao / verificacoes * 1e6:>8.2f} µs/verificação')
+
+
+def medir_requisicoes(nome, requisicoes):
+    cliente = APIClient(SERVER_NAME='localhost')
+    cliente.get('/produtos/')
+    inicio = time.perf_counter()
+    for _ in range(requisicoes):
+        cliente.get('/produtos/')
+    duracao = time.perf_counter() - inicio
+    print(f'{nome:<28} {duracao / requisicoes * 1e3:>8.3f} ms/requisição')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--verificacoes', type=int, default=100000)
+    parser.add_argument('--chaves', type=int, default=10000)
+    parser.add_argument('--requisicoes', type=int, default=2000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    medir_armazem('armazém memoria', ArmazemMemoria(settings.LIMITES_SLOTS),
+                  args.verificacoes, args.chaves)
+    medir_armazem('armazém cache', ArmazemCache(settings.LIMITES_CACHE),
+                  args.verificacoes, args.chaves)
+    print()
+
+    # taxas altas: mede o custo, sem recusar requisições
+    rest_framework = {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'anonimo': '1000000/s', 'usuario': '1000000/s', 'caro': '1000000/s'},
+    }
+    with override_settings(REST_FRAMEWORK=rest_framework):
+        medir_requisicoes('GET /produtos/ com limite', args.requisicoes)
+    sem_limite = dict.fromkeys(('anonimo', 'usuario', 'caro'))  # taxa None: faixa desligada
+    with override_settings(REST_FRAMEWORK={**rest_framework, 'DEFAULT_THROTTLE_RATES': sem_limite}):
+        medir_requisicoes('GET /produtos/ sem limite', args.requisicoes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_middleware.py
+"""
+Compara o custo por requisição da API com a pilha completa de
+middlewares (sessão, autenticação, mensagens e CSRF em todas as rotas)
+e com o perfil stateless (esses middlewares apenas em /admin/).
+
+A requisição envia um cookie de sessão, como faz um navegador que
+já acessou o admin, para mostrar os acessos à tabela django_session.
+
+Uso (com o banco migrado):
+    python benchmarks/bench_middleware.py --requisicoes 2000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+PILHA_COMPLETA = [
+    'django.middleware.security.SecurityMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+AUTENTICACAO_COM_SESSAO = (
+    'usuarios.authentication.CustomJWTAuthentication',
+    'rest_framework.authentication.SessionAuthentication',
+)
+
+
+def medir(nome, middleware, autenticacao, requisicoes, rota):
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_AUTHENTICATION_CLASSES': autenticacao}
+
+    with override_settings(MIDDLEWARE=middleware, REST_FRAMEWORK=rest_framework):
+        # o cookie vai em todas as requisições (o cliente descartaria
+        # o cookie inválido após a primeira resposta)
+        cliente = Client(HTTP_HOST='localhost', HTTP_COOKIE=f"{settings.SESSION_COOKIE_NAME}={'x' * 32}")
+
+        # aquecimento (carrega a cadeia de middlewares)
+        for _ in range(50):
+            cliente.get(rota)
+
+        with CaptureQueriesContext(connection) as consultas:
+            cliente.get(rota)
+        consultas_sessao = sum('django_session' in q['sql'] for q in consultas.captured_queries)
+
+        inicio = time.perf_counter()
+        for _ in range(requisicoes):
+            cliente.get(rota)
+        duracao = time.perf_counter() - inicio
+
+    print(f'{nome:<12} {duracao / requisicoes * 1e6:>10.1f} µs/req '
+          f'{requisicoes / duracao:>10.0f} req/s '
+          f'{consultas_sessao:>6} consulta(s) em django_session')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requisicoes', type=int, default=2000)
+    parser.add_argument('--rota', default='/produtos/estatisticas/')
+    args = parser.parse_args()
+
+    # respostas 4xx não devem poluir a saída
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+    print(f'GET {args.rota} x {args.requisicoes}\n')
+    medir('antes', PILHA_COMPLETA, AUTENTICACAO_COM_SESSAO, args.requisicoes, args.rota)
+    medir('stateless', settings.MIDDLEWARE,
+          settings.REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'],
+          args.requisicoes, args.rota)
+
+
+if __name__ == '__main__':
+    main()
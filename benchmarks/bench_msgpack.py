@@ -0,0 +1,64 @@
+# benchmarks/bench_msgpack.py
+"""
+Tamanho e tempo de codificação/decodificação de uma listagem de
+produtos em JSON (nucleo.renderizacao.JSONRapidoRenderer) e em
+MessagePack (MessagePackRenderer, com Decimal e datetime nativos).
+
+Uso:
+    python benchmarks/bench_msgpack.py --produtos 10000 --repeticoes 5
+"""
+import argparse
+import io
+import time
+from types import SimpleNamespace
+
+from bench_json import gerar_produtos  # também configura o Django
+
+from nucleo.renderizacao import (
+    JSONRapidoParser, JSONRapidoRenderer, MessagePackParser, MessagePackRenderer
+)
+from produtos.serializers import ProdutoSerializer
+
+
+def medir(funcao, repeticoes):
+    funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--produtos', type=int, default=10000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    produtos = gerar_produtos(args.produtos)
+    print(f'{args.produtos} produtos\n')
+    print(f"{'formato':<12} {'bytes':>10} {'serializer':>12} {'codificar':>12} {'decodificar':>12}")
+
+    for nome, renderer, parser_classe in (
+        ('json', JSONRapidoRenderer(), JSONRapidoParser),
+        ('msgpack', MessagePackRenderer(), MessagePackParser),
+    ):
+        # o serializer vê o renderer negociado, como em uma requisição
+        contexto = {'request': SimpleNamespace(accepted_renderer=renderer)}
+
+        def serializar():
+            return ProdutoSerializer(produtos, many=True, context=contexto).data
+
+        dados = {'total': len(produtos), 'produtos': serializar()}
+        conteudo = renderer.render(dados)
+
+        tempo_serializer = medir(serializar, args.repeticoes)
+        tempo_codificar = medir(lambda: renderer.render(dados), args.repeticoes)
+        tempo_decodificar = medir(
+            lambda: parser_classe().parse(io.BytesIO(conteudo)), args.repeticoes
+        )
+        print(f'{nome:<12} {len(conteudo):>10} {tempo_serializer * 1e3:>9.1f} ms '
+              f'{tempo_codificar * 1e3:>9.1f} ms {tempo_decodificar * 1e3:>9.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_servidor.py
+"""
+Compara vazão e memória por worker do gunicorn com os workers sync, gthread e uvicorn.
+
+Cada tipo de worker é iniciado com o gunicorn.conf.py do projeto,
+recebe a mesma carga (N clientes simultâneos com keep-alive) e, ao
+final, é medida a memória de cada worker: RSS (inclui as páginas
+compartilhadas com o mestre pelo preload) e PSS (divide as páginas
+compartilhadas entre os processos que as usam).
+
+Uso (Linux, com o banco migrado):
+    python benchmarks/bench_servidor.py --requisicoes 3000 --clientes 16
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+TIPOS = ['sync', 'gthread', 'uvicorn']
+
+
+def aguardar(porta, rota, limite=30):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=1)
+            conexao.request('GET', rota, headers={'Host': 'localhost'})
+            conexao.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'gunicorn não respondeu na porta {porta}')
+
+
+def filhos(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as arquivo:
+        return [int(p) for p in arquivo.read().split()]
+
+
+def memoria_mb(pid):
+    """
+    Retorna (rss, pss) do processo em MB
+    """
+    valores = {}
+    with open(f'/proc/{pid}/smaps_rollup') as arquivo:
+        for linha in arquivo:
+            partes = linha.split()
+            if partes[0] in ('Rss:', 'Pss:'):
+                valores[partes[0]] = int(partes[1]) / 1024
+    return valores['Rss:'], valores['Pss:']
+
+
+def cliente(porta, rota, quantidade):
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+    erros = 0
+    for _ in range(quantidade):
+        conexao.request('GET', rota, headers={'Host': 'localhost'})
+        resposta = conexao.getresponse()
+        resposta.read()
+        if resposta.status >= 500:
+            erros += 1
+        if resposta.will_close:
+            conexao.close()
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+    conexao.close()
+    return erros
+
+
+def medir(tipo, args):
+    ambiente = {
+        **os.environ,
+        'GUNICORN_WORKER_CLASS': tipo,
+        'GUNICORN_BIND': f'127.0.0.1:{args.porta}',
+        'GUNICORN_LOGLEVEL': 'warning',
+        # sem reciclagem durante a medição
+        'GUNICORN_MAX_REQUESTS': '0',
+    }
+    if args.workers:
+        ambiente['GUNICORN_WORKERS'] = str(args.workers)
+
+    servidor = subprocess.Popen(['gunicorn'], cwd=RAIZ, env=ambiente)
+    try:
+        aguardar(args.porta, args.rota)
+        por_cliente = args.requisicoes // args.clientes
+
+        # aquecimento
+        cliente(args.porta, args.rota, 20)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(args.clientes) as executor:
+            erros = sum(executor.map(
+                lambda _: cliente(args.porta, args.rota, por_cliente), range(args.clientes)
+            ))
+        duracao = time.perf_counter() - inicio
+
+        workers = filhos(servidor.pid)
+        memorias = [memoria_mb(pid) for pid in workers]
+        rss = sum(m[0] for m in memorias) / len(memorias)
+        pss = sum(m[1] for m in memorias) / len(memorias)
+        total = por_cliente * args.clientes
+
+        print(f'{tipo:<9} {len(workers):>3} worker(s) {total / duracao:>9.0f} req/s '
+              f'{rss:>8.1f} MB RSS {pss:>8.1f} MB PSS  {erros} erro(s) 5xx')
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requisicoes', type=int, default=3000)
+    parser.add_argument('--clientes', type=int, default=16)
+    parser.add_argument('--rota', default='/produtos/estatisticas/')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Fixa o número de workers (padrão: calculado pelo gunicorn.conf.py)')
+    parser.add_argument('--tipos', nargs='+', default=TIPOS, choices=TIPOS)
+    args = parser.parse_args()
+
+    if not sys.platform.startswith('linux'):
+        sys.exit('A medição de memória usa /proc (somente Linux)')
+
+    print(f'GET {args.rota} x {args.requisicoes}, {args.clientes} cliente(s)\n')
+    for tipo in args.tipos:
+        medir(tipo, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_snapshot.py
+"""
+Custo por requisição do catálogo completo: GET /produtos/ (ORM +
+serializer, com e sem o cache de respostas) e GET /produtos/snapshot/
+(arquivo pré-comprimido do produtos.snapshot).
+
+Uso (com o banco migrado e populado):
+    python benchmarks/bench_snapshot.py --requisicoes 500
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+django.setup()
+
+from django.core.cache import cache
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from produtos.models import Produto
+from produtos.snapshot import gerar_snapshot
+
+
+def medir(nome, url, requisicoes):
+    cliente = APIClient(SERVER_NAME='localhost')
+    cabecalhos = {'HTTP_ACCEPT_ENCODING': 'gzip'}
+    resposta = cliente.get(url, **cabecalhos)
+    tamanho = len(b''.join(resposta.streaming_content) if resposta.streaming else resposta.content)
+
+    inicio = time.process_time()
+    for _ in range(requisicoes):
+        resposta = cliente.get(url, **cabecalhos)
+        if resposta.streaming:
+            # como o servidor: lê o arquivo até o fim
+            b''.join(resposta.streaming_content)
+    duracao = (time.process_time() - inicio) / requisicoes
+    print(f'{nome:<30} {duracao * 1e3:>8.3f} ms de CPU/requisição {tamanho:>10} bytes')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requisicoes', type=int, default=500)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    inicio = time.perf_counter()
+    versao = gerar_snapshot()
+    print(f'{Produto.objects.count()} produtos, snapshot da versão {versao} '
+          f'({(time.perf_counter() - inicio) * 1e3:.0f} ms)\n')
+
+    with override_settings(COMPRESSAO_CACHE_TTL=0):
+        medir('GET /produtos/ (sem cache)', '/produtos/', args.requisicoes)
+    cache.clear()
+    medir('GET /produtos/ (cache)', '/produtos/', args.requisicoes)
+    medir('GET /produtos/snapshot/', '/produtos/snapshot/', args.requisicoes)
+
+
+if __name__ == '__main__':
+    main()
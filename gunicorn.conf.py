@@ -0,0 +1,147 @@
+# gunicorn.conf.py
+"""
+Configuração do gunicorn (carregada automaticamente quando o
+gunicorn é iniciado na raiz do projeto):
+
+    gunicorn
+    GUNICORN_WORKER_CLASS=sync gunicorn
+    GUNICORN_WORKER_CLASS=uvicorn gunicorn
+
+Todos os valores podem ser ajustados por variáveis de ambiente
+GUNICORN_*; os padrões são calculados a partir dos núcleos de CPU
+disponíveis e do limite de memória.
+"""
+import os
+
+# ============================================
+# Parâmetros (variáveis de ambiente)
+# ============================================
+# núcleos que o processo pode usar (respeita taskset/cpuset do container)
+try:
+    NUCLEOS = len(os.sched_getaffinity(0))
+except AttributeError:
+    NUCLEOS = os.cpu_count() or 1
+
+# sync | gthread | uvicorn
+TIPO_WORKER = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# memória residente máxima de um worker; acima disso o worker é
+# reciclado depois de terminar a requisição atual
+RSS_MAXIMO_MB = int(os.environ.get('GUNICORN_RSS_MAXIMO_MB', 256))
+
+# memória total disponível para os workers (0 = sem limite)
+MEMORIA_TOTAL_MB = int(os.environ.get('GUNICORN_MEMORIA_TOTAL_MB', 0))
+
+
+def calcular_workers():
+    """
+    sync: um processo por requisição simultânea, então 2 * núcleos + 1
+    (enquanto um worker espera o banco, outro usa a CPU).
+    gthread/uvicorn: as threads/event loop cobrem a espera de I/O,
+    então um processo por núcleo (+1).
+    O total é limitado pela memória: MEMORIA_TOTAL_MB / RSS_MAXIMO_MB
+    """
+    if TIPO_WORKER == 'sync':
+        workers = 2 * NUCLEOS + 1
+    else:
+        workers = NUCLEOS + 1
+
+    if MEMORIA_TOTAL_MB:
+        workers = min(workers, max(1, MEMORIA_TOTAL_MB // RSS_MAXIMO_MB))
+    return workers
+
+
+# ============================================
+# Servidor
+# ============================================
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+worker_class = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    # pacote uvicorn-worker (o uvicorn.workers do uvicorn está obsoleto)
+    'uvicorn': 'uvicorn_worker.UvicornWorker',
+}[TIPO_WORKER]
+
+# o worker do uvicorn precisa da aplicação ASGI
+wsgi_app = 'setup.asgi:application' if TIPO_WORKER == 'uvicorn' else 'setup.wsgi:application'
+
+workers = int(os.environ.get('GUNICORN_WORKERS', calcular_workers()))
+# gthread: metade das threads executa (limite do nucleo.admissao) e a
+# outra metade espera na fila do middleware, onde pode receber 503; com
+# poucas threads a fila ficaria no pool do gunicorn, que não recusa nada
+threads = int(os.environ.get('GUNICORN_THREADS', 32 if TIPO_WORKER == 'gthread' else 1))
+
+# carrega a aplicação no processo mestre antes do fork: o código e os
+# objetos criados na importação ficam compartilhados entre os workers
+# (copy-on-write) e um erro de importação impede o servidor de subir
+preload_app = True
+
+# recicla o worker depois de N requisições (limita vazamentos de
+# memória). O jitter espalha as reciclagens, para os workers não
+# reiniciarem todos ao mesmo tempo
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+# ============================================
+# Hooks
+# ============================================
+def rss_atual_mb():
+    """
+    Memória residente do processo atual (Linux); None se indisponível
+    """
+    try:
+        with open('/proc/self/statm') as arquivo:
+            paginas = int(arquivo.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def when_ready(server):
+    # com preload_app, nenhuma conexão aberta no mestre pode ser
+    # herdada pelos workers (o socket seria compartilhado)
+    from django.db import connections
+    connections.close_all()
+
+    # memória do limite de requisições criada antes do fork:
+    # herdada e compartilhada por todos os workers
+    from nucleo.limites import armazem
+    armazem()
+
+    server.log.info(
+        'Workers: %s x %s (%d thread(s)), %d núcleo(s), max_requests=%d (+%d)',
+        workers, worker_class, threads, NUCLEOS, max_requests, max_requests_jitter
+    )
+
+
+def post_fork(server, worker):
+    if TIPO_WORKER == 'gthread':
+        from nucleo.admissao import configurar_threads
+        configurar_threads(threads)
+
+    from nucleo.aquecimento import aquecer
+    aquecer()
+
+
+def post_request(worker, req, environ, resp):
+    """
+    Recicla o worker (de forma graciosa) se passar do teto de memória.
+    Não é chamado pelo worker do uvicorn: nesse caso vale apenas o
+    max_requests
+    """
+    rss = rss_atual_mb()
+    if rss is not None and rss > RSS_MAXIMO_MB:
+        worker.log.warning(
+            'Worker %s com %.0f MB (máximo %d MB): reciclando', worker.pid, rss, RSS_MAXIMO_MB
+        )
+        worker.alive = False
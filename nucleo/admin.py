@@ -0,0 +1,20 @@
+# nucleo/admin.py
+from django.contrib import admin
+from .models import RespostaCompartilhada, RespostaIdempotente
+
+@admin.register(RespostaIdempotente)
+class RespostaIdempotenteAdmin(admin.ModelAdmin):
+    list_display = ('chave', 'cliente', 'status', 'status_http', 'criado', 'expira')
+    list_filter = ('status', 'status_http')
+    search_fields = ('chave', 'cliente')
+    readonly_fields = ('chave', 'cliente', 'hash_requisicao', 'status', 'status_http',
+                       'cabecalhos', 'criado', 'expira')
+    exclude = ('corpo',)
+
+
+@admin.register(RespostaCompartilhada)
+class RespostaCompartilhadaAdmin(admin.ModelAdmin):
+    list_display = ('chave', 'versao', 'calculada_em', 'trava_ate')
+    search_fields = ('chave',)
+    readonly_fields = ('chave', 'versao', 'cabecalhos', 'calculada_em', 'trava_ate')
+    exclude = ('corpo',)
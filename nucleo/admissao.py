@@ -0,0 +1,356 @@
+# nucleo/admissao.py
+"""
+Controle de admissão por worker: sob sobrecarga, recusa na hora
+(503 com Retry-After) o que não vai ser atendido a tempo, em vez de
+deixar todas as requisições lentas até os clientes desistirem.
+
+- No máximo `limite` requisições executam ao mesmo tempo no worker;
+  as demais esperam em uma fila limitada (ADMISSAO_FILA_MAXIMA) por
+  até ADMISSAO_ESPERA_MAXIMA segundos
+- A fila é atendida por prioridade: leituras de produtos e requisições
+  autenticadas primeiro, varreduras anônimas da listagem de usuários
+  por último. Com a fila cheia, quem chega com prioridade maior
+  desloca o último da classe menos prioritária
+- O limite se ajusta pela latência observada (AIMD): cresce 1 a cada
+  "ida e volta" enquanto as requisições terminam abaixo de
+  ADMISSAO_LATENCIA_ALVO com o worker saturado, e cai pelo
+  ADMISSAO_FATOR_REDUCAO (no máximo uma vez por ida e volta) quando
+  passam do alvo
+
+Com o worker do uvicorn a fila fica aqui (o middleware é assíncrono e
+a espera não ocupa threads). Com gthread, a fila também precisa estar
+aqui e não no pool de threads do gunicorn, que não recusa nada: o
+gunicorn.conf.py sobe mais threads (GUNICORN_THREADS) e informa o
+total no post_fork (configurar_threads); o limite fica em no máximo
+metade delas e as demais esperam na fila do middleware, com prazo.
+Com sync (uma requisição por processo) o controle não tem efeito
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+ALTA, NORMAL, BAIXA = range(3)
+
+
+def token_valido(request):
+    """
+    Se a requisição traz um access token JWT válido (assinatura e
+    validade, sem acessar o banco: a view autentica de novo)
+    """
+    tipo, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if tipo.lower() != 'bearer' or not token:
+        return False
+
+    # import tardio, como no nucleo.idempotencia
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.tokens import AccessToken
+    try:
+        AccessToken(token)
+    except TokenError:
+        return False
+    return True
+
+
+def prioridade(request):
+    """
+    Classe da requisição. Autenticada = com um access token válido (um
+    cabeçalho Authorization qualquer não passa à frente da fila)
+    """
+    leitura = request.method in ('GET', 'HEAD')
+    if (leitura and request.path.startswith('/produtos/')) or token_valido(request):
+        return ALTA
+    if leitura and request.path.startswith('/usuarios/'):
+        return BAIXA
+    return NORMAL
+
+
+class Espera:
+    """
+    Uma requisição na fila (thread bloqueada até ser chamada)
+    """
+
+    def __init__(self, prioridade_):
+        self.prioridade = prioridade_
+        self.admitida = False
+        self.evento = threading.Event()
+
+    def sinalizar(self):
+        self.evento.set()
+
+    def aguardar(self, segundos):
+        self.evento.wait(segundos)
+
+
+class EsperaAsync(Espera):
+    """
+    Uma requisição na fila do event loop (não ocupa thread)
+    """
+
+    def __init__(self, prioridade_):
+        super().__init__(prioridade_)
+        self.loop = asyncio.get_running_loop()
+        self.futuro = self.loop.create_future()
+
+    def sinalizar(self):
+        # pode ser chamada de outra thread (fim de uma view síncrona)
+        self.loop.call_soon_threadsafe(self._concluir)
+
+    def _concluir(self):
+        if not self.futuro.done():
+            self.futuro.set_result(None)
+
+    async def aguardar(self, segundos):
+        try:
+            await asyncio.wait_for(self.futuro, segundos)
+        except asyncio.TimeoutError:
+            pass
+
+
+class Controlador:
+    """
+    Limite de concorrência e fila do worker. Com `threads` (gthread),
+    o limite fica em no máximo metade das threads: a outra metade é a
+    fila, onde as requisições podem ser recusadas
+    """
+
+    def __init__(self, threads=None):
+        self.mutex = threading.Lock()
+        self.maximo = settings.ADMISSAO_LIMITE_MAXIMO
+        if threads is not None:
+            self.maximo = max(1, min(self.maximo, threads // 2))
+        self.limite = float(min(settings.ADMISSAO_LIMITE_INICIAL, self.maximo))
+        self.em_execucao = 0
+        self.filas = [deque() for _ in (ALTA, NORMAL, BAIXA)]
+        self.latencia = settings.ADMISSAO_LATENCIA_ALVO / 2  # média móvel, segundos
+        self.proxima_reducao = 0.0
+
+    def na_fila(self):
+        return sum(len(fila) for fila in self.filas)
+
+    def entrar(self, espera):
+        """
+        Admite ou enfileira a requisição. Retorna False se ela foi
+        recusada (fila cheia de requisições com a mesma prioridade ou maior)
+        """
+        with self.mutex:
+            if self.na_fila() >= settings.ADMISSAO_FILA_MAXIMA:
+                for fila in reversed(self.filas[espera.prioridade + 1:]):
+                    if fila:
+                        # desloca a mais recente da classe menos prioritária
+                        fila.pop().sinalizar()
+                        break
+                else:
+                    return False
+            self.filas[espera.prioridade].append(espera)
+            self._chamar()
+            return True
+
+    def desistir(self, espera):
+        """
+        Fim da espera (prazo esgotado ou sinal recebido). Retorna True
+        se a requisição não foi admitida e deve ser recusada
+        """
+        with self.mutex:
+            if espera.admitida:
+                return False
+            fila = self.filas[espera.prioridade]
+            if espera in fila:
+                fila.remove(espera)
+            return True
+
+    def sair(self, duracao):
+        with self.mutex:
+            self.em_execucao -= 1
+            self._ajustar(duracao)
+            self._chamar()
+
+    def _chamar(self):
+        while self.em_execucao < int(self.limite):
+            fila = next((fila for fila in self.filas if fila), None)
+            if fila is None:
+                break
+            espera = fila.popleft()
+            espera.admitida = True
+            self.em_execucao += 1
+            espera.sinalizar()
+
+    def _ajustar(self, duracao):
+        agora = time.monotonic()
+        self.latencia += 0.2 * (duracao - self.latencia)
+
+        if duracao > settings.ADMISSAO_LATENCIA_ALVO:
+            # as requisições que já estavam em execução terminam lentas
+            # também: uma redução só vale para as que entrarem depois dela
+            if agora >= self.proxima_reducao:
+                self.limite = max(
+                    min(settings.ADMISSAO_LIMITE_MINIMO, self.maximo),
+                    self.limite * settings.ADMISSAO_FATOR_REDUCAO
+                )
+                self.proxima_reducao = agora + duracao
+        elif self.em_execucao + 1 >= int(self.limite) or self.na_fila():
+            # rápido e saturado: +1 a cada `limite` requisições concluídas
+            self.limite = min(self.maximo, self.limite + 1 / self.limite)
+
+    def retry_after(self):
+        """
+        Segundos até a fila atual ser atendida, pela latência média
+        """
+        with self.mutex:
+            estimativa = self.latencia * (self.na_fila() + 1) / int(self.limite)
+        return min(max(math.ceil(estimativa), 1), 30)
+
+
+_controlador = None
+_mutex = threading.Lock()
+# threads do worker gthread (configurar_threads); None = sem limite
+_threads = None
+
+
+def configurar_threads(threads):
+    """
+    Informa o número de threads do worker (gthread). Chamado no
+    post_fork do gunicorn, antes da primeira requisição
+    """
+    global _threads, _controlador
+    with _mutex:
+        _threads = threads
+        _controlador = None
+
+
+def controlador():
+    """
+    Controlador do worker (criado no primeiro uso, depois do fork)
+    """
+    global _controlador
+    if _controlador is None:
+        with _mutex:
+            if _controlador is None:
+                _controlador = Controlador(_threads)
+    return _controlador
+
+
+def recusar(controlador_):
+    resposta = JsonResponse(
+        {'erro': 'Servidor sobrecarregado. Tente novamente em instantes'},
+        status=503, json_dumps_params={'ensure_ascii': False}
+    )
+    resposta['Retry-After'] = str(controlador_.retry_after())
+    # sem um "Service Unavailable" no log por recusa: sob sobrecarga,
+    # o log viraria mais uma fonte de carga
+    resposta._has_been_logged = True
+    return resposta
+
+
+def liberar_ao_fim(resposta, controlador_, duracao):
+    """
+    Libera a vaga da requisição no worker: na hora ou, para uma
+    resposta streaming, quando o envio termina ou a conexão é fechada
+    (o worker continua ocupado até lá). A duração do AIMD é a da view,
+    sem o tempo de envio, que depende do cliente
+    """
+    if not resposta.streaming:
+        controlador_.sair(duracao)
+        return resposta
+
+    pendente = [duracao]
+
+    def liberar():
+        # fim do stream e close() da resposta: sai uma única vez
+        try:
+            duracao_ = pendente.pop()
+        except IndexError:
+            return
+        controlador_.sair(duracao_)
+
+    if resposta.is_async:
+        resposta.streaming_content = liberar_stream_async(resposta.streaming_content, liberar)
+    else:
+        resposta.streaming_content = liberar_stream(resposta.streaming_content, liberar)
+    resposta._resource_closers.append(liberar)
+    return resposta
+
+
+def liberar_stream(partes, liberar):
+    try:
+        yield from partes
+    finally:
+        liberar()
+
+
+async def liberar_stream_async(partes, liberar):
+    try:
+        async for parte in partes:
+            yield parte
+    finally:
+        liberar()
+
+
+def isenta(request):
+    return not settings.ADMISSAO_ATIVA or request.path.startswith(
+        tuple(settings.ADMISSAO_ROTAS_ISENTAS)
+    )
+
+
+class AdmissaoMiddleware:
+    """
+    Aplica o Controlador do worker. Deve ser o primeiro middleware:
+    uma requisição recusada não passa por mais nada
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if isenta(request):
+            return self.get_response(request)
+
+        controlador_ = controlador()
+        espera = Espera(prioridade(request))
+        if not controlador_.entrar(espera):
+            return recusar(controlador_)
+        if not espera.admitida:
+            espera.aguardar(settings.ADMISSAO_ESPERA_MAXIMA)
+            if controlador_.desistir(espera):
+                return recusar(controlador_)
+
+        inicio = time.monotonic()
+        try:
+            resposta = self.get_response(request)
+        except BaseException:
+            controlador_.sair(time.monotonic() - inicio)
+            raise
+        return liberar_ao_fim(resposta, controlador_, time.monotonic() - inicio)
+
+    async def __acall__(self, request):
+        if isenta(request):
+            return await self.get_response(request)
+
+        controlador_ = controlador()
+        espera = EsperaAsync(prioridade(request))
+        if not controlador_.entrar(espera):
+            return recusar(controlador_)
+        if not espera.admitida:
+            await espera.aguardar(settings.ADMISSAO_ESPERA_MAXIMA)
+            if controlador_.desistir(espera):
+                return recusar(controlador_)
+
+        inicio = time.monotonic()
+        try:
+            resposta = await self.get_response(request)
+        except BaseException:
+            controlador_.sair(time.monotonic() - inicio)
+            raise
+        return liberar_ao_fim(resposta, controlador_, time.monotonic() - inicio)
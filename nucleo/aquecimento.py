@@ -0,0 +1,57 @@
+# nucleo/aquecimento.py
+import logging
+import time
+
+from django.conf import settings
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def aquecer_urls():
+    """
+    Monta as tabelas do resolver de URLs (feito de forma preguiçosa
+    na primeira requisição de cada processo)
+    """
+    get_resolver()._populate()
+
+
+def aquecer_serializers():
+    """
+    Constrói os campos dos serializers de modelo, o que percorre
+    model._meta e cria os campos a partir do modelo
+    """
+    from produtos.serializers import ProdutoSerializer
+    from usuarios.serializers import CadastroSerializer, UsuarioSerializer
+
+    for classe in (ProdutoSerializer, CadastroSerializer, UsuarioSerializer):
+        classe().fields
+
+
+def aquecer_indice():
+    """
+    Mapeia o índice colunar do catálogo (produtos.indice), que cada
+    processo guarda em memória, se o arquivo já existe
+    """
+    from produtos import indice
+
+    with indice._mutex:
+        indice.carregar(indice.caminho_indice())
+
+
+def aquecer():
+    """
+    Executa as funções de aquecimento configuradas em settings.AQUECIMENTO.
+    Chamado no post_fork do gunicorn: cada worker chega aquecido
+    à primeira requisição. Uma falha é registrada no log e não
+    impede o worker de subir
+    """
+    for caminho in settings.AQUECIMENTO:
+        inicio = time.perf_counter()
+        try:
+            import_string(caminho)()
+        except Exception:
+            logger.exception('Falha no aquecimento: %s', caminho)
+            continue
+        logger.info('Aquecimento %s: %.1f ms', caminho, (time.perf_counter() - inicio) * 1000)
@@ -0,0 +1,182 @@
+# nucleo/coalescencia.py
+"""
+Single-flight para leituras caras (usado pelo cache_comprimido com
+coalescer=True): requisições iguais e simultâneas esperam por um único
+cálculo em vez de irem todas ao banco quando o cache expira.
+
+- No mesmo worker, a primeira thread calcula e as demais esperam
+  pelo resultado dela (threading.Event)
+- Entre workers (só com entre_workers=True), a trava é a linha de
+  RespostaCompartilhada (trava_ate): quem consegue travar calcula e
+  grava a resposta na própria linha; os outros workers consultam a
+  linha até a resposta da versão atual aparecer (como no
+  nucleo.idempotencia). Cada chave é uma linha no banco: só para um
+  conjunto limitado de chaves (ex.: estatisticas), nunca para chaves
+  com texto livre do cliente (ex.: a busca)
+- Com COALESCENCIA_SWR, enquanto alguém recalcula, quem chega recebe
+  na hora a última resposta calculada (de uma versão anterior) em vez
+  de esperar
+
+Se a espera passar de COALESCENCIA_ESPERA segundos (ou quem calculava
+falhar), a requisição calcula por conta própria
+"""
+import hashlib
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponseBase
+from django.utils import timezone
+
+from nucleo.models import RespostaCompartilhada
+
+logger = logging.getLogger(__name__)
+
+
+class Voo:
+    """
+    Um cálculo em andamento neste worker
+    """
+
+    def __init__(self):
+        self.concluido = threading.Event()
+        self.resultado = None
+        self.desatualizado = False
+
+
+_voos = {}
+_mutex = threading.Lock()
+
+# última resposta de cada chave neste worker: {chave: (versao, resultado)},
+# no máximo COALESCENCIA_MAXIMO_ANTERIORES (as mais antigas saem)
+_anteriores = {}
+
+
+def guardar_anterior(chave, versao, resultado):
+    with _mutex:
+        _anteriores.pop(chave, None)
+        _anteriores[chave] = (versao, resultado)
+        while len(_anteriores) > settings.COALESCENCIA_MAXIMO_ANTERIORES:
+            del _anteriores[next(iter(_anteriores))]
+
+
+def executar(chave, versao, calcular, entre_workers=False):
+    """
+    Resultado de `calcular()` para a chave na versão dos dados
+    informada, calculado uma única vez entre as requisições
+    simultâneas deste worker (e dos demais, com entre_workers).
+    `calcular` retorna (corpo, cabecalhos) ou, quando a resposta não
+    pode ser compartilhada (ex.: erro), um HttpResponse.
+
+    Retorna (resultado, desatualizado): desatualizado=True quando é a
+    resposta de uma versão anterior (stale-while-revalidate)
+    """
+    chave = hashlib.sha256(chave.encode()).hexdigest()
+
+    with _mutex:
+        voo = _voos.get((chave, versao))
+        lider = voo is None
+        if lider:
+            voo = _voos[(chave, versao)] = Voo()
+
+    if not lider:
+        anterior = _anteriores.get(chave)
+        if settings.COALESCENCIA_SWR and anterior is not None:
+            return anterior[1], anterior[0] < versao
+        if voo.concluido.wait(settings.COALESCENCIA_ESPERA) and voo.resultado is not None:
+            return voo.resultado, voo.desatualizado
+        return calcular(), False
+
+    try:
+        if entre_workers:
+            resultado, desatualizado = executar_entre_workers(chave, versao, calcular)
+        else:
+            resultado, desatualizado = calcular(), False
+        # um HttpResponse (resposta que não pode ser compartilhada)
+        # fica só com quem calculou: quem espera calcula a sua
+        if not isinstance(resultado, HttpResponseBase):
+            voo.resultado, voo.desatualizado = resultado, desatualizado
+            if not desatualizado:
+                guardar_anterior(chave, versao, resultado)
+        return resultado, desatualizado
+    finally:
+        voo.concluido.set()
+        with _mutex:
+            _voos.pop((chave, versao), None)
+
+
+def executar_entre_workers(chave, versao, calcular):
+    limite = time.monotonic() + settings.COALESCENCIA_ESPERA
+    espera = 0.025
+
+    while True:
+        registro = RespostaCompartilhada.objects.filter(chave=chave).first()
+        if registro and registro.versao >= versao and registro.corpo is not None:
+            # calculada por outro worker
+            return (bytes(registro.corpo), registro.cabecalhos), False
+
+        if travar(chave, registro):
+            return calcular_e_gravar(chave, versao, calcular), False
+
+        # outro worker está calculando
+        if settings.COALESCENCIA_SWR and registro and registro.corpo is not None:
+            return (bytes(registro.corpo), registro.cabecalhos), True
+
+        if time.monotonic() >= limite:
+            logger.warning('Espera pelo cálculo de %s esgotada: calculando aqui', chave[:12])
+            return calcular(), False
+        time.sleep(espera)
+        espera = min(espera * 2, 0.5)
+
+
+def travar(chave, registro):
+    """
+    Marca a linha da chave como "calculando" por COALESCENCIA_TRAVA
+    segundos. Retorna False se outro worker já tem a trava
+    """
+    agora = timezone.now()
+    trava_ate = agora + timedelta(seconds=settings.COALESCENCIA_TRAVA)
+
+    if registro is None:
+        try:
+            with transaction.atomic():
+                RespostaCompartilhada.objects.create(chave=chave, trava_ate=trava_ate)
+            return True
+        except IntegrityError:
+            return False
+
+    # trava vencida: o worker que calculava morreu
+    return bool(
+        RespostaCompartilhada.objects
+        .filter(chave=chave)
+        .filter(Q(trava_ate__isnull=True) | Q(trava_ate__lte=agora))
+        .update(trava_ate=trava_ate)
+    )
+
+
+def calcular_e_gravar(chave, versao, calcular):
+    try:
+        resultado = calcular()
+    except BaseException:
+        RespostaCompartilhada.objects.filter(chave=chave).update(trava_ate=None)
+        raise
+
+    if isinstance(resultado, HttpResponseBase):
+        RespostaCompartilhada.objects.filter(chave=chave).update(trava_ate=None)
+        return resultado
+
+    corpo, cabecalhos = resultado
+    # com a trava vencida, outro worker pode ter gravado uma versão
+    # mais nova nesse meio tempo: não volta para a anterior
+    RespostaCompartilhada.objects.filter(chave=chave, versao__lte=versao).update(
+        versao=versao,
+        corpo=corpo,
+        cabecalhos=cabecalhos,
+        calculada_em=timezone.now(),
+        trava_ate=None
+    )
+    return resultado
@@ -0,0 +1,338 @@
+# nucleo/compressao.py
+"""
+Compressão das respostas negociada pelo Accept-Encoding.
+
+gzip usa a biblioteca padrão; brotli (pacote "brotli") e zstd
+(compression.zstd do Python 3.14 ou o pacote "zstandard") entram
+quando estão instalados. Entre os aceitos pelo cliente, vence o
+primeiro de COMPRESSAO_CODECS.
+
+O cache_comprimido guarda respostas de leitura já comprimidas: um
+acerto no cache devolve os bytes prontos, sem custo de compressão
+"""
+import functools
+import gzip
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseBase
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from nucleo import coalescencia
+
+re_aceitos = _lazy_re_compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+TIPOS_COMPRIMIVEIS = (
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'application/msgpack',
+    'text/',
+)
+
+
+class Gzip:
+    nome = 'gzip'
+
+    def comprimir(self, dados):
+        return gzip.compress(dados, compresslevel=settings.COMPRESSAO_NIVEL_GZIP, mtime=0)
+
+    def compressor(self):
+        return CompressorZlib(zlib.compressobj(settings.COMPRESSAO_NIVEL_GZIP, zlib.DEFLATED, 31))
+
+
+class CompressorZlib:
+    def __init__(self, compressor):
+        self.compressor = compressor
+
+    def comprimir(self, parte):
+        # flush em cada parte: o cliente recebe o que já foi gerado
+        # (eventos SSE não ficam presos no buffer do compressor)
+        return self.compressor.compress(parte) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self):
+        return self.compressor.flush()
+
+
+class Brotli:
+    nome = 'br'
+
+    def __init__(self, brotli):
+        self.brotli = brotli
+
+    def comprimir(self, dados):
+        return self.brotli.compress(dados, quality=settings.COMPRESSAO_NIVEL_BROTLI)
+
+    def compressor(self):
+        return CompressorBrotli(self.brotli.Compressor(quality=settings.COMPRESSAO_NIVEL_BROTLI))
+
+
+class CompressorBrotli:
+    def __init__(self, compressor):
+        self.compressor = compressor
+
+    def comprimir(self, parte):
+        return self.compressor.process(parte) + self.compressor.flush()
+
+    def finalizar(self):
+        return self.compressor.finish()
+
+
+class Zstd:
+    nome = 'zstd'
+
+    def __init__(self, zstd):
+        self.zstd = zstd
+
+    def comprimir(self, dados):
+        return self.zstd.compress(dados, settings.COMPRESSAO_NIVEL_ZSTD)
+
+    def compressor(self):
+        if hasattr(self.zstd, 'ZstdCompressor') and hasattr(self.zstd, 'FLUSH_BLOCK'):
+            # compression.zstd (biblioteca padrão do Python 3.14)
+            return CompressorZstd(
+                self.zstd.ZstdCompressor(level=settings.COMPRESSAO_NIVEL_ZSTD),
+                self.zstd.ZstdCompressor.FLUSH_BLOCK
+            )
+        compressor = self.zstd.ZstdCompressor(level=settings.COMPRESSAO_NIVEL_ZSTD).compressobj()
+        return CompressorZstd(compressor, self.zstd.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+class CompressorZstd:
+    def __init__(self, compressor, modo_flush):
+        self.compressor = compressor
+        self.modo_flush = modo_flush
+
+    def comprimir(self, parte):
+        return self.compressor.compress(parte) + self.compressor.flush(self.modo_flush)
+
+    def finalizar(self):
+        return self.compressor.flush()
+
+
+def carregar_codecs():
+    """
+    Codecs disponíveis neste ambiente, por nome
+    """
+    codecs = {'gzip': Gzip()}
+    try:
+        import brotli
+        codecs['br'] = Brotli(brotli)
+    except ImportError:
+        pass
+    try:
+        from compression import zstd
+        codecs['zstd'] = Zstd(zstd)
+    except ImportError:
+        try:
+            import zstandard
+            codecs['zstd'] = Zstd(zstandard)
+        except ImportError:
+            pass
+    return codecs
+
+
+CODECS = carregar_codecs()
+
+
+def negociar(request):
+    """
+    Codec a usar para o Accept-Encoding da requisição, ou None
+    """
+    cabecalho = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if not cabecalho:
+        return None
+
+    aceitos = {}
+    for nome, q in re_aceitos.findall(cabecalho.lower()):
+        try:
+            aceitos[nome] = float(q) if q else 1.0
+        except ValueError:
+            aceitos[nome] = 0.0
+
+    melhor, melhor_q = None, 0.0
+    for nome in settings.COMPRESSAO_CODECS:
+        if nome not in CODECS:
+            continue
+        q = aceitos.get(nome, aceitos.get('*', 0.0))
+        # empate: vale a ordem de preferência do servidor
+        if q > melhor_q:
+            melhor, melhor_q = CODECS[nome], q
+    return melhor
+
+
+def comprimivel(resposta):
+    tipo = resposta.get('Content-Type', '').split(';')[0].strip().lower()
+    return tipo.startswith(TIPOS_COMPRIMIVEIS)
+
+
+def marcar_comprimida(resposta, codec):
+    resposta['Content-Encoding'] = codec.nome
+    # o ETag do corpo original não vale byte a byte para o comprimido
+    etag = resposta.get('ETag')
+    if etag and etag.startswith('"'):
+        resposta['ETag'] = 'W/' + etag
+
+
+class CompressaoMiddleware:
+    """
+    Comprime as respostas com o codec negociado.
+
+    Não comprime respostas menores que COMPRESSAO_TAMANHO_MINIMO
+    bytes, já codificadas ou de tipos que não ganham com compressão
+    (imagens, arquivos). Respostas em streaming (síncronas ou
+    assíncronas) são comprimidas parte a parte.
+    As rotas com sessão (ROTAS_COM_SESSAO) ficam de fora: páginas com
+    token CSRF comprimidas são expostas ao ataque BREACH
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        resposta = self.get_response(request)
+
+        patch_vary_headers(resposta, ('Accept-Encoding',))
+        if (
+            resposta.has_header('Content-Encoding')
+            or resposta.status_code < 200
+            or resposta.status_code in (204, 206, 304)
+            or request.path.startswith(tuple(settings.ROTAS_COM_SESSAO))
+            or not comprimivel(resposta)
+        ):
+            return resposta
+
+        codec = negociar(request)
+        if codec is None:
+            return resposta
+
+        if resposta.streaming:
+            if resposta.is_async:
+                resposta.streaming_content = comprimir_stream_async(
+                    codec.compressor(), resposta.streaming_content
+                )
+            else:
+                resposta.streaming_content = comprimir_stream(
+                    codec.compressor(), resposta.streaming_content
+                )
+            del resposta['Content-Length']
+        else:
+            if len(resposta.content) < settings.COMPRESSAO_TAMANHO_MINIMO:
+                return resposta
+            comprimido = codec.comprimir(resposta.content)
+            if len(comprimido) >= len(resposta.content):
+                return resposta
+            resposta.content = comprimido
+            resposta['Content-Length'] = str(len(comprimido))
+
+        marcar_comprimida(resposta, codec)
+        return resposta
+
+
+def comprimir_stream(compressor, partes):
+    for parte in partes:
+        saida = compressor.comprimir(parte)
+        if saida:
+            yield saida
+    yield compressor.finalizar()
+
+
+async def comprimir_stream_async(compressor, partes):
+    async for parte in partes:
+        saida = compressor.comprimir(parte)
+        if saida:
+            yield saida
+    yield compressor.finalizar()
+
+
+def cache_comprimido(versao, coalescer=False, entre_workers=False):
+    """
+    Decorator para ações de leitura de um ViewSet. A resposta 200 é
+    renderizada, comprimida com o codec negociado e guardada no cache
+    com a chave: versão dos dados + formato (Accept) + codec + URL.
+
+    `versao` é uma função sem argumentos que retorna a versão atual
+    dos dados: quando eles mudam, a chave muda e as entradas antigas
+    expiram sozinhas (COMPRESSAO_CACHE_TTL).
+
+    Com `coalescer`, requisições iguais e simultâneas que não acham a
+    resposta no cache fazem um único cálculo entre todos os workers,
+    e podem receber a resposta da versão anterior enquanto ele roda
+    (veja nucleo.coalescencia; cabeçalho Cache-Status com detail=stale).
+    O cálculo é único por worker; com `entre_workers`, também entre os
+    workers, e a chave deixa de lado a query string: só para ações
+    que não dependem dela (uma linha no banco por chave)
+
+    A ação executa depois da autenticação e das permissões, que
+    continuam valendo para as respostas do cache
+    """
+    def decorator(acao):
+        @functools.wraps(acao)
+        def envoltorio(self, request, *args, **kwargs):
+            if request.method != 'GET' or not settings.COMPRESSAO_CACHE_TTL:
+                return acao(self, request, *args, **kwargs)
+
+            codec = negociar(request)
+            versao_dados = versao()
+            base = '{}:{}:{}'.format(
+                request.accepted_media_type,
+                codec.nome if codec else 'identity',
+                hashlib.md5(
+                    (request.path if entre_workers else request.get_full_path()).encode()
+                ).hexdigest()
+            )
+            chave = f'resposta:{versao_dados}:{base}'
+
+            guardada = cache.get(chave)
+            if guardada is not None:
+                return montar_resposta(*guardada)
+
+            def calcular():
+                resposta = acao(self, request, *args, **kwargs)
+                if resposta.status_code != 200 or not hasattr(resposta, 'data'):
+                    return resposta
+
+                resposta.accepted_renderer = request.accepted_renderer
+                resposta.accepted_media_type = request.accepted_media_type
+                resposta.renderer_context = self.get_renderer_context()
+                resposta.render()
+
+                corpo = resposta.content
+                cabecalhos = [('Content-Type', resposta['Content-Type'])]
+                if codec and len(corpo) >= settings.COMPRESSAO_TAMANHO_MINIMO:
+                    comprimido = codec.comprimir(corpo)
+                    if len(comprimido) < len(corpo):
+                        corpo = comprimido
+                        cabecalhos.append(('Content-Encoding', codec.nome))
+                return corpo, cabecalhos
+
+            if coalescer:
+                resultado, desatualizada = coalescencia.executar(
+                    base, versao_dados, calcular, entre_workers=entre_workers
+                )
+            else:
+                resultado, desatualizada = calcular(), False
+
+            if isinstance(resultado, HttpResponseBase):
+                return resultado
+
+            resposta = montar_resposta(*resultado)
+            if desatualizada:
+                resposta['Cache-Status'] = 'api; hit; detail=stale'
+            else:
+                cache.set(chave, resultado, settings.COMPRESSAO_CACHE_TTL)
+            return resposta
+        return envoltorio
+    return decorator
+
+
+def montar_resposta(corpo, cabecalhos):
+    resposta = HttpResponse(corpo)
+    for nome, valor in cabecalhos:
+        resposta[nome] = valor
+    # o corpo depende do formato e do codec negociados
+    patch_vary_headers(resposta, ('Accept', 'Accept-Encoding'))
+    return resposta
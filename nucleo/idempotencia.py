@@ -0,0 +1,207 @@
+# nucleo/idempotencia.py
+import hashlib
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from nucleo.models import RespostaIdempotente
+
+METODOS_INSEGUROS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+# respostas que dependem do estado do cliente (credenciais, limite
+# de requisições, conflito momentâneo): não são guardadas, a
+# repetição executa de novo
+STATUS_NAO_GUARDADOS = {401, 403, 409, 429}
+
+# cabeçalhos que não são repetidos na resposta guardada
+CABECALHOS_IGNORADOS = {'content-length', 'set-cookie', 'vary', 'date'}
+
+# respostas com credenciais (ex: login) não são guardadas no banco
+CAMPOS_CREDENCIAIS = {'access', 'refresh'}
+
+
+def identificar_cliente(request, hash_requisicao):
+    """
+    Identifica o dono da chave pelo token JWT, sem acessar o banco
+    (a autenticação completa só acontece depois, na view).
+    Sem token válido, o escopo é o IP + o hash da requisição: dois
+    clientes anônimos com a mesma chave não veem a resposta um do outro
+    """
+    cabecalho = request.META.get('HTTP_AUTHORIZATION', '')
+    tipo, _, token = cabecalho.partition(' ')
+    if tipo.lower() == 'bearer' and token:
+        # import tardio: simplejwt só é necessário com o cabeçalho
+        from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.tokens import AccessToken
+        try:
+            return f"usuario:{AccessToken(token)['user_id']}"
+        except (TokenError, KeyError):
+            pass
+
+    ip = request.META.get('REMOTE_ADDR', '')
+    return 'anonimo:' + hashlib.sha256(f'{ip}\0{hash_requisicao}'.encode()).hexdigest()[:48]
+
+
+def calcular_hash(request):
+    """
+    Hash do que define a operação: método, caminho, query string e corpo
+    """
+    digest = hashlib.sha256()
+    for parte in (request.method, request.get_full_path()):
+        digest.update(parte.encode())
+        digest.update(b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def resposta_guardada(registro):
+    resposta = HttpResponse(
+        zlib.decompress(registro.corpo) if registro.corpo else b'',
+        status=registro.status_http
+    )
+    for nome, valor in registro.cabecalhos:
+        resposta[nome] = valor
+    resposta['Idempotent-Replayed'] = 'true'
+    return resposta
+
+
+def resposta_erro(mensagem, status, **cabecalhos):
+    resposta = JsonResponse(
+        {'erro': mensagem}, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+    for nome, valor in cabecalhos.items():
+        resposta[nome] = valor
+    return resposta
+
+
+class IdempotenciaMiddleware:
+    """
+    Suporte ao cabeçalho Idempotency-Key nos métodos POST, PUT,
+    PATCH e DELETE.
+
+    A primeira requisição com a chave é executada e a resposta fica
+    guardada (corpo comprimido com zlib) por IDEMPOTENCIA_TTL
+    segundos, identificada pela chave + usuário do token (sem
+    token, pela chave + IP + hash da requisição). Uma
+    repetição com a mesma chave recebe a resposta guardada sem
+    executar a view de novo (cabeçalho Idempotent-Replayed: true).
+
+    - mesma chave com outro corpo/rota: 422
+    - repetição enquanto a primeira ainda executa: espera até
+      IDEMPOTENCIA_ESPERA segundos pelo resultado; depois, 409
+    - respostas 5xx (e 401/403/409/429) e respostas com tokens
+      (access/refresh) não são guardadas: a repetição executa de novo
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        chave = request.META.get('HTTP_IDEMPOTENCY_KEY')
+        if not chave or request.method not in METODOS_INSEGUROS:
+            return self.get_response(request)
+
+        if len(chave) > 255:
+            return resposta_erro('Idempotency-Key deve ter no máximo 255 caracteres', 400)
+
+        hash_requisicao = calcular_hash(request)
+        cliente = identificar_cliente(request, hash_requisicao)
+
+        registro, resposta = self.reservar(chave, cliente, hash_requisicao)
+        if resposta is not None:
+            return resposta
+
+        try:
+            resposta = self.get_response(request)
+        except BaseException:
+            registro.delete()
+            raise
+
+        self.guardar(registro, resposta)
+        return resposta
+
+    def reservar(self, chave, cliente, hash_requisicao):
+        """
+        Grava a chave como "processando". Retorna (registro, None)
+        quando esta requisição deve executar, ou (None, resposta)
+        quando a chave já existe
+        """
+        limite = time.monotonic() + settings.IDEMPOTENCIA_ESPERA
+        espera = 0.025
+
+        while True:
+            agora = timezone.now()
+            # a repetição é o caso que precisa ser barato: uma consulta
+            existente = RespostaIdempotente.objects.filter(chave=chave, cliente=cliente).first()
+
+            if existente is None:
+                try:
+                    with transaction.atomic():
+                        registro = RespostaIdempotente.objects.create(
+                            chave=chave,
+                            cliente=cliente,
+                            hash_requisicao=hash_requisicao,
+                            expira=agora + timedelta(seconds=settings.IDEMPOTENCIA_TTL)
+                        )
+                    return registro, None
+                except IntegrityError:
+                    # outra requisição com a mesma chave gravou antes
+                    continue
+
+            if existente.expira <= agora or self.abandonada(existente, agora):
+                RespostaIdempotente.objects.filter(id=existente.id).delete()
+                continue
+
+            if existente.hash_requisicao != hash_requisicao:
+                return None, resposta_erro(
+                    'Idempotency-Key já usada com outra requisição', 422
+                )
+
+            if existente.status == RespostaIdempotente.CONCLUIDA:
+                return None, resposta_guardada(existente)
+
+            # a primeira requisição ainda está executando
+            if time.monotonic() >= limite:
+                return None, resposta_erro(
+                    'Requisição com esta Idempotency-Key ainda em processamento',
+                    409,
+                    **{'Retry-After': '1'}
+                )
+            time.sleep(espera)
+            espera = min(espera * 2, 0.5)
+
+    def abandonada(self, registro, agora):
+        """
+        "processando" há tempo demais: o processo que executava
+        a requisição morreu sem liberar a chave
+        """
+        return (
+            registro.status == RespostaIdempotente.PROCESSANDO
+            and registro.criado <= agora - timedelta(seconds=settings.IDEMPOTENCIA_ABANDONO)
+        )
+
+    def guardar(self, registro, resposta):
+        dados = getattr(resposta, 'data', None)
+        if (
+            resposta.status_code >= 500
+            or resposta.status_code in STATUS_NAO_GUARDADOS
+            or resposta.streaming
+            or len(resposta.content) > settings.IDEMPOTENCIA_TAMANHO_MAXIMO
+            or (isinstance(dados, dict) and not CAMPOS_CREDENCIAIS.isdisjoint(dados))
+        ):
+            registro.delete()
+            return
+
+        registro.status = RespostaIdempotente.CONCLUIDA
+        registro.status_http = resposta.status_code
+        registro.cabecalhos = [
+            (nome, valor) for nome, valor in resposta.items()
+            if nome.lower() not in CABECALHOS_IGNORADOS
+        ]
+        registro.corpo = zlib.compress(resposta.content)
+        registro.save(update_fields=['status', 'status_http', 'cabecalhos', 'corpo'])
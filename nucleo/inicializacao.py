@@ -0,0 +1,125 @@
+# nucleo/inicializacao.py
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+# Executado em um processo Python novo (cold start), como um worker
+# recém-criado do gunicorn: carrega o Django, a aplicação WSGI e
+# atende a primeira requisição
+SCRIPT = '''
+import io, json, os, sys, time
+inicio = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+import django
+django.setup()
+setup_pronto = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+aplicacao = get_wsgi_application()
+wsgi_pronto = time.perf_counter()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+    'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+}
+status = []
+b''.join(aplicacao(environ, lambda s, h, e=None: status.append(s)))
+fim = time.perf_counter()
+print(json.dumps({
+    'status': status[0],
+    'django_setup_ms': (setup_pronto - inicio) * 1000,
+    'wsgi_ms': (wsgi_pronto - setup_pronto) * 1000,
+    'primeira_resposta_ms': (fim - wsgi_pronto) * 1000,
+    'ate_primeira_resposta_ms': (fim - inicio) * 1000,
+}))
+'''
+
+# módulos pesados que só são importados no primeiro uso, nunca na
+# inicialização de um worker (django.setup() e as rotas):
+# e-mail (SMTP), MessagePack e importação/exportação de planilhas
+MODULOS_ADIADOS = ('smtplib', 'msgpack', 'openpyxl', 'tablib', 'import_export', 'odf', 'PIL')
+
+SCRIPT_MODULOS = '''
+import json, os, sys
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver()._populate()
+print(json.dumps(sorted(sys.modules)))
+'''
+
+
+def modulos_adiados_carregados():
+    """
+    Módulos de MODULOS_ADIADOS (ou submódulos deles) que um processo
+    novo já importou depois de carregar o Django e as rotas
+    """
+    processo = subprocess.run(
+        [sys.executable, '-c', SCRIPT_MODULOS],
+        cwd=settings.BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(f'Falha ao carregar a aplicação:\n{processo.stderr[-2000:]}')
+
+    carregados = json.loads(processo.stdout.strip().splitlines()[-1])
+    return sorted({
+        modulo.split('.')[0] for modulo in carregados
+        if modulo.split('.')[0] in MODULOS_ADIADOS
+    })
+
+
+def ler_importtime(saida):
+    """
+    Converte a saída de "python -X importtime" em uma lista de
+    (modulo, proprio_us, acumulado_us)
+    """
+    modulos = []
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or 'imported package' in linha:
+            continue
+        proprio, acumulado, modulo = linha[len('import time:'):].split('|')
+        modulos.append((modulo.strip(), int(proprio), int(acumulado)))
+    return modulos
+
+
+def agrupar_por_pacote(modulos):
+    """
+    Soma o tempo próprio de importação por pacote de primeiro nível
+    (ex: django, rest_framework, usuarios)
+    """
+    pacotes = defaultdict(int)
+    for modulo, proprio, _ in modulos:
+        pacotes[modulo.split('.')[0]] += proprio
+    return sorted(pacotes.items(), key=lambda item: item[1], reverse=True)
+
+
+def medir_inicializacao(rota='/'):
+    """
+    Mede a inicialização a frio em um processo novo.
+    Retorna os tempos (ms) de cada fase, o tempo total do processo
+    e os tempos de importação de cada módulo
+    """
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT, rota],
+        cwd=settings.BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    total_ms = (time.perf_counter() - inicio) * 1000
+
+    if processo.returncode != 0:
+        raise RuntimeError(f'Falha ao medir a inicialização:\n{processo.stderr[-2000:]}')
+
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    resultado['processo_ms'] = total_ms
+    resultado['modulos'] = ler_importtime(processo.stderr)
+    return resultado
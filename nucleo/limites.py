@@ -0,0 +1,249 @@
+# nucleo/limites.py
+"""
+Limite de requisições da API por faixa, com o algoritmo GCRA
+(Generic Cell Rate Algorithm).
+
+Para cada chave (IP ou usuário) guarda-se um único número, o TAT
+(theoretical arrival time): cada requisição empurra o TAT em
+periodo/limite segundos e é recusada se ele passar de agora + periodo.
+Equivale a uma janela deslizante, com custo O(1) por verificação e
+16 bytes por chave.
+
+Armazéns (LIMITES_ARMAZEM):
+- "memoria": tabela de tamanho fixo em memória compartilhada
+  (mmap anônimo). Criada no processo mestre do gunicorn (when_ready,
+  com preload_app), é herdada por todos os workers do servidor: o
+  limite vale para o servidor inteiro, sem acesso ao banco
+- "cache": cache do Django (LIMITES_CACHE). Para vários servidores,
+  com um cache compartilhado (Redis). Leitura e escrita não são
+  atômicas: sob concorrência, algumas requisições a mais podem passar
+
+As respostas trazem os cabeçalhos RateLimit-Limit, RateLimit-Remaining,
+RateLimit-Reset e RateLimit-Policy (da faixa mais restritiva)
+"""
+import hashlib
+import math
+import mmap
+import multiprocessing
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+SLOT = struct.Struct('<Qd')  # hash da chave, TAT
+SONDAGENS = 8  # slots examinados por chave
+GRUPOS = 16  # travas independentes (cada uma cobre uma faixa de slots)
+
+
+def hash_chave(chave):
+    valor = int.from_bytes(hashlib.blake2b(chave.encode(), digest_size=8).digest(), 'little')
+    return valor or 1  # 0 marca slot vazio
+
+
+def gcra(tat, agora, limite, periodo):
+    """
+    Retorna (permitida, novo_tat, restantes, espera)
+    """
+    intervalo = periodo / limite
+    novo_tat = max(tat, agora) + intervalo
+    if novo_tat - agora > periodo:
+        return False, tat, 0, novo_tat - agora - periodo
+    restantes = int((periodo - (novo_tat - agora)) // intervalo)
+    return True, novo_tat, restantes, 0.0
+
+
+class ArmazemMemoria:
+    """
+    Tabela de hash de tamanho fixo em um mmap anônimo compartilhado.
+    Cada chave ocupa um slot entre SONDAGENS posições do seu grupo;
+    sem slot livre, reaproveita o de TAT mais antigo (a chave que está
+    há mais tempo sem requisições)
+    """
+
+    def __init__(self, slots):
+        self.por_grupo = max(slots // GRUPOS, SONDAGENS)
+        self.memoria = mmap.mmap(-1, self.por_grupo * GRUPOS * SLOT.size)
+        # semáforos do sistema: também valem entre processos do fork
+        self.travas = [multiprocessing.Lock() for _ in range(GRUPOS)]
+
+    def verificar(self, chave, limite, periodo, agora):
+        h = hash_chave(chave)
+        grupo = h % GRUPOS
+        base = grupo * self.por_grupo
+        inicio = (h // GRUPOS) % self.por_grupo
+
+        with self.travas[grupo]:
+            escolhido = livre = mais_antigo = None
+            tat_mais_antigo = math.inf
+            for i in range(SONDAGENS):
+                posicao = (base + (inicio + i) % self.por_grupo) * SLOT.size
+                slot_hash, tat = SLOT.unpack_from(self.memoria, posicao)
+                if slot_hash == h:
+                    escolhido = posicao
+                    break
+                # vazio, ou de uma chave que já recuperou a cota inteira
+                if livre is None and (slot_hash == 0 or tat <= agora):
+                    livre = posicao
+                if tat < tat_mais_antigo:
+                    mais_antigo, tat_mais_antigo = posicao, tat
+            else:
+                escolhido = livre if livre is not None else mais_antigo
+                tat = 0.0
+
+            permitida, novo_tat, restantes, espera = gcra(tat, agora, limite, periodo)
+            if permitida:
+                SLOT.pack_into(self.memoria, escolhido, h, novo_tat)
+            return permitida, max(novo_tat, agora), restantes, espera
+
+    def limpar(self):
+        self.memoria[:] = bytes(len(self.memoria))
+
+
+class ArmazemCache:
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def verificar(self, chave, limite, periodo, agora):
+        chave = f'limite:{chave}'
+        tat = self.cache.get(chave, 0.0)
+        permitida, novo_tat, restantes, espera = gcra(tat, agora, limite, periodo)
+        if permitida:
+            self.cache.set(chave, novo_tat, math.ceil(periodo) + 1)
+        return permitida, max(novo_tat, agora), restantes, espera
+
+    def limpar(self):
+        self.cache.clear()
+
+
+_armazem = None
+_mutex = threading.Lock()
+
+
+def armazem():
+    """
+    Armazém do processo (criado no primeiro uso). Chamado no mestre do
+    gunicorn antes do fork para que os workers compartilhem a memória
+    """
+    global _armazem
+    if _armazem is None:
+        with _mutex:
+            if _armazem is None:
+                if settings.LIMITES_ARMAZEM == 'cache':
+                    _armazem = ArmazemCache(settings.LIMITES_CACHE)
+                else:
+                    _armazem = ArmazemMemoria(settings.LIMITES_SLOTS)
+    return _armazem
+
+
+class LimiteGCRA(SimpleRateThrottle):
+    """
+    Base das faixas: taxa em REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+    pelo `scope` (ex.: "20/min"), como nos throttles do DRF
+    """
+    timer = time.time
+
+    def get_rate(self):
+        # lida a cada instância (acompanha override_settings nos testes)
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        chave = self.get_cache_key(request, view)
+        if chave is None:
+            return True
+
+        agora = self.timer()
+        permitida, tat, restantes, self.espera = armazem().verificar(
+            chave, self.num_requests, self.duration, agora
+        )
+        registrar_limite(request, self.num_requests, self.duration, restantes,
+                         self.espera if not permitida else tat - agora)
+        return permitida
+
+    def wait(self):
+        return self.espera
+
+
+def registrar_limite(request, limite, periodo, restantes, reset):
+    """
+    Guarda na requisição a faixa com menos requisições restantes
+    (para o CabecalhosLimiteMiddleware)
+    """
+    requisicao = getattr(request, '_request', request)
+    atual = getattr(requisicao, 'limite_taxa', None)
+    if atual is None or restantes < atual[2]:
+        requisicao.limite_taxa = (limite, periodo, restantes, reset)
+
+
+class AnonimoThrottle(LimiteGCRA):
+    """
+    Requisições sem autenticação, por IP
+    """
+    scope = 'anonimo'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f'{self.scope}:{self.get_ident(request)}'
+
+
+class UsuarioThrottle(LimiteGCRA):
+    """
+    Requisições autenticadas, por usuário
+    """
+    scope = 'usuario'
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return None
+        return f'{self.scope}:{request.user.pk}'
+
+
+class CaroThrottle(LimiteGCRA):
+    """
+    Ações caras, por usuário (ou IP): as listadas em `acoes_caras` da
+    view (hash de senha, envio de e-mail) e as requisições com um dos
+    `parametros_caros` (buscas com LIKE sem índice)
+    """
+    scope = 'caro'
+
+    def get_cache_key(self, request, view):
+        acao = getattr(view, 'action', None)
+        cara = acao in getattr(view, 'acoes_caras', ()) or any(
+            request.query_params.get(parametro)
+            for parametro in getattr(view, 'parametros_caros', ())
+        )
+        if not cara:
+            return None
+        if request.user and request.user.is_authenticated:
+            return f'{self.scope}:usuario:{request.user.pk}'
+        return f'{self.scope}:{self.get_ident(request)}'
+
+
+class CabecalhosLimiteMiddleware:
+    """
+    Acrescenta os cabeçalhos RateLimit-* às respostas das requisições
+    que passaram por um LimiteGCRA
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        resposta = self.get_response(request)
+        limite_taxa = getattr(request, 'limite_taxa', None)
+        if limite_taxa is not None:
+            limite, periodo, restantes, reset = limite_taxa
+            resposta['RateLimit-Limit'] = str(limite)
+            resposta['RateLimit-Remaining'] = str(restantes)
+            resposta['RateLimit-Reset'] = str(math.ceil(reset))
+            resposta['RateLimit-Policy'] = f'{limite};w={periodo}'
+        return resposta
@@ -0,0 +1,258 @@
+# nucleo/lote.py
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+METODOS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'}
+METODOS_LEITURA = {'GET', 'HEAD'}
+
+_executor = None
+
+
+def obter_executor():
+    """
+    Pool de threads compartilhado pelas leituras em paralelo
+    (criado no primeiro uso, em cada worker)
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.LOTE_THREADS, thread_name_prefix='lote'
+        )
+    return _executor
+
+
+class ReverterTransacao(Exception):
+    pass
+
+
+class LoteView(APIView):
+    """
+    POST /batch/ - Executa várias requisições da API em uma só
+
+    Corpo:
+        {
+            "requisicoes": [
+                {"id": "perfil", "metodo": "GET", "caminho": "/usuarios/perfil/"},
+                {"id": "novo", "metodo": "POST", "caminho": "/produtos/", "corpo": {...}}
+            ],
+            "paralelo": true,    # leituras consecutivas executam ao mesmo tempo
+            "transacao": false   # escritas em uma única transação
+        }
+
+    A autenticação acontece uma vez (nesta view) e cada
+    sub-requisição é despachada direto para a view da rota, sem
+    passar de novo pelos middlewares. Cada resposta tem o seu status.
+
+    Por não passar pelos middlewares, as sub-requisições não têm
+    Idempotency-Key (nucleo.idempotencia), controle de admissão
+    (nucleo.admissao), compressão nem cabeçalhos RateLimit-*: tudo
+    isso vale para o POST /batch/ como um todo. Os limites de
+    requisições das views (throttles do DRF) continuam valendo para
+    cada sub-requisição. Views assíncronas (ex: /produtos/eventos/)
+    e respostas em streaming (exportações, snapshots) não são
+    suportadas: a sub-requisição recebe 400
+
+    Com "transacao", as sub-requisições executam em ordem dentro de
+    uma transação; na primeira escrita com erro (status >= 400) tudo
+    é revertido e as seguintes não executam (status 424)
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        dados = request.data
+        if isinstance(dados, list):
+            dados = {'requisicoes': dados}
+
+        requisicoes = dados.get('requisicoes') if isinstance(dados, dict) else None
+        if not isinstance(requisicoes, list) or not requisicoes:
+            return Response({
+                'erro': 'Informe "requisicoes": uma lista de sub-requisições'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(requisicoes) > settings.LOTE_MAXIMO:
+            return Response({
+                'erro': f'Máximo de {settings.LOTE_MAXIMO} sub-requisições por lote'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        erros = {}
+        for indice, sub in enumerate(requisicoes):
+            erro = self.validar(sub)
+            if erro:
+                erros[indice] = erro
+        if erros:
+            return Response({
+                'erro': 'Sub-requisições inválidas',
+                'detalhes': erros
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if dados.get('transacao'):
+            respostas, revertida = self.executar_em_transacao(request, requisicoes)
+        else:
+            respostas, revertida = self.executar(request, requisicoes, dados.get('paralelo')), False
+
+        corpo = {
+            'mensagem': f'{len(respostas)} sub-requisição(ões) executada(s)',
+            'respostas': respostas,
+        }
+        if dados.get('transacao'):
+            corpo['transacao'] = 'revertida' if revertida else 'confirmada'
+        return Response(corpo, status=status.HTTP_200_OK)
+
+    def validar(self, sub):
+        if not isinstance(sub, dict):
+            return 'A sub-requisição deve ser um objeto'
+        if str(sub.get('metodo', 'GET')).upper() not in METODOS:
+            return f"Método não suportado: {sub.get('metodo')}"
+        caminho = sub.get('caminho')
+        if not isinstance(caminho, str) or not caminho.startswith('/'):
+            return 'Informe "caminho" começando com /'
+        if urlsplit(caminho).path.rstrip('/') == self.request.path.rstrip('/'):
+            return 'Lotes não podem ser aninhados'
+        return None
+
+    def executar(self, request, requisicoes, paralelo):
+        """
+        Executa em ordem. Com paralelo, cada sequência de leituras
+        (GET/HEAD) entre duas escritas executa ao mesmo tempo
+        """
+        respostas = [None] * len(requisicoes)
+        grupo = []
+
+        def executar_grupo():
+            if len(grupo) > 1:
+                resultados = obter_executor().map(
+                    lambda indice: self.despachar_em_thread(request, requisicoes[indice]),
+                    grupo
+                )
+                for indice, resposta in zip(grupo, resultados):
+                    respostas[indice] = resposta
+            elif grupo:
+                respostas[grupo[0]] = self.despachar(request, requisicoes[grupo[0]])
+            grupo.clear()
+
+        for indice, sub in enumerate(requisicoes):
+            if paralelo and str(sub.get('metodo', 'GET')).upper() in METODOS_LEITURA:
+                grupo.append(indice)
+                continue
+            executar_grupo()
+            respostas[indice] = self.despachar(request, sub)
+        executar_grupo()
+
+        return respostas
+
+    def executar_em_transacao(self, request, requisicoes):
+        respostas = []
+        revertida = False
+        try:
+            with transaction.atomic():
+                for sub in requisicoes:
+                    resposta = self.despachar(request, sub)
+                    respostas.append(resposta)
+                    if resposta['status'] >= 400:
+                        raise ReverterTransacao()
+        except ReverterTransacao:
+            revertida = True
+            for resposta in respostas:
+                resposta['revertida'] = True
+            for sub in requisicoes[len(respostas):]:
+                respostas.append({
+                    'id': sub.get('id'),
+                    'status': status.HTTP_424_FAILED_DEPENDENCY,
+                    'corpo': {'erro': 'Não executada: uma sub-requisição anterior falhou'},
+                })
+        return respostas, revertida
+
+    def despachar_em_thread(self, request, sub):
+        try:
+            return self.despachar(request, sub)
+        finally:
+            # a thread do pool abre a própria conexão com o banco
+            connections.close_all()
+
+    def despachar(self, request, sub):
+        """
+        Monta a sub-requisição a partir da requisição do lote e chama
+        a view da rota diretamente, com o usuário já autenticado
+        """
+        metodo = str(sub.get('metodo', 'GET')).upper()
+        partes = urlsplit(sub['caminho'])
+        resultado = {'id': sub.get('id')}
+
+        try:
+            rota = resolve(partes.path)
+        except Resolver404:
+            return {**resultado, 'status': 404, 'corpo': {'erro': 'Rota não encontrada'}}
+
+        if iscoroutinefunction(rota.func):
+            return {**resultado, 'status': 400, 'corpo': {'erro': 'Rota assíncrona: não suportada no lote'}}
+
+        corpo = b''
+        if 'corpo' in sub and metodo not in METODOS_LEITURA:
+            corpo = json.dumps(sub['corpo']).encode()
+
+        environ = {
+            chave: valor for chave, valor in request.META.items()
+            if chave.startswith(('HTTP_', 'SERVER_', 'REMOTE_')) or chave == 'wsgi.url_scheme'
+        }
+        environ.setdefault('wsgi.url_scheme', request.scheme)
+        environ.update({
+            'REQUEST_METHOD': metodo,
+            'PATH_INFO': partes.path,
+            'SCRIPT_NAME': '',
+            'QUERY_STRING': partes.query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(corpo)),
+            'wsgi.input': BytesIO(corpo),
+        })
+        environ.pop('HTTP_IDEMPOTENCY_KEY', None)
+        # o corpo vai dentro do JSON do lote: a sub-requisição responde
+        # em JSON sem compressão (o cache_comprimido devolveria bytes
+        # comprimidos ou MessagePack); o lote é comprimido como um todo
+        environ.pop('HTTP_ACCEPT_ENCODING', None)
+        environ['HTTP_ACCEPT'] = 'application/json'
+        sub_requisicao = WSGIRequest(environ)
+
+        # autenticado uma vez no lote: a view da rota não valida o token de novo
+        if request.user and request.user.is_authenticated:
+            sub_requisicao._force_auth_user = request.user
+            sub_requisicao._force_auth_token = request.auth
+
+        # uma sub-requisição com erro só afeta a própria resposta
+        try:
+            resposta = rota.func(sub_requisicao, *rota.args, **rota.kwargs)
+            if resposta.streaming:
+                # fecha o arquivo ou gerador sem consumir
+                resposta.close()
+                return {
+                    **resultado, 'status': 400,
+                    'corpo': {'erro': 'Respostas em streaming não são suportadas no lote'}
+                }
+
+            resultado['status'] = resposta.status_code
+            if hasattr(resposta, 'data'):
+                resultado['corpo'] = resposta.data
+            else:
+                conteudo = resposta.content.decode(resposta.charset or 'utf-8')
+                try:
+                    resultado['corpo'] = json.loads(conteudo) if conteudo else None
+                except ValueError:
+                    resultado['corpo'] = conteudo
+        except Exception:
+            logger.exception('Erro na sub-requisição %s %s', metodo, sub['caminho'])
+            return {**resultado, 'status': 500, 'corpo': {'erro': 'Erro interno'}}
+        return resultado
@@ -0,0 +1,36 @@
+# nucleo/management/commands/limpar_idempotencia.py
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from nucleo.models import RespostaIdempotente
+
+class Command(BaseCommand):
+    help = 'Remove as respostas guardadas por Idempotency-Key que já expiraram'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Quantidade de registros removidos por DELETE (padrão: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        agora = timezone.now()
+        total = 0
+
+        # lotes pequenos, usando o índice de "expira"
+        while True:
+            ids = list(
+                RespostaIdempotente.objects
+                .filter(expira__lte=agora)
+                .values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            total += RespostaIdempotente.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{total} resposta(s) expirada(s) removida(s)')
+        )
@@ -0,0 +1,44 @@
+# nucleo/management/commands/limpar_respostas.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from nucleo.models import RespostaCompartilhada
+
+class Command(BaseCommand):
+    help = (
+        'Remove as respostas compartilhadas (single-flight) não recalculadas '
+        'há mais de COALESCENCIA_RETENCAO segundos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Quantidade de registros removidos por DELETE (padrão: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        agora = timezone.now()
+        limite = agora - timedelta(seconds=settings.COALESCENCIA_RETENCAO)
+        total = 0
+
+        # sem trava ativa: não remove a linha de um cálculo em andamento
+        antigas = RespostaCompartilhada.objects.filter(
+            Q(calculada_em__lte=limite) | Q(calculada_em__isnull=True)
+        ).filter(Q(trava_ate__isnull=True) | Q(trava_ate__lte=agora))
+
+        while True:
+            ids = list(antigas.values_list('id', flat=True)[:lote])
+            if not ids:
+                break
+            total += RespostaCompartilhada.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{total} resposta(s) compartilhada(s) removida(s)')
+        )
@@ -0,0 +1,75 @@
+# nucleo/management/commands/medir_inicializacao.py
+import statistics
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from nucleo.inicializacao import agrupar_por_pacote, medir_inicializacao, modulos_adiados_carregados
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de inicialização a frio (importações e primeira resposta)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rota',
+            default='/',
+            help='Rota da primeira requisição (padrão: /)'
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=3,
+            help='Quantidade de medições; é exibida a mediana (padrão: 3)'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Quantidade de pacotes e módulos listados (padrão: 15)'
+        )
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Falha (código de saída 1) se a menor medição passar de ORCAMENTO_INICIALIZACAO_MS '
+                 'ou se algum módulo adiado for importado na inicialização'
+        )
+
+    def handle(self, *args, **options):
+        medicoes = [medir_inicializacao(options['rota']) for _ in range(options['repeticoes'])]
+        medicoes.sort(key=lambda m: m['processo_ms'])
+        mediana = medicoes[len(medicoes) // 2]
+        top = options['top']
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\nInicialização a frio - mediana de {len(medicoes)} medição(ões)"
+        ))
+        self.stdout.write(f"  django.setup():            {mediana['django_setup_ms']:8.1f} ms")
+        self.stdout.write(f"  get_wsgi_application():    {mediana['wsgi_ms']:8.1f} ms")
+        self.stdout.write(f"  primeira resposta ({mediana['status'].split()[0]}):  {mediana['primeira_resposta_ms']:8.1f} ms")
+        self.stdout.write(f"  até a primeira resposta:   {mediana['ate_primeira_resposta_ms']:8.1f} ms")
+        self.stdout.write(f"  processo completo:         {mediana['processo_ms']:8.1f} ms"
+                          f"  (orçamento: {settings.ORCAMENTO_INICIALIZACAO_MS} ms,"
+                          f" variação: {statistics.pstdev(m['processo_ms'] for m in medicoes):.1f} ms)")
+
+        self.stdout.write(self.style.SUCCESS(f'\nTempo próprio de importação por pacote (top {top})'))
+        for pacote, proprio in agrupar_por_pacote(mediana['modulos'])[:top]:
+            self.stdout.write(f'  {proprio / 1000:8.1f} ms  {pacote}')
+
+        self.stdout.write(self.style.SUCCESS(f'\nMódulos por tempo acumulado (top {top})'))
+        modulos = sorted(mediana['modulos'], key=lambda m: m[2], reverse=True)
+        for modulo, proprio, acumulado in modulos[:top]:
+            self.stdout.write(f'  {acumulado / 1000:8.1f} ms  (próprio {proprio / 1000:6.1f} ms)  {modulo}')
+
+        if options['verificar']:
+            carregados = modulos_adiados_carregados()
+            if carregados:
+                raise CommandError(
+                    f"Módulos adiados importados na inicialização: {', '.join(carregados)}"
+                )
+            # menor medição, para não falhar por ruído da máquina
+            menor = medicoes[0]['processo_ms']
+            if menor > settings.ORCAMENTO_INICIALIZACAO_MS:
+                raise CommandError(
+                    f'Inicialização levou {menor:.0f} ms '
+                    f'(orçamento: {settings.ORCAMENTO_INICIALIZACAO_MS} ms)'
+                )
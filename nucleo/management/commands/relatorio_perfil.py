@@ -0,0 +1,74 @@
+# nucleo/management/commands/relatorio_perfil.py
+import io
+import os
+import pstats
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from nucleo.perfilamento import SEPARADOR
+
+class Command(BaseCommand):
+    help = 'Agrega os arquivos .prof por action e mostra as funções mais custosas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--diretorio',
+            default=str(settings.PERFIL_DIRETORIO),
+            help='Diretório com os arquivos .prof (padrão: PERFIL_DIRETORIO)'
+        )
+        parser.add_argument(
+            '--acao',
+            help='Mostra apenas as actions que contêm este texto (ex: ProdutoViewSets.list)'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Quantidade de funções por tabela (padrão: 20)'
+        )
+        parser.add_argument(
+            '--ordem',
+            choices=['cumulative', 'tottime'],
+            action='append',
+            help='Ordenação das tabelas: tempo acumulado e/ou tempo próprio (padrão: ambas)'
+        )
+
+    def handle(self, *args, **options):
+        diretorio = options['diretorio']
+        if not os.path.isdir(diretorio):
+            raise CommandError(f'Diretório não encontrado: {diretorio}')
+
+        # agrupa os arquivos por action
+        por_acao = defaultdict(list)
+        for nome in sorted(os.listdir(diretorio)):
+            if not nome.endswith('.prof') or SEPARADOR not in nome:
+                continue
+            acao = nome.split(SEPARADOR, 1)[0]
+            if options['acao'] and options['acao'] not in acao:
+                continue
+            por_acao[acao].append(os.path.join(diretorio, nome))
+
+        if not por_acao:
+            self.stdout.write('Nenhum perfil encontrado.')
+            return
+
+        ordens = options['ordem'] or ['cumulative', 'tottime']
+        titulos = {'cumulative': 'tempo acumulado', 'tottime': 'tempo próprio'}
+
+        for acao, arquivos in sorted(por_acao.items()):
+            saida = io.StringIO()
+            estatisticas = pstats.Stats(*arquivos, stream=saida)
+            estatisticas.strip_dirs()
+            estatisticas.files = []  # não lista cada arquivo no cabeçalho
+
+            self.stdout.write(self.style.SUCCESS(
+                f'\n{"=" * 80}\n{acao} - {len(arquivos)} requisição(ões) perfilada(s)\n{"=" * 80}'
+            ))
+            for ordem in ordens:
+                saida.seek(0)
+                saida.truncate()
+                estatisticas.sort_stats(ordem).print_stats(options['top'])
+                self.stdout.write(f'\n--- Top {options["top"]} por {titulos[ordem]} ---')
+                self.stdout.write(saida.getvalue(), ending='')
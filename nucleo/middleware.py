@@ -0,0 +1,51 @@
+# nucleo/middleware.py
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.middleware import csrf
+
+
+def usa_sessao(request):
+    """
+    Retorna True se a rota usa sessão/cookies (ex: /admin/).
+    As rotas da API autenticam apenas com o Bearer token (JWT),
+    então não precisam de sessão, mensagens nem CSRF
+    """
+    caminho = request.path_info
+    return any(caminho.startswith(prefixo) for prefixo in settings.ROTAS_COM_SESSAO)
+
+
+class SomenteRotasComSessao:
+    """
+    Mixin que executa o middleware original apenas nas rotas
+    listadas em ROTAS_COM_SESSAO. Nas demais a requisição segue
+    direto para o próximo middleware (sem custo e sem acessar
+    a tabela django_session)
+    """
+
+    def __call__(self, request):
+        if not usa_sessao(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(SomenteRotasComSessao, sessions_middleware.SessionMiddleware):
+    pass
+
+
+class AuthenticationMiddleware(SomenteRotasComSessao, auth_middleware.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(SomenteRotasComSessao, messages_middleware.MessageMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(SomenteRotasComSessao, csrf.CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # process_view é chamado pelo handler fora do __call__
+        if not usa_sessao(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespostaIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=255, verbose_name='Idempotency-Key')),
+                ('cliente', models.CharField(help_text='Usuário do token (ou "anonimo")', max_length=64, verbose_name='Cliente')),
+                ('hash_requisicao', models.CharField(help_text='SHA-256 do método, caminho e corpo', max_length=64, verbose_name='Hash da requisição')),
+                ('status', models.CharField(choices=[('processando', 'Processando'), ('concluida', 'Concluída')], default='processando', max_length=20, verbose_name='Status')),
+                ('status_http', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Status HTTP')),
+                ('cabecalhos', models.JSONField(blank=True, default=list, verbose_name='Cabeçalhos')),
+                ('corpo', models.BinaryField(blank=True, null=True, verbose_name='Corpo (zlib)')),
+                ('criado', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('expira', models.DateTimeField(db_index=True, verbose_name='Expira em')),
+            ],
+            options={
+                'verbose_name': 'Resposta idempotente',
+                'verbose_name_plural': 'Respostas idempotentes',
+                'db_table': 'respostas_idempotentes',
+                'constraints': [models.UniqueConstraint(fields=('chave', 'cliente'), name='idempotencia_chave_cliente_uniq')],
+            },
+        ),
+    ]
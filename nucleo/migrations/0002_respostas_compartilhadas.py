@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nucleo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespostaCompartilhada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(help_text='SHA-256 do formato, codec e URL', max_length=64, unique=True, verbose_name='Chave')),
+                ('versao', models.BigIntegerField(default=0, verbose_name='Versão dos dados')),
+                ('cabecalhos', models.JSONField(blank=True, default=list, verbose_name='Cabeçalhos')),
+                ('corpo', models.BinaryField(blank=True, null=True, verbose_name='Corpo')),
+                ('calculada_em', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Calculada em')),
+                ('trava_ate', models.DateTimeField(blank=True, help_text='Um worker está recalculando até este momento', null=True, verbose_name='Travada até')),
+            ],
+            options={
+                'verbose_name': 'Resposta compartilhada',
+                'verbose_name_plural': 'Respostas compartilhadas',
+                'db_table': 'respostas_compartilhadas',
+            },
+        ),
+    ]
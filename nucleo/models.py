@@ -0,0 +1,82 @@
+# nucleo/models.py
+from django.db import models
+
+
+class RespostaIdempotente(models.Model):
+    """
+    Resposta guardada para uma requisição com o cabeçalho
+    Idempotency-Key (veja: nucleo.idempotencia)
+    """
+    PROCESSANDO = 'processando'
+    CONCLUIDA = 'concluida'
+    STATUS_CHOICES = [
+        (PROCESSANDO, 'Processando'),
+        (CONCLUIDA, 'Concluída'),
+    ]
+
+    chave = models.CharField(max_length=255,
+                    verbose_name='Idempotency-Key')
+    cliente = models.CharField(max_length=64,
+                    verbose_name='Cliente',
+                    help_text='Usuário do token (ou "anonimo")')
+    hash_requisicao = models.CharField(max_length=64,
+                    verbose_name='Hash da requisição',
+                    help_text='SHA-256 do método, caminho e corpo')
+    status = models.CharField(max_length=20,
+                    choices=STATUS_CHOICES,
+                    default=PROCESSANDO,
+                    verbose_name='Status')
+    status_http = models.PositiveSmallIntegerField(null=True, blank=True,
+                    verbose_name='Status HTTP')
+    cabecalhos = models.JSONField(default=list, blank=True,
+                    verbose_name='Cabeçalhos')
+    corpo = models.BinaryField(null=True, blank=True,
+                    verbose_name='Corpo (zlib)')
+    criado = models.DateTimeField(auto_now_add=True,
+                    verbose_name='Criado em')
+    expira = models.DateTimeField(db_index=True,
+                    verbose_name='Expira em')
+
+    class Meta:
+        db_table = 'respostas_idempotentes'
+        verbose_name = 'Resposta idempotente'
+        verbose_name_plural = 'Respostas idempotentes'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chave', 'cliente'],
+                name='idempotencia_chave_cliente_uniq'
+            ),
+        ]
+
+    def __repr__(self):
+        return f'<RespostaIdempotente {self.chave} {self.status}>'
+
+
+class RespostaCompartilhada(models.Model):
+    """
+    Última resposta calculada de uma leitura cara, compartilhada entre
+    os workers, e a trava de quem está recalculando
+    (veja: nucleo.coalescencia)
+    """
+    chave = models.CharField(max_length=64, unique=True,
+                    verbose_name='Chave',
+                    help_text='SHA-256 do formato, codec e URL')
+    versao = models.BigIntegerField(default=0,
+                    verbose_name='Versão dos dados')
+    cabecalhos = models.JSONField(default=list, blank=True,
+                    verbose_name='Cabeçalhos')
+    corpo = models.BinaryField(null=True, blank=True,
+                    verbose_name='Corpo')
+    calculada_em = models.DateTimeField(null=True, blank=True, db_index=True,
+                    verbose_name='Calculada em')
+    trava_ate = models.DateTimeField(null=True, blank=True,
+                    verbose_name='Travada até',
+                    help_text='Um worker está recalculando até este momento')
+
+    class Meta:
+        db_table = 'respostas_compartilhadas'
+        verbose_name = 'Resposta compartilhada'
+        verbose_name_plural = 'Respostas compartilhadas'
+
+    def __repr__(self):
+        return f'<RespostaCompartilhada {self.chave[:12]} v{self.versao}>'
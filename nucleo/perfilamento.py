@@ -0,0 +1,98 @@
+# nucleo/perfilamento.py
+import hmac
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+
+SEPARADOR = '__'  # separa a action do restante do nome do arquivo .prof
+
+# um perfilamento por vez no processo: a partir do Python 3.12 o
+# enable() de um segundo cProfile falha enquanto outro está ativo
+_trava = threading.Lock()
+
+
+def nome_da_acao(view_func, request):
+    """
+    Nome da action DRF atendida pela view (ex: ProdutoViewSets.list).
+    Para views comuns, usa o módulo e o nome da função
+    """
+    classe = getattr(view_func, 'cls', None)
+    if classe is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+
+    acoes = getattr(view_func, 'actions', None) or {}
+    metodo = request.method.lower()
+    return f'{classe.__name__}.{acoes.get(metodo, metodo)}'
+
+
+class PerfilamentoMiddleware:
+    """
+    Perfila (cProfile) uma amostra das requisições e salva um
+    arquivo .prof por requisição, identificado pela action DRF.
+
+    Uma requisição é perfilada quando:
+    - for sorteada pela taxa PERFIL_TAXA_AMOSTRAGEM (0.0 a 1.0), ou
+    - enviar o cabeçalho "X-Profile: <PERFIL_TOKEN>"
+
+    Nas demais o custo é apenas o sorteio e a leitura do cabeçalho.
+    Os arquivos são agregados pelo comando relatorio_perfil
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.taxa = settings.PERFIL_TAXA_AMOSTRAGEM
+        self.token = settings.PERFIL_TOKEN
+        self.diretorio = settings.PERFIL_DIRETORIO
+
+    def deve_perfilar(self, request):
+        token = request.META.get('HTTP_X_PROFILE')
+        if token and self.token and hmac.compare_digest(token.encode(), self.token.encode()):
+            return True
+        # token errado: segue a amostragem normal
+        return self.taxa > 0 and random.random() < self.taxa
+
+    def __call__(self, request):
+        if not self.deve_perfilar(request):
+            return self.get_response(request)
+
+        # outra requisição do processo já está sendo perfilada:
+        # esta segue sem perfil
+        if not _trava.acquire(blocking=False):
+            return self.get_response(request)
+
+        # import tardio: só é necessário quando há perfilamento
+        import cProfile
+
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # outra ferramenta de perfilamento ativa (ex: um depurador)
+            _trava.release()
+            return self.get_response(request)
+
+        request.perfilando = True
+        try:
+            response = self.get_response(request)
+        finally:
+            perfil.disable()
+            _trava.release()
+
+        arquivo = self.salvar(perfil, getattr(request, 'perfil_acao', 'desconhecida'))
+        response['X-Profile-Arquivo'] = os.path.basename(arquivo)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(request, 'perfilando', False):
+            request.perfil_acao = nome_da_acao(view_func, request)
+        return None
+
+    def salvar(self, perfil, acao):
+        os.makedirs(self.diretorio, exist_ok=True)
+        nome = f'{acao}{SEPARADOR}{time.time_ns()}_{os.getpid()}.prof'
+        caminho = os.path.join(self.diretorio, nome)
+        perfil.dump_stats(caminho)
+        return caminho
@@ -0,0 +1,234 @@
+# nucleo/renderizacao.py
+"""
+Renderer e parser JSON da API com orjson (quando instalado).
+
+A saída é a mesma do JSONRenderer do DRF nas configurações padrão
+(UNICODE_JSON, COMPACT_JSON e STRICT_JSON): datetime em ISO 8601 com
+"Z" para UTC, Decimal fora dos serializers como número, \\u2028 e
+\\u2029 escapados. O que o orjson não serializa sozinho passa pelo
+mesmo JSONEncoder.default do DRF.
+
+Sem o orjson, ou em casos que ele não cobre (indentação,
+ensure_ascii, inteiros acima de 64 bits, charset diferente de UTF-8,
+floats que o json escreve com expoente, como 1e+16, ou não finitos),
+as classes usam a implementação do DRF com o json da biblioteca padrão
+
+MessagePack (application/msgpack), para os clientes de carga em
+massa, é opcional: só é oferecido com o pacote msgpack instalado.
+Codificação fixa dos tipos que o JSON leva como texto:
+- Decimal: extensão tipo 1, com o texto do número em ASCII
+  (ex.: ExtType(1, b"99.90")), sem perda de precisão
+- datetime com fuso: extensão Timestamp (tipo -1) do MessagePack,
+  em UTC; datetime sem fuso, date e time: texto ISO 8601
+Com MessagePack negociado, os serializers com TiposNativosMixin
+entregam Decimal e datetime sem convertê-los em texto
+"""
+import datetime
+import decimal
+from importlib.util import find_spec
+import math
+import re
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# o msgpack só é importado na primeira requisição em MessagePack: fora
+# da inicialização dos workers (veja nucleo.inicializacao)
+MSGPACK_DISPONIVEL = find_spec('msgpack') is not None
+
+EXT_DECIMAL = 1
+
+if orjson is not None:
+    OPCOES = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_default = JSONEncoder().default
+
+
+def escapar_separadores(conteudo):
+    # U+2028 e U+2029 em UTF-8: o JSONRenderer escapa para que a saída
+    # também seja JavaScript válido
+    if b'\xe2\x80' in conteudo:
+        conteudo = conteudo.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return conteudo
+
+
+# números na saída do orjson que o json escreve de outro jeito: com
+# expoente ("1e16" e "1e-7" contra "1e+16" e "1e-07") ou abaixo de
+# 1e-4 ("0.00001" contra "1e-05"). Um texto parecido dentro de uma
+# string também casa: só custa a renderização pelo DRF
+EXPOENTE = re.compile(rb'e[-0-9]')
+PEQUENO = re.compile(rb'0\.0000[0-9]')
+# o que vem antes do trecho encontrado, se ele está em um número
+MANTISSA = re.compile(rb'[:,\[]-?[0-9]+(?:\.[0-9]+)?\Z')
+INICIO_NUMERO = re.compile(rb'[:,\[]-?\Z')
+
+
+def numero_divergente(conteudo):
+    """
+    Se a saída do orjson tem algum número escrito diferente do json.
+    Procura primeiro o trecho literal ("e" seguido de dígito ou "-",
+    "0.0000") e só então confere o que vem antes dele: uma busca por
+    classe de caracteres em cada posição custaria mais que o orjson
+    """
+    for encontrado in PEQUENO.finditer(conteudo):
+        inicio = encontrado.start()
+        if INICIO_NUMERO.search(conteudo, max(inicio - 2, 0), inicio):
+            return True
+    for encontrado in EXPOENTE.finditer(conteudo):
+        inicio = encontrado.start()
+        # o maior float tem 24 caracteres
+        if MANTISSA.search(conteudo, max(inicio - 32, 0), inicio):
+            return True
+    return False
+
+
+def tem_float_nao_finito(dados):
+    """
+    Se há nos dados algum float NaN ou infinito (o orjson escreve
+    null; o json com STRICT_JSON recusa)
+    """
+    pendentes = [dados]
+    while pendentes:
+        item = pendentes.pop()
+        if isinstance(item, float):
+            if not math.isfinite(item):
+                return True
+        elif isinstance(item, dict):
+            pendentes.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            pendentes.extend(item)
+    return False
+
+
+class JSONRapidoRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            conteudo = orjson.dumps(data, default=_default, option=OPCOES)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # a verificação é sobre os bytes (em C); os dados só são
+        # percorridos quando a saída tem algum null
+        if numero_divergente(conteudo) or (b'null' in conteudo and tem_float_nao_finito(data)):
+            return super().render(data, accepted_media_type, renderer_context)
+        return escapar_separadores(conteudo)
+
+
+class JSONRapidoParser(JSONParser):
+    renderer_class = JSONRapidoRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+
+        codificacao = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if codificacao.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+def codificar_msgpack(obj):
+    import msgpack
+    if isinstance(obj, decimal.Decimal):
+        return msgpack.ExtType(EXT_DECIMAL, str(obj).encode('ascii'))
+    if isinstance(obj, datetime.datetime):
+        # com fuso já sai como Timestamp (datetime=True)
+        return obj.isoformat()
+    return _default(obj)
+
+
+def decodificar_ext(codigo, dados):
+    import msgpack
+    if codigo == EXT_DECIMAL:
+        return decimal.Decimal(dados.decode('ascii'))
+    return msgpack.ExtType(codigo, dados)
+
+
+def empacotar(dados):
+    import msgpack
+    return msgpack.packb(dados, default=codificar_msgpack, datetime=True, strict_types=False)
+
+
+def desempacotar(conteudo):
+    import msgpack
+    return msgpack.unpackb(conteudo, ext_hook=decodificar_ext, timestamp=3, strict_map_key=False)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    # o serializer entrega Decimal/datetime sem converter (TiposNativosMixin)
+    tipos_nativos = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return empacotar(data)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        import msgpack
+        try:
+            return desempacotar(stream.read())
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError('MessagePack parse error - %s' % (str(exc) or type(exc).__name__))
+
+
+class TiposNativosMixin:
+    """
+    Para serializers: quando o renderer negociado declara
+    tipos_nativos (MessagePack), DecimalField e DateTimeField
+    entregam Decimal e datetime em vez de texto
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        renderer = getattr(request, 'accepted_renderer', None)
+        if getattr(renderer, 'tipos_nativos', False):
+            for field in fields.values():
+                if isinstance(field, serializers.DecimalField):
+                    field.coerce_to_string = False
+                elif isinstance(field, serializers.DateTimeField):
+                    field.format = None
+        return fields
+
+
+# renderers/parsers dos ViewSets de produtos e usuários: os padrões
+# do REST_FRAMEWORK + MessagePack (quando o pacote está instalado)
+RENDERERS_COM_MSGPACK = [
+    *api_settings.DEFAULT_RENDERER_CLASSES, *([MessagePackRenderer] if MSGPACK_DISPONIVEL else [])
+]
+PARSERS_COM_MSGPACK = [
+    *api_settings.DEFAULT_PARSER_CLASSES, *([MessagePackParser] if MSGPACK_DISPONIVEL else [])
+]
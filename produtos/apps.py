@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProdutosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'produtos'
+
+    def ready(self):
+        # registra os receivers (tombstones das remoções)
+        from produtos import signals  # noqa: F401
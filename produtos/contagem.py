@@ -0,0 +1,108 @@
+# produtos/contagem.py
+"""
+Total das listagens paginadas de produtos sem varrer a tabela a
+cada página.
+
+- O total de cada filtro fica no cache com a versão do catálogo na
+  chave: qualquer gravação ou remoção de produto gera uma versão
+  nova, então as páginas seguintes de uma mesma listagem reaproveitam
+  a contagem até a próxima alteração
+- Acima de CONTAGEM_LIMITE_EXATO produtos não há COUNT(*): sem filtro
+  o total vem do contador mantido nas gravações (ou das estatísticas
+  do banco); com filtro, é estimado pela proporção de resultados em
+  uma amostra de CONTAGEM_AMOSTRA produtos. Esses totais voltam
+  marcados como estimados
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+from produtos.models import ContadorVersao, Produto
+from produtos.sync import versao_atual
+
+
+def estatistica_tabela():
+    """
+    Número de linhas da tabela segundo as estatísticas do banco
+    (sqlite_stat1 depois de um ANALYZE; pg_class no PostgreSQL),
+    ou None se não houver
+    """
+    tabela = Produto._meta.db_table
+    if connection.vendor == 'sqlite':
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [tabela])
+            linha = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 só existe depois do primeiro ANALYZE
+        return None
+    if not linha or linha[0] is None:
+        return None
+    valor = int(str(linha[0]).split()[0])
+    return valor if valor >= 0 else None
+
+
+def total_produtos():
+    """
+    Total de produtos pelo contador mantido em Produto.save e no
+    signal de remoção, sem varrer a tabela. bulk_create e SQL direto
+    não atualizam o contador, por isso o valor é tratado como estimativa
+    """
+    total = (
+        ContadorVersao.objects.filter(nome='produtos_total')
+        .values_list('valor', flat=True).first()
+    )
+    return total if total is not None else estatistica_tabela()
+
+
+def estimar(queryset, total):
+    """
+    Estima o total do filtro pela proporção de resultados entre os
+    primeiros CONTAGEM_AMOSTRA produtos (em ordem de id). A varredura
+    fica limitada ao tamanho da amostra
+    """
+    amostra = settings.CONTAGEM_AMOSTRA
+    corte = (
+        Produto.objects.order_by('pk')
+        .values_list('pk', flat=True)[amostra - 1:amostra]
+        .first()
+    )
+    if corte is None:
+        # a tabela tem menos produtos que a amostra: conta de verdade
+        return queryset.count(), False
+
+    encontrados = queryset.filter(pk__lte=corte).order_by().count()
+    return round(total * encontrados / amostra), True
+
+
+def contar_produtos(queryset, assinatura=''):
+    """
+    Retorna (total, estimado) para o queryset de produtos.
+    `assinatura` identifica o filtro aplicado (vazia = sem filtro) e
+    compõe a chave do cache junto com a versão do catálogo
+    """
+    chave = 'contagem:{}:{}'.format(
+        versao_atual(), hashlib.md5(assinatura.encode()).hexdigest()
+    )
+    resultado = cache.get(chave)
+    if resultado is not None:
+        return resultado
+
+    total = total_produtos()
+    if total is None or total <= settings.CONTAGEM_LIMITE_EXATO:
+        resultado = (queryset.count(), False)
+    elif not assinatura:
+        resultado = (total, True)
+    else:
+        resultado = estimar(queryset, total)
+
+    cache.set(chave, resultado, settings.CONTAGEM_CACHE_TTL)
+    return resultado
@@ -0,0 +1,178 @@
+# produtos/eventos.py
+"""
+Feed de alterações do catálogo por Server-Sent Events
+(GET /produtos/eventos/, servido pelo setup/asgi.py).
+
+Cada worker tem um HubEventos: uma única tarefa asyncio consulta
+as alterações depois da última versão vista (produtos.sync) e
+distribui para as conexões abertas neste worker. A consulta roda a
+cada SSE_INTERVALO segundos, o que leva as alterações feitas em
+outros workers/processos a todas as conexões, e é antecipada pelos
+signals quando a alteração acontece no próprio worker.
+
+O id de cada evento é a versão do produto (ou do tombstone), então
+um cliente que reconecta com Last-Event-ID recebe o que perdeu
+"""
+import asyncio
+import contextvars
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from produtos.models import Produto
+from produtos.serializers import ProdutoSyncSerializer
+from produtos.sync import TokenExpirado, listar_alteracoes, versao_atual
+
+logger = logging.getLogger(__name__)
+
+
+class LimiteConexoes(Exception):
+    pass
+
+
+def formatar_evento(versao, tipo, dados):
+    corpo = json.dumps(dados, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f'id: {versao}\nevent: {tipo}\ndata: {corpo}\n\n'.encode()
+
+
+def buscar_eventos(desde, limite=500):
+    """
+    Eventos já formatados, [(versao, bytes)], posteriores à versão
+    `desde`, e se há mais eventos além do limite.
+    "produto" para criação/alteração (o produto atual) e "removido"
+    para remoção ({"id": ...})
+    """
+    alteracoes, mais = listar_alteracoes(desde, limite)
+    eventos = []
+    for versao, item in alteracoes:
+        if isinstance(item, Produto):
+            eventos.append((versao, formatar_evento(versao, 'produto', ProdutoSyncSerializer(item).data)))
+        else:
+            eventos.append((versao, formatar_evento(versao, 'removido', {'id': item})))
+    return eventos, mais
+
+
+class Conexao:
+    """
+    Fila de uma conexão SSE. Se o cliente não consumir rápido o
+    bastante e a fila encher, a conexão é marcada como atrasada e
+    encerrada; o navegador reconecta com Last-Event-ID e recupera
+    o que perdeu pelo banco
+    """
+
+    def __init__(self):
+        self.fila = asyncio.Queue(maxsize=settings.SSE_FILA_MAXIMA)
+        self.atrasada = False
+
+
+class HubEventos:
+    def __init__(self):
+        self.conexoes = set()
+        self.ultima = 0
+        self._loop = None
+        self._tarefa = None
+        self._acordar = None
+
+    async def conectar(self):
+        if len(self.conexoes) >= settings.SSE_MAXIMO_CONEXOES:
+            raise LimiteConexoes()
+
+        conexao = Conexao()
+        self.conexoes.add(conexao)
+
+        if self._tarefa is None or self._tarefa.done():
+            self._loop = asyncio.get_running_loop()
+            self._acordar = asyncio.Event()
+            self.ultima = await sync_to_async(versao_atual)()
+            # contexto vazio: a tarefa vive além da requisição que a
+            # criou e não pode herdar o executor de threads dela
+            self._tarefa = asyncio.create_task(self._executar(), context=contextvars.Context())
+        return conexao
+
+    def desconectar(self, conexao):
+        self.conexoes.discard(conexao)
+
+    def notificar(self):
+        """
+        Antecipa a próxima consulta. Chamado pelos signals após o
+        commit, de qualquer thread
+        """
+        loop = self._loop
+        if loop is not None and not loop.is_closed() and self.conexoes:
+            loop.call_soon_threadsafe(self._acordar.set)
+
+    async def _executar(self):
+        while self.conexoes:
+            try:
+                await asyncio.wait_for(self._acordar.wait(), settings.SSE_INTERVALO)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+
+            try:
+                eventos, mais = await sync_to_async(buscar_eventos)(self.ultima)
+            except Exception:
+                logger.exception('Falha ao buscar as alterações do catálogo')
+                continue
+
+            for versao, evento in eventos:
+                self.ultima = versao
+                self.distribuir(versao, evento)
+            if mais:
+                self._acordar.set()
+
+    def distribuir(self, versao, evento):
+        for conexao in list(self.conexoes):
+            try:
+                conexao.fila.put_nowait((versao, evento))
+            except asyncio.QueueFull:
+                conexao.atrasada = True
+                self.conexoes.discard(conexao)
+
+
+hub_eventos = HubEventos()
+
+
+async def transmitir(desde=None):
+    """
+    Gerador do corpo da resposta SSE. Com `desde` (Last-Event-ID),
+    envia primeiro o que mudou depois dessa versão
+    """
+    conexao = await hub_eventos.conectar()
+    try:
+        yield f"retry: {settings.SSE_RECONEXAO_MS}\n\n".encode()
+
+        ultima = desde
+        # a conexão já está no hub: nada se perde entre a leitura do
+        # banco e os eventos ao vivo (repetidos são descartados pela versão)
+        while desde is not None:
+            try:
+                eventos, mais = await sync_to_async(buscar_eventos)(ultima)
+            except TokenExpirado:
+                yield formatar_evento(ultima, 'resync', {'erro': 'Refaça a carga completa'})
+                return
+            for versao, evento in eventos:
+                yield evento
+                ultima = versao
+            if not mais:
+                break
+
+        while not conexao.atrasada or not conexao.fila.empty():
+            try:
+                versao, evento = await asyncio.wait_for(
+                    conexao.fila.get(), settings.SSE_HEARTBEAT
+                )
+            except asyncio.TimeoutError:
+                # comentário SSE: mantém a conexão viva nos proxies
+                yield b': ping\n\n'
+                continue
+
+            if ultima is not None and versao <= ultima:
+                continue
+            yield evento
+            ultima = versao
+    finally:
+        hub_eventos.desconectar(conexao)
@@ -0,0 +1,467 @@
+# produtos/indice.py
+"""
+Índice colunar do catálogo para os filtros de faixa de preço e marca
+(GET /produtos/?preco_min=&preco_max=&marca=).
+
+Um arquivo (INDICE_DIRETORIO/produtos.idx) com colunas de tamanho
+fixo, em três ordens:
+
+- por preço: preço em centavos (int32) e id (uint32, ou uint64 se
+  algum id não couber), em ordem de (preço, id)
+- por marca: preço e id em ordem de (marca, preço, id), com o início
+  do trecho de cada marca (os nomes ficam no fim do arquivo)
+- por id: id, preço e código da marca (uint16, ou uint32 com mais de
+  65536 marcas), para achar a linha atual de um produto alterado
+
+São 26 bytes por produto (ids de 32 bits, até 65536 marcas). Uma
+consulta é uma busca binária (bisect) sobre os preços e devolve os ids
+na ordem do preço; a view busca só a página pedida com um id__in.
+
+Cada worker mapeia o arquivo com mmap: as páginas ficam no cache do
+sistema, compartilhadas por todos os workers do servidor. As gravações
+de produtos agendam a tarefa produtos.indice com INDICE_ATRASO
+segundos de atraso (como o snapshot): ela intercala as alterações do
+/produtos/sync/ desde a versão do índice nas colunas ordenadas (o
+trabalho em Python é proporcional às alterações; o resto do arquivo é
+copiado em fatias), grava um novo arquivo e o troca atomicamente; os
+workers remapeiam. A requisição só mapeia o arquivo: enquanto o índice
+está atrás da versão do catálogo (ou não existe), as consultas vão ao
+banco
+"""
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from datetime import timedelta
+from itertools import chain
+from operator import itemgetter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from produtos.models import Produto
+from produtos.sync import TokenExpirado, listar_alteracoes, versao_atual
+from tarefas.fila import enfileirar
+from tarefas.models import Tarefa
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGICO = b'PIDX'
+FORMATO = 2
+# mágico, formato, versão do catálogo, produtos, tipos (ids e códigos
+# de marca, ex.: b"IH"), marcas, bytes dos nomes
+CABECALHO = struct.Struct('<4sIQQ4sIQ')
+
+TAREFA = 'produtos.indice'
+
+
+def centavos(preco):
+    return int(preco * 100)
+
+
+def alinhar(posicao):
+    return (posicao + 7) & ~7
+
+
+def localizar(precos, ids, preco, id_, inicio=0, fim=None):
+    """
+    Posição de (preço, id) em colunas ordenadas por (preço, id)
+    """
+    fim = len(precos) if fim is None else fim
+    inicio = bisect.bisect_left(precos, preco, inicio, fim)
+    fim = bisect.bisect_right(precos, preco, inicio, fim)
+    return bisect.bisect_left(ids, id_, inicio, fim)
+
+
+class IndiceCatalogo:
+    """
+    Índice mapeado em memória (somente leitura)
+    """
+
+    def __init__(self, caminho):
+        with open(caminho, 'rb') as arquivo:
+            self.assinatura = os.fstat(arquivo.fileno()).st_ino
+            self.memoria = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magico, formato, self.versao, n, tipos, n_marcas, tamanho_nomes = (
+            CABECALHO.unpack_from(self.memoria)
+        )
+        if magico != MAGICO or formato != FORMATO:
+            raise ValueError(f'Arquivo de índice inválido: {caminho}')
+        self.total = n
+        self.tipos = tipo_id, tipo_marca = tipos[:2].decode()
+
+        visao = memoryview(self.memoria)
+        posicao = CABECALHO.size
+
+        def coluna(tipo, quantidade):
+            nonlocal posicao
+            posicao = alinhar(posicao)
+            tamanho = quantidade * array(tipo).itemsize
+            valores = visao[posicao:posicao + tamanho].cast(tipo)
+            posicao += tamanho
+            return valores
+
+        self.precos = coluna('i', n)
+        self.ids = coluna(tipo_id, n)
+        self.marca_precos = coluna('i', n)
+        self.marca_ids = coluna(tipo_id, n)
+        self.inicio_marca = coluna('I', n_marcas + 1)
+        self.id_ids = coluna(tipo_id, n)
+        self.id_precos = coluna('i', n)
+        self.id_codigos = coluna(tipo_marca, n)
+        self.marcas = json.loads(bytes(visao[posicao:posicao + tamanho_nomes]))
+        self.codigo_marca = {}
+        for codigo, marca in enumerate(self.marcas):
+            self.codigo_marca.setdefault(marca.casefold(), []).append(codigo)
+
+    def faixa(self, minimo=None, maximo=None, marca=None):
+        """
+        Ids dos produtos com minimo <= preço <= maximo (em centavos;
+        None = sem limite) e da marca (sem diferenciar maiúsculas),
+        em ordem de (preço, id)
+        """
+        minimo = -2**31 if minimo is None else minimo
+        maximo = 2**31 - 1 if maximo is None else maximo
+        if marca is None:
+            inicio = bisect.bisect_left(self.precos, minimo)
+            fim = bisect.bisect_right(self.precos, maximo)
+            return self.ids[inicio:fim].tolist()
+
+        trechos = []
+        for codigo in self.codigo_marca.get(marca.casefold(), ()):
+            fim = self.inicio_marca[codigo + 1]
+            inicio = bisect.bisect_left(self.marca_precos, minimo, self.inicio_marca[codigo], fim)
+            fim = bisect.bisect_right(self.marca_precos, maximo, inicio, fim)
+            trechos.append((inicio, fim))
+        if len(trechos) == 1:
+            inicio, fim = trechos[0]
+            return self.marca_ids[inicio:fim].tolist()
+        # marcas com grafias diferentes: intercala pela ordem de (preço, id)
+        pares = sorted(chain.from_iterable(
+            zip(self.marca_precos[inicio:fim].tolist(), self.marca_ids[inicio:fim].tolist())
+            for inicio, fim in trechos
+        ))
+        return [id_ for _, id_ in pares]
+
+
+def escrever(caminho, versao, total, tipos, marcas, colunas):
+    """
+    Grava as colunas (cada uma, uma lista de pedaços de bytes) em um
+    arquivo temporário e o troca pelo atual
+    """
+    nomes = json.dumps(marcas, ensure_ascii=False).encode()
+    temporario = caminho.with_name(f'{caminho.name}.{os.getpid()}.{threading.get_ident()}')
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(CABECALHO.pack(
+            MAGICO, FORMATO, versao, total, ''.join(tipos).encode(), len(marcas), len(nomes)
+        ))
+        for pedacos in colunas:
+            arquivo.write(bytes(alinhar(arquivo.tell()) - arquivo.tell()))
+            for pedaco in pedacos:
+                arquivo.write(pedaco)
+        arquivo.write(nomes)
+    os.replace(temporario, caminho)
+
+
+def contar_inicios(contagens):
+    inicios = array('I', [0] * (len(contagens) + 1))
+    for indice, quantidade in enumerate(contagens):
+        inicios[indice + 1] = inicios[indice] + quantidade
+    return inicios
+
+
+def gravar(caminho, versao, linhas):
+    """
+    Grava o índice das linhas (centavos, id, marca)
+    """
+    linhas.sort()
+    marcas = sorted({marca for _, _, marca in linhas})
+    codigo = {marca: indice for indice, marca in enumerate(marcas)}
+    tipo_id = 'I' if not linhas or max(id_ for _, id_, _ in linhas) < 2**32 else 'Q'
+    tipo_marca = 'H' if len(marcas) <= 2**16 else 'I'
+
+    # sorts estáveis: dentro de cada marca (e de cada id), a ordem de
+    # (preço, id) se mantém
+    por_marca = sorted(linhas, key=lambda linha: codigo[linha[2]])
+    por_id = sorted(linhas, key=itemgetter(1))
+    contagens = [0] * len(marcas)
+    for _, _, marca in linhas:
+        contagens[codigo[marca]] += 1
+
+    colunas = (
+        array('i', (preco for preco, _, _ in linhas)),
+        array(tipo_id, (id_ for _, id_, _ in linhas)),
+        array('i', (preco for preco, _, _ in por_marca)),
+        array(tipo_id, (id_ for _, id_, _ in por_marca)),
+        contar_inicios(contagens),
+        array(tipo_id, (id_ for _, id_, _ in por_id)),
+        array('i', (preco for preco, _, _ in por_id)),
+        array(tipo_marca, (codigo[marca] for _, _, marca in por_id)),
+    )
+    escrever(caminho, versao, len(linhas), (tipo_id, tipo_marca), marcas,
+             [[coluna] for coluna in colunas])
+
+
+def mesclar(colunas, tipos, remover, inserir):
+    """
+    Colunas paralelas, ordenadas, sem as linhas nas posições `remover`
+    e com as linhas `inserir` [(posição, valores)] (em ordem; cada uma
+    entra antes da linha atual na posição). Devolve, por coluna, os
+    pedaços: fatias das colunas atuais e as linhas novas
+    """
+    pedacos = [[] for _ in colunas]
+
+    def copiar(inicio, fim):
+        if inicio < fim:
+            for coluna, destino in zip(colunas, pedacos):
+                destino.append(coluna[inicio:fim])
+
+    remover = sorted(remover)
+    cursor = i_remover = i_inserir = 0
+    while i_remover < len(remover) or i_inserir < len(inserir):
+        if i_inserir < len(inserir) and (
+            i_remover == len(remover) or inserir[i_inserir][0] <= remover[i_remover]
+        ):
+            alvo = inserir[i_inserir][0]
+            copiar(cursor, alvo)
+            cursor = alvo
+            grupo = []
+            while i_inserir < len(inserir) and inserir[i_inserir][0] == alvo:
+                grupo.append(inserir[i_inserir][1])
+                i_inserir += 1
+            for indice, (tipo, destino) in enumerate(zip(tipos, pedacos)):
+                destino.append(array(tipo, (valores[indice] for valores in grupo)))
+        else:
+            copiar(cursor, remover[i_remover])
+            cursor = remover[i_remover] + 1
+            i_remover += 1
+    copiar(cursor, len(colunas[0]))
+    return pedacos
+
+
+def aplicar(caminho, atual, versao, alterados):
+    """
+    Grava o índice da versão intercalando os produtos alterados
+    {id: Produto, ou o id se removido} nas colunas do índice atual.
+    Retorna False se um id ou código de marca novo não cabe no tipo da
+    coluna (o índice é refeito)
+    """
+    tipo_id, tipo_marca = atual.tipos
+    marcas = list(atual.marcas)
+    codigo = {marca: indice for indice, marca in enumerate(marcas)}
+    novas = []
+    for item in alterados.values():
+        if isinstance(item, Produto):
+            if item.marca not in codigo:
+                codigo[item.marca] = len(marcas)
+                marcas.append(item.marca)
+            novas.append((centavos(item.preco), item.id, codigo[item.marca]))
+    if (tipo_id == 'I' and any(id_ >= 2**32 for _, id_, _ in novas)) or (
+        tipo_marca == 'H' and len(marcas) > 2**16
+    ):
+        return False
+
+    # linhas atuais dos produtos alterados (as que existem no índice)
+    antigas = []
+    for id_ in alterados:
+        linha = bisect.bisect_left(atual.id_ids, id_)
+        if linha < atual.total and atual.id_ids[linha] == id_:
+            antigas.append((atual.id_precos[linha], id_, atual.id_codigos[linha], linha))
+
+    inicio_marca = atual.inicio_marca
+    contagens = [inicio_marca[indice + 1] - inicio_marca[indice]
+                 for indice in range(len(atual.marcas))]
+    contagens.extend([0] * (len(marcas) - len(atual.marcas)))
+    for _, _, marca, _ in antigas:
+        contagens[marca] -= 1
+    for _, _, marca in novas:
+        contagens[marca] += 1
+
+    def na_marca(preco, id_, marca):
+        if marca >= len(atual.marcas):
+            return atual.total
+        return localizar(atual.marca_precos, atual.marca_ids, preco, id_,
+                       inicio_marca[marca], inicio_marca[marca + 1])
+
+    por_preco = mesclar(
+        (atual.precos, atual.ids), ('i', tipo_id),
+        [localizar(atual.precos, atual.ids, preco, id_) for preco, id_, _, _ in antigas],
+        sorted((localizar(atual.precos, atual.ids, preco, id_), (preco, id_))
+               for preco, id_, _ in novas),
+    )
+    # marcas novas vão para o fim, na ordem do código
+    por_marca = mesclar(
+        (atual.marca_precos, atual.marca_ids), ('i', tipo_id),
+        [na_marca(preco, id_, marca) for preco, id_, marca, _ in antigas],
+        [(linha, (preco, id_)) for linha, _, preco, id_ in sorted(
+            (na_marca(preco, id_, marca), marca, preco, id_) for preco, id_, marca in novas
+        )],
+    )
+    por_id = mesclar(
+        (atual.id_ids, atual.id_precos, atual.id_codigos), (tipo_id, 'i', tipo_marca),
+        [linha for _, _, _, linha in antigas],
+        sorted((bisect.bisect_left(atual.id_ids, id_), (id_, preco, marca))
+               for preco, id_, marca in novas),
+    )
+    escrever(
+        caminho, versao, atual.total - len(antigas) + len(novas), atual.tipos, marcas,
+        por_preco + por_marca + [[contar_inicios(contagens)]] + por_id,
+    )
+    return True
+
+
+def linhas_do_banco():
+    return [
+        (centavos(preco), id_, marca)
+        for id_, preco, marca in Produto.objects.order_by().values_list('id', 'preco', 'marca')
+        .iterator(chunk_size=5000)
+    ]
+
+
+def atualizar(caminho, atual, versao):
+    """
+    Grava o índice da versão: aplica as alterações desde a versão do
+    índice atual ou, sem índice (ou com alterações demais), lê o
+    catálogo inteiro
+    """
+    if atual is not None:
+        try:
+            alteracoes, mais = listar_alteracoes(atual.versao, settings.INDICE_ALTERACOES_MAXIMAS)
+        except TokenExpirado:
+            mais = True
+        if not mais:
+            alterados = {
+                item.id if isinstance(item, Produto) else item: item for _, item in alteracoes
+            }
+            if aplicar(caminho, atual, versao, alterados):
+                return
+    gravar(caminho, versao, linhas_do_banco())
+
+
+def caminho_indice():
+    return Path(settings.INDICE_DIRETORIO) / 'produtos.idx'
+
+
+def atualizar_indice():
+    """
+    Atualiza o arquivo do índice até a versão atual do catálogo
+    (tarefa produtos.indice). Retorna a versão do índice, ou None se
+    outro processo está atualizando
+    """
+    caminho = caminho_indice()
+    # lida antes do índice: ele pode ter alterações mais novas que a
+    # versão, nunca menos
+    versao = versao_atual()
+
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho.with_name(caminho.name + '.lock'), 'wb') as trava:
+        if fcntl is not None:
+            try:
+                fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+        try:
+            atual = IndiceCatalogo(caminho)
+        except FileNotFoundError:
+            atual = None
+        except (OSError, ValueError, struct.error):
+            logger.exception('Índice do catálogo ilegível: será refeito')
+            atual = None
+        if atual is not None and atual.versao >= versao:
+            return atual.versao
+        atualizar(caminho, atual, versao)
+    return versao
+
+
+_agendado_ate = 0.0
+
+
+def agendar_indice(atraso=None):
+    """
+    Agenda a atualização do índice para daqui a `atraso` segundos
+    (padrão: INDICE_ATRASO), se ainda não houver uma pendente (as
+    gravações seguintes entram na mesma atualização)
+    """
+    global _agendado_ate
+    if atraso is None:
+        atraso = settings.INDICE_ATRASO
+
+    # neste processo, uma atualização já foi agendada dentro da janela
+    if time.monotonic() < _agendado_ate:
+        return
+
+    try:
+        if not Tarefa.objects.filter(tipo=TAREFA, status=Tarefa.PENDENTE).exists():
+            enfileirar(TAREFA, executar_em=timezone.now() + timedelta(seconds=atraso))
+    except Exception:
+        # chamada depois do commit ou no meio de uma consulta: não propaga
+        logger.exception('Falha ao agendar a atualização do índice do catálogo')
+        return
+    _agendado_ate = time.monotonic() + atraso
+
+
+_atual = None
+_mutex = threading.Lock()
+
+
+def carregar(caminho):
+    """
+    Índice do arquivo, remapeado se o arquivo foi trocado
+    """
+    global _atual
+    try:
+        assinatura = os.stat(caminho).st_ino
+    except FileNotFoundError:
+        return None
+    if _atual is None or _atual.assinatura != assinatura:
+        try:
+            _atual = IndiceCatalogo(caminho)
+        except (OSError, ValueError, struct.error):
+            logger.exception('Índice do catálogo ilegível: será refeito')
+            _atual = None
+    return _atual
+
+
+def indice():
+    """
+    Índice com a versão atual do catálogo, ou None se o índice está
+    atrasado, não existe ou outra thread está remapeando o arquivo
+    (a consulta vai ao banco). Nunca gera o índice: agenda a tarefa
+    """
+    versao = versao_atual()
+
+    if not _mutex.acquire(blocking=False):
+        return None
+    try:
+        atual = carregar(caminho_indice())
+    finally:
+        _mutex.release()
+
+    if atual is not None and atual.versao >= versao:
+        return atual
+    # gravações fora dos signals (ex.: QuerySet.update) também chegam aqui
+    agendar_indice(atraso=0 if atual is None else None)
+    return None
+
+
+def ids_na_faixa(minimo=None, maximo=None, marca=None):
+    """
+    Ids (em ordem de preço) dos produtos na faixa de preço (centavos)
+    e marca, pelo índice; None se o índice não está disponível
+    """
+    atual = indice()
+    if atual is None:
+        return None
+    return atual.faixa(minimo, maximo, marca)
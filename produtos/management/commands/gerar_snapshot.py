@@ -0,0 +1,13 @@
+# produtos/management/commands/gerar_snapshot.py
+from django.core.management.base import BaseCommand
+
+from produtos.snapshot import diretorio, gerar_snapshot
+
+class Command(BaseCommand):
+    help = 'Gera o snapshot da versão atual do catálogo (GET /produtos/snapshot/)'
+
+    def handle(self, *args, **options):
+        versao = gerar_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot da versão {versao} em {diretorio() / str(versao)}'
+        ))
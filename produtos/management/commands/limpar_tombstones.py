@@ -0,0 +1,38 @@
+# produtos/management/commands/limpar_tombstones.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from produtos.models import ContadorVersao, ProdutoRemovido
+
+class Command(BaseCommand):
+    help = 'Remove tombstones de produtos antigos (réplicas mais antigas refazem a carga completa)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=30,
+            help='Mantém os tombstones dos últimos N dias (padrão: 30)'
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        antigos = ProdutoRemovido.objects.filter(removido_em__lt=limite)
+
+        with transaction.atomic():
+            ultima = antigos.aggregate(ultima=Max('versao'))['ultima']
+            if ultima is None:
+                self.stdout.write(self.style.SUCCESS('Nenhum tombstone para remover'))
+                return
+
+            # tokens anteriores a esta versão passam a receber 410
+            ContadorVersao.objects.filter(nome='produtos', tombstones_ate__lt=ultima).update(
+                tombstones_ate=ultima
+            )
+            total, _ = ProdutoRemovido.objects.filter(versao__lte=ultima).delete()
+
+        self.stdout.write(self.style.SUCCESS(f'{total} tombstone(s) removido(s)'))
@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-19 12:44
+
+from django.db import migrations, models
+
+
+def numerar_produtos(apps, schema_editor):
+    # versões iniciais em ordem de id; o contador continua daí
+    Produto = apps.get_model('produtos', 'Produto')
+    ContadorVersao = apps.get_model('produtos', 'ContadorVersao')
+    versao = 0
+    for produto_id in Produto.objects.order_by('id').values_list('id', flat=True).iterator():
+        versao += 1
+        Produto.objects.filter(id=produto_id).update(versao=versao)
+    ContadorVersao.objects.create(nome='produtos', valor=versao)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorVersao',
+            fields=[
+                ('nome', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0, verbose_name='Última versão')),
+                ('tombstones_ate', models.BigIntegerField(default=0, verbose_name='Tombstones removidos até')),
+            ],
+            options={
+                'verbose_name': 'Contador de versão',
+                'verbose_name_plural': 'Contadores de versão',
+                'db_table': 'contador_versao',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProdutoRemovido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('produto_id', models.BigIntegerField(unique=True, verbose_name='ID do produto')),
+                ('versao', models.BigIntegerField(db_index=True, verbose_name='Versão')),
+                ('removido_em', models.DateTimeField(auto_now_add=True, verbose_name='Removido em')),
+            ],
+            options={
+                'verbose_name': 'Produto removido',
+                'verbose_name_plural': 'Produtos removidos',
+                'db_table': 'produtos_removidos',
+            },
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='versao',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Versão'),
+        ),
+        migrations.RunPython(numerar_produtos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-19 13:05
+
+from django.db import migrations
+
+
+def contar_produtos(apps, schema_editor):
+    Produto = apps.get_model('produtos', 'Produto')
+    ContadorVersao = apps.get_model('produtos', 'ContadorVersao')
+    ContadorVersao.objects.update_or_create(
+        nome='produtos_total', defaults={'valor': Produto.objects.count()}
+    )
+
+
+def remover_total(apps, schema_editor):
+    ContadorVersao = apps.get_model('produtos', 'ContadorVersao')
+    ContadorVersao.objects.filter(nome='produtos_total').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0002_versao_sincronizacao'),
+    ]
+
+    operations = [
+        migrations.RunPython(contar_produtos, remover_total),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 class Produto(models.Model):
     
@@ -22,6 +22,11 @@ class Produto(models.Model):
                     verbose_name='Criado em')
     atualizado = models.DateTimeField(auto_now=True,
                     verbose_name='Atualizado em')
+    # token de sincronização: recebe o próximo valor do contador
+    # global a cada gravação (veja: proxima_versao e produtos/sync.py)
+    versao = models.BigIntegerField(default=0, db_index=True,
+                    editable=False,
+                    verbose_name='Versão')
     
     class Meta:
         # nome da tabela
@@ -37,5 +42,87 @@ class Produto(models.Model):
         "<nome>".
         """
         return f'<Produto {self.nome}>'
+
+    def save(self, *args, **kwargs):
+        """
+        Atribui a próxima versão na mesma transação da gravação: o
+        contador fica travado até o commit, então as versões ficam
+        visíveis na ordem em que foram geradas (sem "buracos"
+        preenchidos depois, que o /produtos/sync/ perderia).
+        Também mantém o total de produtos (ajustar_total) nas inclusões.
+        Obs: QuerySet.update() e bulk_create() não passam por aqui
+        """
+        with transaction.atomic():
+            adicionando = self._state.adding
+            self.versao = proxima_versao()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'versao', 'atualizado'}
+            super().save(*args, **kwargs)
+            if adicionando:
+                ajustar_total(1)
+
+
+class ProdutoRemovido(models.Model):
+    """
+    Tombstone de um produto removido, para as réplicas que
+    sincronizam pelo /produtos/sync/ removerem a cópia local
+    """
+    produto_id = models.BigIntegerField(unique=True,
+                    verbose_name='ID do produto')
+    versao = models.BigIntegerField(db_index=True,
+                    verbose_name='Versão')
+    removido_em = models.DateTimeField(auto_now_add=True,
+                    verbose_name='Removido em')
+
+    class Meta:
+        db_table = 'produtos_removidos'
+        verbose_name = 'Produto removido'
+        verbose_name_plural = 'Produtos removidos'
+
+    def __repr__(self):
+        return f'<ProdutoRemovido {self.produto_id} v{self.versao}>'
+
+
+class ContadorVersao(models.Model):
+    """
+    Contador monotônico das versões do catálogo (uma linha)
+    """
+    nome = models.CharField(max_length=30, primary_key=True)
+    valor = models.BigIntegerField(default=0,
+                    verbose_name='Última versão')
+    # versão até a qual os tombstones já foram removidos: um token
+    # mais antigo precisa refazer a sincronização completa
+    tombstones_ate = models.BigIntegerField(default=0,
+                    verbose_name='Tombstones removidos até')
+
+    class Meta:
+        db_table = 'contador_versao'
+        verbose_name = 'Contador de versão'
+        verbose_name_plural = 'Contadores de versão'
     
-    
\ No newline at end of file
+    
+
+def proxima_versao(nome='produtos'):
+    """
+    Incrementa e retorna o contador. Deve rodar dentro da transação
+    da gravação: o UPDATE trava a linha do contador até o commit
+    """
+    contador = ContadorVersao.objects.filter(nome=nome)
+    if not contador.update(valor=models.F('valor') + 1):
+        ContadorVersao.objects.get_or_create(nome=nome)
+        contador.update(valor=models.F('valor') + 1)
+    return contador.values_list('valor', flat=True).get()
+
+
+def ajustar_total(delta):
+    """
+    Soma `delta` ao total de produtos mantido na linha
+    "produtos_total" do contador (veja produtos/contagem.py).
+    Sem a linha, ela é criada com a contagem atual da tabela
+    """
+    contador = ContadorVersao.objects.filter(nome='produtos_total')
+    if not contador.update(valor=models.F('valor') + delta):
+        ContadorVersao.objects.get_or_create(
+            nome='produtos_total', defaults={'valor': Produto.objects.count()}
+        )
@@ -1,8 +1,9 @@
 # produtos/serializers.py
 from rest_framework import serializers
+from nucleo.renderizacao import TiposNativosMixin
 from produtos.models import Produto
 
-class ProdutoSerializer(serializers.ModelSerializer):
+class ProdutoSerializer(TiposNativosMixin, serializers.ModelSerializer):
     class Meta:
         model = Produto
         fields = ["id", "nome", "descricao", "preco", "marca", "criado", "atualizado"]
@@ -33,4 +34,12 @@ class ProdutoSerializer(serializers.ModelSerializer):
         value = value.strip()
         if len(value) < 10:
             raise serializers.ValidationError("A descrição deve ter pelo menos 10 caracteres.")
-        return value
\ No newline at end of file
+        return value
+
+class ProdutoSyncSerializer(ProdutoSerializer):
+    """
+    Produto com a versão, para as réplicas do /produtos/sync/
+    """
+    class Meta(ProdutoSerializer.Meta):
+        fields = ProdutoSerializer.Meta.fields + ["versao"]
+        read_only_fields = ProdutoSerializer.Meta.read_only_fields + ["versao"]
@@ -0,0 +1,42 @@
+# produtos/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from produtos.eventos import hub_eventos
+from produtos.indice import agendar_indice
+from produtos.models import Produto, ProdutoRemovido, ajustar_total, proxima_versao
+from produtos.snapshot import agendar_snapshot
+
+
+@receiver(post_delete, sender=Produto, dispatch_uid='produtos_tombstone')
+def registrar_remocao(sender, instance, **kwargs):
+    """
+    Grava o tombstone na mesma transação do DELETE (o Collector do
+    Django envia o post_delete dentro dela), inclusive para
+    QuerySet.delete()
+    """
+    ProdutoRemovido.objects.update_or_create(
+        produto_id=instance.id,
+        defaults={'versao': proxima_versao()}
+    )
+    ajustar_total(-1)
+
+
+@receiver(post_save, sender=Produto, dispatch_uid='produtos_eventos_save')
+@receiver(post_delete, sender=Produto, dispatch_uid='produtos_eventos_delete')
+def notificar_eventos(sender, **kwargs):
+    # só depois do commit a alteração fica visível para o hub
+    transaction.on_commit(hub_eventos.notificar)
+
+
+@receiver(post_save, sender=Produto, dispatch_uid='produtos_snapshot_save')
+@receiver(post_delete, sender=Produto, dispatch_uid='produtos_snapshot_delete')
+def agendar_geracao_snapshot(sender, **kwargs):
+    transaction.on_commit(agendar_snapshot)
+
+
+@receiver(post_save, sender=Produto, dispatch_uid='produtos_indice_save')
+@receiver(post_delete, sender=Produto, dispatch_uid='produtos_indice_delete')
+def agendar_atualizacao_indice(sender, **kwargs):
+    transaction.on_commit(agendar_indice)
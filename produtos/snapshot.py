@@ -0,0 +1,238 @@
+# produtos/snapshot.py
+"""
+Snapshots do catálogo em arquivos (GET /produtos/snapshot/).
+
+A cada versão do catálogo (produtos/sync.py) gera-se um diretório
+SNAPSHOT_DIRETORIO/<versao>/ com o catálogo completo e um arquivo por
+marca, em JSON e NDJSON, já comprimidos com cada codec disponível
+(nucleo.compressao). Servir o catálogo passa a ser enviar um arquivo
+pronto (sendfile), sem ORM nem serializer por requisição.
+
+- As gravações de produtos agendam a geração pela fila de tarefas com
+  SNAPSHOT_ATRASO segundos de atraso: as alterações dessa janela
+  entram em um único snapshot
+- O diretório é montado em um temporário e renomeado (atômico); o
+  arquivo "atual" aponta para a última versão completa
+- Uma versão nunca muda depois de gerada (cache imutável); as
+  SNAPSHOT_VERSOES_MANTIDAS mais recentes ficam em disco
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import slugify
+
+from nucleo.compressao import CODECS
+from nucleo.renderizacao import JSONRapidoRenderer
+from produtos.models import Produto
+from produtos.serializers import ProdutoSerializer
+from produtos.sync import versao_atual
+from tarefas.fila import enfileirar
+from tarefas.models import Tarefa
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+# extensão do arquivo comprimido de cada codec
+EXTENSOES = {'gzip': '.gz', 'br': '.br', 'zstd': '.zst'}
+
+CATALOGO = 'catalogo'
+TAREFA = 'produtos.snapshot'
+
+
+def diretorio():
+    return Path(settings.SNAPSHOT_DIRETORIO)
+
+
+def versao_disponivel():
+    """
+    Última versão com snapshot completo, ou None
+    """
+    try:
+        return int((diretorio() / 'atual').read_text())
+    except (OSError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=8)
+def indice_marcas(versao):
+    """
+    {marca: nome do arquivo} do snapshot da versão
+    """
+    with open(diretorio() / str(versao) / 'marcas.json', 'rb') as arquivo:
+        return json.load(arquivo)
+
+
+def caminho(versao, nome, formato, codec=None):
+    """
+    Arquivo do snapshot no formato pedido, comprimido com o codec
+    quando existir. Retorna (caminho, codec usado ou None), ou
+    (None, None) se o arquivo não está em disco
+    """
+    base = diretorio() / str(versao) / f'{nome}.{formato}'
+    if codec is not None and codec.nome in EXTENSOES:
+        comprimido = base.with_name(base.name + EXTENSOES[codec.nome])
+        if comprimido.is_file():
+            return comprimido, codec
+    if base.is_file():
+        return base, None
+    return None, None
+
+
+def gerar_snapshot(tamanho_lote=2000):
+    """
+    Gera o snapshot da versão atual do catálogo (nada a fazer se ele
+    já existe). Retorna a versão
+    """
+    # a versão é lida antes dos produtos: o snapshot pode trazer
+    # alterações mais novas que ela, nunca perder uma
+    versao = versao_atual()
+    raiz = diretorio()
+    destino = raiz / str(versao)
+    if destino.is_dir():
+        return versao
+
+    raiz.mkdir(parents=True, exist_ok=True)
+    temporario = Path(tempfile.mkdtemp(prefix='.gerando-', dir=raiz))
+    try:
+        # mkdtemp cria com 0700: o nginx (X-Accel-Redirect) também lê
+        temporario.chmod(0o755)
+        escrever_arquivos(temporario, versao, tamanho_lote)
+        try:
+            os.rename(temporario, destino)
+        except OSError:
+            # outro processo gerou a mesma versão antes
+            shutil.rmtree(temporario, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(temporario, ignore_errors=True)
+        raise
+
+    atualizar_ponteiro(versao)
+    remover_antigos()
+    return versao
+
+
+def escrever_arquivos(pasta, versao, tamanho_lote):
+    renderer = JSONRapidoRenderer()
+    linhas = {CATALOGO: []}
+    marcas = {}
+
+    queryset = Produto.objects.order_by('nome', 'id')
+    lote = []
+    for produto in queryset.iterator(chunk_size=tamanho_lote):
+        lote.append(produto)
+        if len(lote) >= tamanho_lote:
+            separar(renderer, lote, linhas, marcas)
+            lote = []
+    separar(renderer, lote, linhas, marcas)
+
+    for nome, itens in linhas.items():
+        escrever(pasta / f'{nome}.json', b''.join((
+            b'{"versao":', str(versao).encode(), b',"total":', str(len(itens)).encode(),
+            b',"produtos":[', b','.join(itens), b']}'
+        )))
+        escrever(pasta / f'{nome}.ndjson', b''.join(item + b'\n' for item in itens))
+
+    with open(pasta / 'marcas.json', 'wb') as arquivo:
+        arquivo.write(renderer.render(marcas))
+
+
+def separar(renderer, produtos, linhas, marcas):
+    """
+    Renderiza um lote de produtos e distribui as linhas entre o
+    catálogo completo e o arquivo de cada marca
+    """
+    for produto, dados in zip(produtos, ProdutoSerializer(produtos, many=True).data):
+        item = renderer.render(dados)
+        linhas[CATALOGO].append(item)
+        if produto.marca not in marcas:
+            marcas[produto.marca] = nome_arquivo(produto.marca, linhas)
+            linhas[marcas[produto.marca]] = []
+        linhas[marcas[produto.marca]].append(item)
+
+
+def nome_arquivo(marca, existentes):
+    base = 'marca-' + (slugify(marca) or 'sem-nome')
+    nome, sufixo = base, 2
+    while nome in existentes:
+        nome, sufixo = f'{base}-{sufixo}', sufixo + 1
+    return nome
+
+
+def escrever(arquivo, conteudo):
+    arquivo.write_bytes(conteudo)
+    for codec in CODECS.values():
+        comprimido = codec.comprimir(conteudo)
+        if len(comprimido) < len(conteudo):
+            arquivo.with_name(arquivo.name + EXTENSOES[codec.nome]).write_bytes(comprimido)
+
+
+def atualizar_ponteiro(versao):
+    """
+    Aponta "atual" para a versão (sem voltar para uma anterior, se um
+    gerador mais lento terminar depois)
+    """
+    atual = versao_disponivel()
+    if atual is not None and atual >= versao:
+        return
+    temporario = diretorio() / f'.atual-{os.getpid()}-{threading.get_ident()}'
+    temporario.write_text(str(versao))
+    os.replace(temporario, diretorio() / 'atual')
+
+
+def remover_antigos():
+    atual = versao_disponivel()
+    versoes = sorted(
+        int(pasta.name) for pasta in diretorio().iterdir()
+        if pasta.is_dir() and pasta.name.isdigit()
+    )
+    for versao in versoes[:-settings.SNAPSHOT_VERSOES_MANTIDAS]:
+        if versao != atual:
+            shutil.rmtree(diretorio() / str(versao), ignore_errors=True)
+
+    # temporários de gerações interrompidas
+    limite = time.time() - 3600
+    for pasta in diretorio().glob('.gerando-*'):
+        if pasta.stat().st_mtime < limite:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+
+_agendado_ate = 0.0
+
+
+def agendar_snapshot(atraso=None):
+    """
+    Agenda a geração do snapshot para daqui a `atraso` segundos
+    (padrão: SNAPSHOT_ATRASO), se ainda não houver uma pendente (as
+    gravações seguintes entram na mesma geração)
+    """
+    global _agendado_ate
+    if atraso is None:
+        atraso = settings.SNAPSHOT_ATRASO
+
+    # neste processo, uma geração já foi agendada dentro da janela
+    if time.monotonic() < _agendado_ate:
+        return
+
+    try:
+        if not Tarefa.objects.filter(tipo=TAREFA, status=Tarefa.PENDENTE).exists():
+            enfileirar(TAREFA, executar_em=timezone.now() + timedelta(seconds=atraso))
+    except Exception:
+        # a gravação do produto já foi confirmada: não propaga (e a
+        # próxima gravação tenta agendar de novo)
+        logger.exception('Falha ao agendar o snapshot do catálogo')
+        return
+    _agendado_ate = time.monotonic() + atraso
@@ -0,0 +1,70 @@
+# produtos/sync.py
+"""
+Sincronização incremental do catálogo (GET /produtos/sync/).
+
+Cada gravação de produto recebe a próxima versão do contador global
+(Produto.save) e cada remoção grava um tombstone com a sua versão
+(produtos/signals.py). O token de sincronização é a última versão
+que o cliente já aplicou: a resposta traz só o que mudou depois dele
+"""
+from produtos.models import ContadorVersao, Produto, ProdutoRemovido
+
+
+class TokenExpirado(Exception):
+    """
+    Os tombstones posteriores ao token já foram removidos:
+    o cliente precisa refazer a sincronização completa (desde=0)
+    """
+
+
+def versao_atual():
+    """
+    Última versão gerada: muda a cada gravação ou remoção de produto
+    """
+    return (
+        ContadorVersao.objects.filter(nome='produtos').values_list('valor', flat=True).first()
+        or 0
+    )
+
+
+def listar_alteracoes(desde, limite):
+    """
+    Até `limite` alterações posteriores à versão `desde`, em ordem de
+    versão: lista de (versao, Produto) ou (versao, id_removido), e se
+    há mais alterações além do limite.
+    desde=0 é a carga inicial: traz todos os produtos, sem tombstones
+    """
+    if desde:
+        contador = ContadorVersao.objects.filter(nome='produtos').first()
+        if contador and desde < contador.tombstones_ate:
+            raise TokenExpirado()
+
+    # uma página de cada tabela, intercaladas pela versão
+    alterados = list(
+        Produto.objects.filter(versao__gt=desde).order_by('versao')[:limite + 1]
+    )
+    removidos = []
+    if desde:
+        removidos = list(
+            ProdutoRemovido.objects
+            .filter(versao__gt=desde)
+            .order_by('versao')
+            .values_list('versao', 'produto_id')[:limite + 1]
+        )
+
+    alteracoes = sorted(
+        [(produto.versao, produto) for produto in alterados] + removidos,
+        key=lambda alteracao: alteracao[0]
+    )
+    return alteracoes[:limite], len(alteracoes) > limite
+
+
+def alteracoes_desde(desde, limite):
+    """
+    Retorna (produtos, ids_removidos, token, mais) para o /produtos/sync/
+    """
+    alteracoes, mais = listar_alteracoes(desde, limite)
+    token = alteracoes[-1][0] if alteracoes else desde
+    produtos = [item for _, item in alteracoes if isinstance(item, Produto)]
+    removidos = [item for _, item in alteracoes if not isinstance(item, Produto)]
+    return produtos, removidos, token, mais
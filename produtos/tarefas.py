@@ -0,0 +1,92 @@
+# produtos/tarefas.py
+"""
+Tarefas em segundo plano do app produtos (veja: tarefas/registro.py)
+"""
+from io import BytesIO, StringIO
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management import call_command
+from django.db.models import Avg, Max, Min
+
+from nucleo.compressao import CODECS
+from nucleo.renderizacao import MSGPACK_DISPONIVEL
+from produtos.indice import atualizar_indice
+from produtos.models import Produto
+from produtos.snapshot import gerar_snapshot
+from produtos.sync import versao_atual
+from tarefas.registro import tarefa
+
+
+@tarefa('produtos.seed')
+def seed_produtos(progresso, quantidade=10, limpar=False, lote=500):
+    """Popula o banco com produtos de teste (comando seed_produtos)"""
+    restantes = quantidade
+
+    # em lotes, para reportar o progresso
+    while restantes > 0:
+        atual = min(lote, restantes)
+        call_command('seed_produtos', quantidade=atual, limpar=limpar, stdout=StringIO())
+        limpar = False
+        restantes -= atual
+        progresso(100 * (quantidade - restantes) / quantidade,
+                  f'{quantidade - restantes} de {quantidade} processado(s)')
+
+    return {'total_produtos': Produto.objects.count()}
+
+
+@tarefa('produtos.estatisticas')
+def recalcular_estatisticas(progresso):
+    """
+    Calcula a resposta do GET /produtos/estatisticas/ da versão atual do
+    catálogo e a grava na tabela compartilhada (nucleo.coalescencia),
+    em cada formato e codec: os workers passam a entregá-la sem calcular
+    """
+    # import tardio: as views importam a fila de tarefas
+    from produtos.views import ProdutoViewSets
+
+    versao = versao_atual()
+    view = ProdutoViewSets.as_view({'get': 'estatisticas'})
+    variantes = [
+        (formato, codec)
+        for formato in ('application/json', *(['application/msgpack'] if MSGPACK_DISPONIVEL else []))
+        for codec in ('identity', *CODECS)
+    ]
+    for indice, (formato, codec) in enumerate(variantes, start=1):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': '/produtos/estatisticas/',
+            'SCRIPT_NAME': '',
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'HTTP_ACCEPT': formato,
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(),
+        }
+        if codec != 'identity':
+            environ['HTTP_ACCEPT_ENCODING'] = codec
+        view(WSGIRequest(environ))
+        progresso(100 * indice / len(variantes), f'{formato} ({codec})')
+
+    estatisticas = Produto.objects.aggregate(
+        preco_medio=Avg('preco'),
+        preco_maximo=Max('preco'),
+        preco_minimo=Min('preco')
+    )
+    return {
+        'versao': versao,
+        'total_produtos': Produto.objects.count(),
+        **{chave: float(valor or 0) for chave, valor in estatisticas.items()}
+    }
+
+
+@tarefa('produtos.snapshot')
+def gerar_snapshot_catalogo(progresso):
+    """Gera os arquivos do snapshot da versão atual do catálogo"""
+    return {'versao': gerar_snapshot()}
+
+
+@tarefa('produtos.indice')
+def atualizar_indice_catalogo(progresso):
+    """Atualiza o índice colunar de preço e marca até a versão atual"""
+    return {'versao': atualizar_indice()}
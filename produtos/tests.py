@@ -1,3 +1,771 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import runpy
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from nucleo import admissao, coalescencia, perfilamento
+from nucleo.admissao import ALTA, BAIXA, NORMAL, Controlador, Espera
+from nucleo.inicializacao import modulos_adiados_carregados
+from nucleo.models import RespostaCompartilhada
+from nucleo.renderizacao import MSGPACK_DISPONIVEL, JSONRapidoRenderer, desempacotar, empacotar
+from produtos import eventos, indice, snapshot
+from produtos.eventos import transmitir
+from produtos.models import Produto, ProdutoRemovido
+from produtos.serializers import ProdutoSerializer
+from produtos.views import ProdutoViewSets
+from produtos.sync import versao_atual
+from tarefas.fila import executar, reservar
+from tarefas.models import Tarefa
+from usuarios.models import Usuario
+
+
+class InicializacaoTest(SimpleTestCase):
+    """
+    A inicialização de um worker não importa os módulos adiados
+    para o primeiro uso (nucleo.inicializacao)
+    """
+
+    def test_modulos_pesados_fora_da_inicializacao(self):
+        self.assertEqual(modulos_adiados_carregados(), [])
+
+
+@override_settings(AUDITORIA_ATIVA=False)
+class RotasSemSessaoTest(TestCase):
+    """
+    Rotas da API sem os middlewares de sessão, mensagens e CSRF
+    (nucleo.middleware); /admin/ continua com eles
+    """
+
+    def test_api_ignora_o_cookie_de_sessao(self):
+        client = APIClient(enforce_csrf_checks=True)
+        client.cookies['sessionid'] = 'sessao-qualquer'
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = client.get('/produtos/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(any('django_session' in consulta['sql'] for consulta in consultas))
+        self.assertFalse(hasattr(resposta.wsgi_request, 'session'))
+
+        # POST sem token CSRF: a API não usa o CsrfViewMiddleware
+        resposta = client.post('/usuarios/login/', {'email': 'x@email.com', 'senha': 'x'}, format='json')
+        self.assertEqual(resposta.status_code, 401)
+
+    def test_admin_usa_sessao(self):
+        client = APIClient()
+        client.cookies['sessionid'] = 'sessao-qualquer'
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = client.get('/admin/login/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(any('django_session' in consulta['sql'] for consulta in consultas))
+        self.assertIn('csrftoken', resposta.cookies)
+
+
+@override_settings(AUDITORIA_ATIVA=False)
+class LoteTest(TestCase):
+    """
+    POST /batch/ (nucleo.lote): cada sub-requisição com o próprio status
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = Usuario.objects.create(nome='Admin', email='admin@email.com', senha='x',
+                                            administrador=True)
+        self.client.force_authenticate(self.admin)
+
+    def test_erro_em_uma_sub_requisicao_nao_derruba_o_lote(self):
+        with mock.patch.object(ProdutoViewSets, 'retrieve', side_effect=RuntimeError), \
+                self.assertLogs('nucleo.lote', 'ERROR'):
+            resposta = self.client.post('/batch/', {'requisicoes': [
+                {'id': 'lista', 'caminho': '/produtos/'},
+                {'id': 'eventos', 'caminho': '/produtos/eventos/'},
+                {'id': 'exportar', 'caminho': '/usuarios/exportar/?formato=csv'},
+                {'id': 'erro', 'caminho': '/produtos/1/'},
+                {'id': 'inexistente', 'caminho': '/nao-existe/'},
+            ]}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        status = {item['id']: item['status'] for item in resposta.json()['respostas']}
+        self.assertEqual(status, {'lista': 200, 'eventos': 400, 'exportar': 400, 'erro': 500, 'inexistente': 404})
+
+    def test_transacao_revertida_na_primeira_falha(self):
+        produto = {'nome': 'Produto', 'descricao': 'Descrição do produto', 'marca': 'Marca', 'preco': '10.00'}
+        resposta = self.client.post('/batch/', {'transacao': True, 'requisicoes': [
+            {'metodo': 'POST', 'caminho': '/produtos/', 'corpo': produto},
+            {'metodo': 'POST', 'caminho': '/produtos/', 'corpo': {**produto, 'preco': '-1'}},
+            {'metodo': 'GET', 'caminho': '/produtos/'},
+        ]}, format='json')
+        dados = resposta.json()
+        self.assertEqual(dados['transacao'], 'revertida')
+        self.assertEqual([item['status'] for item in dados['respostas']], [201, 400, 424])
+        self.assertFalse(Produto.objects.exists())
+
+        aninhado = self.client.post('/batch/', [{'metodo': 'POST', 'caminho': '/batch/'}], format='json')
+        self.assertEqual(aninhado.status_code, 400)
+
+    def test_leituras_do_cache_comprimido_no_lote(self):
+        cache.clear()
+        for indice in range(20):
+            Produto.objects.create(nome=f'Produto {indice}', descricao='Descrição do produto ' * 5,
+                                   marca='Marca', preco='10.00')
+        self.assertGreater(len(self.client.get('/produtos/').content), settings.COMPRESSAO_TAMANHO_MINIMO)
+
+        for _ in range(2):  # o segundo lote lê a resposta do cache
+            resposta = self.client.post('/batch/', {'requisicoes': [
+                {'id': 'lista', 'caminho': '/produtos/'},
+                {'id': 'estatisticas', 'caminho': '/produtos/estatisticas/'},
+            ]}, format='json', HTTP_ACCEPT_ENCODING='gzip')
+            conteudo = resposta.content
+            if resposta.get('Content-Encoding') == 'gzip':
+                conteudo = gzip.decompress(conteudo)
+            respostas = {item['id']: item for item in json.loads(conteudo)['respostas']}
+            self.assertEqual(respostas['lista']['status'], 200)
+            self.assertEqual(respostas['lista']['corpo']['total'], 20)
+            self.assertEqual(respostas['estatisticas']['corpo']['total_produtos'], 20)
+
+
+class CompressaoCacheTest(TestCase):
+    """
+    Respostas de leitura de produtos comprimidas e guardadas no cache
+    """
+
+    def setUp(self):
+        # a versão do catálogo volta a zero a cada teste (rollback)
+        cache.clear()
+        self.client = APIClient()
+        for indice in range(10):
+            Produto.objects.create(
+                nome=f'Produto {indice}',
+                descricao='Descrição longa e repetitiva do produto ' * 5,
+                marca='Marca',
+                preco='99.90'
+            )
+
+    def test_listagem_comprimida_e_servida_do_cache(self):
+        primeira = self.client.get('/produtos/', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(primeira['Content-Encoding'], 'gzip')
+        dados = json.loads(gzip.decompress(primeira.content))
+        self.assertEqual(dados['total'], 10)
+
+        # acerto no cache: só a consulta da versão do catálogo
+        with self.assertNumQueries(1):
+            repetida = self.client.get('/produtos/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(repetida.content, primeira.content)
+
+        sem_compressao = self.client.get('/produtos/', HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(sem_compressao.has_header('Content-Encoding'))
+        self.assertEqual(sem_compressao.json()['total'], 10)
+
+    def test_gravacao_invalida_o_cache(self):
+        self.client.get('/produtos/', HTTP_ACCEPT_ENCODING='gzip')
+        Produto.objects.first().delete()
+
+        resposta = self.client.get('/produtos/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(json.loads(gzip.decompress(resposta.content))['total'], 9)
+
+
+class JSONRapidoRendererTest(TestCase):
+    """
+    O renderer rápido deve produzir exatamente os bytes do JSONRenderer
+    """
+
+    def test_mesma_saida_do_json_renderer(self):
+        produto = Produto.objects.create(
+            nome='Câmera Ação', descricao='Linha 1\u2028linha 2', marca='Marca', preco='1234.50'
+        )
+        dados = {
+            'mensagem': 'Produto encontrado',
+            'produto': ProdutoSerializer(produto).data,
+            'preco': Decimal('99.90'),
+            'utc': datetime(2026, 1, 2, 3, 4, 5, 123456, tzinfo=dt_timezone.utc),
+            'fuso': datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone(timedelta(hours=-3))),
+            'data': date(2026, 1, 2),
+            'lista': [1, 2.5, None, True],
+            1: 'chave numérica',
+        }
+        self.assertEqual(
+            JSONRapidoRenderer().render(dados),
+            JSONRenderer().render(dados)
+        )
+
+    def test_floats_com_expoente_como_no_json_renderer(self):
+        dados = {'valores': [1e16, 1.5e-05, 123.25, 0.0, -2.5e+300], 'item': {'x': 1e22},
+                 'textos': ['e-mail', 'x,3e5', 'a:0.00001']}
+        self.assertEqual(JSONRapidoRenderer().render(dados), JSONRenderer().render(dados))
+
+        # não finitos: o mesmo erro do JSONRenderer (STRICT_JSON)
+        for valor in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                JSONRapidoRenderer().render({'valor': [valor]})
+
+
+@skipUnless(MSGPACK_DISPONIVEL, 'MessagePack é opcional: requer o pacote msgpack')
+class MessagePackTest(TestCase):
+    """
+    Produtos em MessagePack: Decimal e datetime com tipos nativos
+    """
+
+    def test_criacao_e_listagem_em_msgpack(self):
+        usuario = Usuario.objects.create(nome='Usuario Teste', email='teste@email.com', senha='x')
+        client = APIClient()
+        client.force_authenticate(usuario)
+
+        resposta = client.post('/produtos/', empacotar({
+            'nome': 'Produto MessagePack',
+            'descricao': 'Produto enviado em MessagePack',
+            'marca': 'Marca',
+            'preco': Decimal('1234.50'),
+        }), content_type='application/msgpack', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(resposta['Content-Type'], 'application/msgpack')
+
+        produto = desempacotar(resposta.content)['produto']
+        self.assertEqual(produto['preco'], Decimal('1234.50'))
+        self.assertIsInstance(produto['criado'], datetime)
+        self.assertEqual(produto['criado'], Produto.objects.get().criado)
+
+
+@override_settings(COMPRESSAO_CACHE_TTL=0)
+class ContagemListagemTest(TestCase):
+    """
+    Listagem paginada: o total é contado uma vez por versão do catálogo
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for indice in range(5):
+            Produto.objects.create(
+                nome=f'Produto {indice}', descricao='Descrição do produto',
+                marca='Marca', preco='10.00'
+            )
+
+    def test_total_em_cache_entre_paginas(self):
+        primeira = self.client.get('/produtos/?pagina=1&tamanho=2').json()
+        self.assertEqual((primeira['total'], primeira['total_estimado']), (5, False))
+        self.assertTrue(primeira['mais'])
+
+        with CaptureQueriesContext(connection) as consultas:
+            segunda = self.client.get('/produtos/?pagina=2&tamanho=2').json()
+        self.assertEqual(segunda['total'], 5)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in consultas.captured_queries))
+
+        Produto.objects.first().delete()
+        self.assertEqual(self.client.get('/produtos/?pagina=1&tamanho=2').json()['total'], 4)
+
+    @override_settings(CONTAGEM_LIMITE_EXATO=3)
+    def test_total_estimado_acima_do_limite(self):
+        resposta = self.client.get('/produtos/?pagina=1').json()
+        self.assertEqual((resposta['total'], resposta['total_estimado']), (5, True))
+
+        resposta = self.client.get('/produtos/?pagina=1&contar=false').json()
+        self.assertNotIn('total', resposta)
+
+
+class PerfilamentoTest(TestCase):
+    """
+    Amostragem com cProfile (nucleo.perfilamento)
+    """
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio, ignore_errors=True)
+
+    def test_token_e_um_perfilamento_por_vez(self):
+        with override_settings(PERFIL_TOKEN='segredo', PERFIL_DIRETORIO=self.diretorio):
+            client = APIClient()
+            resposta = client.get('/produtos/', HTTP_X_PROFILE='segredo')
+            self.assertEqual(resposta.status_code, 200)
+            self.assertTrue(resposta['X-Profile-Arquivo'].startswith('ProdutoViewSets.list__'))
+            self.assertFalse(client.get('/produtos/', HTTP_X_PROFILE='errado').has_header('X-Profile-Arquivo'))
+
+            # outra thread perfilando: a requisição é atendida sem perfil
+            with perfilamento._trava:
+                resposta = client.get('/produtos/', HTTP_X_PROFILE='segredo')
+            self.assertEqual(resposta.status_code, 200)
+            self.assertFalse(resposta.has_header('X-Profile-Arquivo'))
+
+            # outra ferramenta de perfilamento ativa
+            with mock.patch('cProfile.Profile.enable', side_effect=ValueError):
+                resposta = client.get('/produtos/', HTTP_X_PROFILE='segredo')
+            self.assertEqual(resposta.status_code, 200)
+            self.assertFalse(perfilamento._trava.locked())
+
+    def test_token_errado_nao_desliga_a_amostragem(self):
+        with override_settings(PERFIL_TOKEN='segredo', PERFIL_TAXA_AMOSTRAGEM=1.0,
+                               PERFIL_DIRETORIO=self.diretorio):
+            resposta = APIClient().get('/produtos/', HTTP_X_PROFILE='errado')
+        self.assertTrue(resposta.has_header('X-Profile-Arquivo'))
+
+
+class SingleFlightTest(TestCase):
+    """
+    Leituras caras com single-flight entre workers (nucleo.coalescencia)
+    """
+
+    def setUp(self):
+        cache.clear()
+        coalescencia._anteriores.clear()
+        self.client = APIClient()
+        Produto.objects.create(
+            nome='Produto', descricao='Descrição do produto', marca='Marca', preco='10.00'
+        )
+
+    def test_resposta_anterior_enquanto_outro_worker_recalcula(self):
+        self.client.get('/produtos/estatisticas/')
+        registro = RespostaCompartilhada.objects.get()
+        self.assertEqual(registro.versao, versao_atual())
+
+        # nova versão, com outro worker segurando a trava do recálculo
+        Produto.objects.create(
+            nome='Outro', descricao='Descrição do produto', marca='Marca', preco='30.00'
+        )
+        coalescencia._anteriores.clear()
+        registro.trava_ate = timezone.now() + timedelta(seconds=30)
+        registro.save()
+
+        with self.assertNumQueries(3):  # versão, linha compartilhada e tentativa de travar
+            resposta = self.client.get('/produtos/estatisticas/')
+        self.assertEqual(resposta['Cache-Status'], 'api; hit; detail=stale')
+        self.assertEqual(resposta.json()['total_produtos'], 1)
+
+        # trava liberada: recalcula e grava a nova versão
+        RespostaCompartilhada.objects.update(trava_ate=None)
+        resposta = self.client.get('/produtos/estatisticas/')
+        self.assertFalse(resposta.has_header('Cache-Status'))
+        self.assertEqual(resposta.json()['total_produtos'], 2)
+        self.assertEqual(RespostaCompartilhada.objects.get().versao, versao_atual())
+
+    def test_somente_chaves_limitadas_entre_workers(self):
+        # a busca (texto livre) coalesce só dentro do worker
+        for termo in ('a', 'b', 'c'):
+            self.assertEqual(self.client.get(f'/produtos/buscar/?nome={termo}').status_code, 200)
+        self.assertFalse(RespostaCompartilhada.objects.exists())
+
+        # a query string não cria novas linhas para as estatisticas
+        for consulta in ('', '?x=1', '?x=2'):
+            self.assertEqual(self.client.get(f'/produtos/estatisticas/{consulta}').status_code, 200)
+        self.assertEqual(RespostaCompartilhada.objects.count(), 1)
+
+    def test_nao_grava_sobre_uma_versao_mais_nova(self):
+        coalescencia.travar('chave', None)
+        RespostaCompartilhada.objects.update(versao=5, corpo=b'novo', trava_ate=None)
+
+        resultado = coalescencia.calcular_e_gravar('chave', 4, lambda: (b'antigo', []))
+        self.assertEqual(resultado, (b'antigo', []))
+        registro = RespostaCompartilhada.objects.get()
+        self.assertEqual((registro.versao, bytes(registro.corpo)), (5, b'novo'))
+
+
+@override_settings(
+    ADMISSAO_LIMITE_INICIAL=1, ADMISSAO_LIMITE_MAXIMO=1, ADMISSAO_FILA_MAXIMA=2,
+    ADMISSAO_LATENCIA_ALVO=0.5
+)
+class AdmissaoTest(TestCase):
+    """
+    Limite de concorrência, fila por prioridade e AIMD (nucleo.admissao)
+    """
+
+    def tearDown(self):
+        admissao.configurar_threads(None)
+
+    def test_fila_por_prioridade(self):
+        controlador = Controlador()
+        executando = Espera(NORMAL)
+        self.assertTrue(controlador.entrar(executando))
+        self.assertTrue(executando.admitida)
+
+        baixa, normal = Espera(BAIXA), Espera(NORMAL)
+        self.assertTrue(controlador.entrar(baixa))
+        self.assertTrue(controlador.entrar(normal))
+        self.assertFalse(baixa.admitida or normal.admitida)
+
+        # fila cheia: a alta prioridade desloca a baixa; outra baixa é recusada
+        alta = Espera(ALTA)
+        self.assertTrue(controlador.entrar(alta))
+        self.assertTrue(controlador.desistir(baixa))
+        self.assertFalse(controlador.entrar(Espera(BAIXA)))
+
+        controlador.sair(0.01)
+        self.assertTrue(alta.admitida)
+        self.assertFalse(normal.admitida)
+
+    @override_settings(ADMISSAO_LIMITE_INICIAL=10, ADMISSAO_LIMITE_MAXIMO=64)
+    def test_limite_adaptativo(self):
+        controlador = Controlador()
+        for _ in range(10):
+            controlador.entrar(Espera(ALTA))
+
+        controlador.sair(0.01)  # rápida com o worker saturado: cresce
+        self.assertAlmostEqual(controlador.limite, 10.1)
+        controlador.sair(2.0)  # lenta: cai uma vez por ida e volta
+        controlador.sair(2.0)
+        self.assertAlmostEqual(controlador.limite, 10.1 * 0.9)
+
+    @override_settings(ADMISSAO_ESPERA_MAXIMA=0.01)
+    def test_503_com_retry_after_quando_saturado(self):
+        admissao._controlador = controlador = Controlador()
+        controlador.entrar(Espera(ALTA))
+
+        resposta = APIClient().get('/produtos/')
+        self.assertEqual(resposta.status_code, 503)
+        self.assertGreaterEqual(int(resposta['Retry-After']), 1)
+
+        controlador.sair(0.01)
+        self.assertEqual(APIClient().get('/produtos/').status_code, 200)
+
+    @override_settings(ADMISSAO_LIMITE_INICIAL=16, ADMISSAO_LIMITE_MAXIMO=64,
+                       ADMISSAO_FILA_MAXIMA=64, ADMISSAO_ESPERA_MAXIMA=0.05)
+    def test_503_com_as_threads_padrao_do_gthread(self):
+        with mock.patch.dict(os.environ, {'GUNICORN_WORKER_CLASS': 'gthread'}):
+            os.environ.pop('GUNICORN_THREADS', None)
+            threads = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))['threads']
+        admissao.configurar_threads(threads)
+        self.assertLess(admissao.controlador().limite, threads)
+
+        # todas as threads do worker ocupadas por uma view lenta
+        liberar = threading.Event()
+        middleware = admissao.AdmissaoMiddleware(
+            lambda request: liberar.wait(5) and HttpResponse('ok')
+        )
+        status = []
+        executores = [
+            threading.Thread(target=lambda: status.append(
+                middleware(RequestFactory().get('/produtos/')).status_code
+            ))
+            for _ in range(threads)
+        ]
+        for executor in executores:
+            executor.start()
+        time.sleep(0.3)  # as que estão na fila esgotam o prazo
+        liberar.set()
+        for executor in executores:
+            executor.join()
+
+        self.assertEqual(status.count(200), threads // 2)
+        self.assertEqual(status.count(503), threads - status.count(200))
+        self.assertGreater(status.count(503), 0)
+
+    def test_prioridade_alta_so_com_token_valido(self):
+        usuario = Usuario.objects.create(nome='Usuario', email='usuario@email.com', senha='x')
+        fabrica = RequestFactory()
+        valido = fabrica.post('/usuarios/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(usuario)}')
+        falso = fabrica.post('/usuarios/', HTTP_AUTHORIZATION='Bearer falso')
+        self.assertEqual(admissao.prioridade(valido), ALTA)
+        self.assertEqual(admissao.prioridade(falso), NORMAL)
+
+    def test_vaga_liberada_ao_fim_do_stream(self):
+        admissao._controlador = controlador = Controlador()
+        middleware = admissao.AdmissaoMiddleware(
+            lambda request: StreamingHttpResponse(iter([b'a', b'b']))
+        )
+
+        resposta = middleware(RequestFactory().get('/usuarios/exportar/'))
+        self.assertEqual(controlador.em_execucao, 1)
+        self.assertEqual(b''.join(resposta.streaming_content), b'ab')
+        resposta.close()
+        self.assertEqual(controlador.em_execucao, 0)
+
+        # conexão fechada antes do fim do stream
+        resposta = middleware(RequestFactory().get('/usuarios/exportar/'))
+        next(iter(resposta.streaming_content))
+        resposta.close()
+        self.assertEqual(controlador.em_execucao, 0)
+
+
+class SnapshotTest(TestCase):
+    """
+    Snapshots do catálogo em arquivos (produtos.snapshot)
+    """
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio, ignore_errors=True)
+        configuracao = override_settings(SNAPSHOT_DIRETORIO=self.diretorio)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        snapshot._agendado_ate = 0.0
+        self.client = APIClient()
+        for nome, marca in (('Notebook', 'Dell'), ('Monitor', 'Dell'), ('Mouse', 'Logitech')):
+            Produto.objects.create(nome=nome, descricao='Descrição', marca=marca, preco='10.00')
+
+    def test_gravacao_agenda_uma_geracao(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Produto.objects.create(nome='Teclado', descricao='Descrição', marca='Dell', preco='5.00')
+            Produto.objects.create(nome='Cabo', descricao='Descrição', marca='Dell', preco='1.00')
+
+        tarefa = Tarefa.objects.get(tipo='produtos.snapshot')
+        self.assertGreater(tarefa.proxima_tentativa, timezone.now())
+
+    def test_sem_snapshot_responde_503_e_enfileira(self):
+        resposta = self.client.get('/produtos/snapshot/')
+        self.assertEqual(resposta.status_code, 503)
+        self.assertIn('Retry-After', resposta)
+        self.assertIn('erro', resposta.json())
+        self.assertEqual(os.listdir(self.diretorio), [])
+
+        tarefa = Tarefa.objects.get(tipo='produtos.snapshot')
+        self.assertLessEqual(tarefa.proxima_tentativa, timezone.now())
+        self.client.get('/produtos/snapshot/')
+        self.assertEqual(Tarefa.objects.filter(tipo='produtos.snapshot').count(), 1)
+
+    def test_falha_ao_enfileirar_nao_abre_a_janela(self):
+        with mock.patch.object(snapshot, 'enfileirar', side_effect=RuntimeError('fora do ar')):
+            with self.assertLogs('produtos.snapshot', 'ERROR'):
+                snapshot.agendar_snapshot()
+        self.assertEqual(snapshot._agendado_ate, 0.0)
+
+        snapshot.agendar_snapshot()
+        self.assertTrue(Tarefa.objects.filter(tipo='produtos.snapshot').exists())
+
+    def test_serve_arquivo_comprimido_igual_a_listagem(self):
+        versao = snapshot.gerar_snapshot()
+        with self.assertNumQueries(0):
+            resposta = self.client.get('/produtos/snapshot/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resposta['Content-Encoding'], 'gzip')
+        self.assertEqual(resposta['Snapshot-Versao'], str(versao))
+        conteudo = json.loads(gzip.decompress(b''.join(resposta.streaming_content)))
+        self.assertEqual(conteudo['produtos'], self.client.get('/produtos/').json()['produtos'])
+
+        repetida = self.client.get('/produtos/snapshot/', HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+
+        fixa = self.client.get(f'/produtos/snapshot/?versao={versao}&marca=Dell&formato=ndjson')
+        self.assertIn('immutable', fixa['Cache-Control'])
+        linhas = b''.join(fixa.streaming_content).splitlines()
+        self.assertEqual([json.loads(linha)['nome'] for linha in linhas], ['Monitor', 'Notebook'])
+
+
+@override_settings(COMPRESSAO_CACHE_TTL=0)
+class IndiceColunarTest(TestCase):
+    """
+    Filtros de faixa de preço e marca pelo índice colunar (produtos.indice)
+    """
+
+    def setUp(self):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        configuracao = override_settings(INDICE_DIRETORIO=diretorio)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        indice._atual = None
+        self.addCleanup(setattr, indice, '_atual', None)
+        indice._agendado_ate = 0.0
+        self.addCleanup(setattr, indice, '_agendado_ate', 0.0)
+        self.client = APIClient()
+        for preco, marca in (('10.00', 'Dell'), ('25.50', 'dell'), ('25.50', 'Acer'),
+                             ('99.99', 'Dell'), ('5.00', 'Acer')):
+            Produto.objects.create(nome=f'{marca} {preco}', descricao='Descrição',
+                                   marca=marca, preco=preco)
+
+    def ids(self, url):
+        return [produto['id'] for produto in self.client.get(url).json()['produtos']]
+
+    def esperados(self, **filtros):
+        return list(
+            Produto.objects.filter(**filtros).order_by('preco', 'id').values_list('id', flat=True)
+        )
+
+    def test_faixa_igual_ao_sql(self):
+        indice.atualizar_indice()
+        self.assertEqual(self.ids('/produtos/?preco_min=10&preco_max=25.5'),
+                         self.esperados(preco__gte=10, preco__lte=Decimal('25.5')))
+        self.assertEqual(self.ids('/produtos/?marca=DELL&preco_max=30'),
+                         self.esperados(marca__iexact='dell', preco__lte=30))
+
+        # índice em dia: versão do catálogo e a página de produtos
+        with self.assertNumQueries(2):
+            resposta = self.client.get('/produtos/?preco_min=6&pagina=1&tamanho=2').json()
+        self.assertEqual(resposta['total'], 4)
+        self.assertTrue(resposta['mais'])
+
+        # outra thread remapeando: não espera, vai ao banco
+        with indice._mutex:
+            self.assertIsNone(indice.indice())
+
+    def test_sem_indice_consulta_o_banco_e_agenda(self):
+        self.assertEqual(self.ids('/produtos/?marca=acer'), self.esperados(marca__iexact='acer'))
+        self.assertFalse(os.path.exists(indice.caminho_indice()))
+        tarefa = Tarefa.objects.get(tipo=indice.TAREFA)
+
+        executar(tarefa.id, reservar(1)[0].reserva)
+        self.assertIsNotNone(indice.indice())
+
+    def test_alteracoes_aplicadas_pela_tarefa(self):
+        indice.atualizar_indice()
+        with self.captureOnCommitCallbacks(execute=True):
+            Produto.objects.filter(marca='Acer', preco='5.00').delete()
+            produto = Produto.objects.get(preco='99.99')
+            produto.marca, produto.preco = 'Acer', Decimal('1.00')
+            produto.save()
+            Produto.objects.create(nome='Novo', descricao='Descrição', marca='Lenovo', preco='7.00')
+        self.assertEqual(Tarefa.objects.filter(tipo=indice.TAREFA).count(), 1)
+
+        # índice atrasado: as consultas vão ao banco
+        self.assertIsNone(indice.indice())
+        self.assertEqual(self.ids('/produtos/?marca=acer'), self.esperados(marca__iexact='acer'))
+
+        # intercala as alterações no índice atual, sem ler o catálogo
+        with mock.patch.object(indice, 'linhas_do_banco', side_effect=AssertionError):
+            indice.atualizar_indice()
+        atual = indice.indice()
+        self.assertEqual(atual.versao, versao_atual())
+        self.assertEqual(atual.total, Produto.objects.count())
+        self.assertEqual(atual.faixa(marca='acer'), self.esperados(marca__iexact='acer'))
+        self.assertEqual(atual.faixa(marca='lenovo'), self.esperados(marca='Lenovo'))
+        self.assertEqual(atual.faixa(maximo=800), self.esperados(preco__lte=8))
+        self.assertEqual(atual.faixa(), self.esperados())
+
+
+class SyncTest(TestCase):
+    """
+    Sincronização incremental pelo /produtos/sync/ (produtos.sync)
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.produtos = [
+            Produto.objects.create(nome=f'Produto {indice}', descricao='Descrição',
+                                   marca='Marca', preco='10.00')
+            for indice in range(5)
+        ]
+
+    def sincronizar(self, desde, limite=2):
+        resposta = self.client.get(f'/produtos/sync/?desde={desde}&limite={limite}')
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()
+
+    def test_paginas_ate_o_fim(self):
+        ids, token, mais = [], 0, True
+        while mais:
+            pagina = self.sincronizar(token)
+            self.assertLessEqual(len(pagina['produtos']), 2)
+            ids.extend(produto['id'] for produto in pagina['produtos'])
+            token, mais = pagina['token'], pagina['mais']
+        self.assertEqual(ids, [produto.id for produto in self.produtos])
+        self.assertEqual(int(token), versao_atual())
+
+        # nada mudou: o mesmo token, sem alterações
+        pagina = self.sincronizar(token)
+        self.assertEqual((pagina['produtos'], pagina['removidos'], pagina['token']), ([], [], token))
+
+    def test_alteracoes_e_tombstones_depois_do_token(self):
+        token = self.sincronizar(0, limite=100)['token']
+        alterado, removido = self.produtos[0], self.produtos[1]
+        alterado.preco = Decimal('20.00')
+        alterado.save()
+        removido_id = removido.id
+        removido.delete()
+
+        pagina = self.sincronizar(token, limite=100)
+        self.assertEqual([produto['id'] for produto in pagina['produtos']], [alterado.id])
+        self.assertEqual(pagina['removidos'], [removido_id])
+        self.assertFalse(pagina['mais'])
+
+        # a carga completa não traz tombstones
+        self.assertEqual(self.sincronizar(0, limite=100)['removidos'], [])
+
+    def test_token_expirado_depois_de_limpar_os_tombstones(self):
+        token = self.sincronizar(0, limite=100)['token']
+        self.produtos[0].delete()
+        ProdutoRemovido.objects.update(removido_em=timezone.now() - timedelta(days=2))
+
+        call_command('limpar_tombstones', dias=1, stdout=StringIO())
+        self.assertFalse(ProdutoRemovido.objects.exists())
+
+        resposta = self.client.get(f'/produtos/sync/?desde={token}')
+        self.assertEqual(resposta.status_code, 410)
+        self.assertIn('erro', resposta.json())
+        # tokens a partir da limpeza continuam válidos
+        self.assertEqual(self.sincronizar(versao_atual())['produtos'], [])
+
+    def test_parametros_invalidos(self):
+        for consulta in ('desde=abc', 'limite=0', 'desde=-1'):
+            self.assertEqual(self.client.get(f'/produtos/sync/?{consulta}').status_code, 400)
+
+
+@override_settings(SSE_INTERVALO=0.05, SSE_HEARTBEAT=0.05)
+class EventosTest(TestCase):
+    """
+    Feed de alterações por Server-Sent Events (produtos.eventos)
+    """
+
+    def setUp(self):
+        self.produtos = [
+            Produto.objects.create(nome=f'Produto {indice}', descricao='Descrição',
+                                   marca='Marca', preco='10.00')
+            for indice in range(3)
+        ]
+
+    def ler(self, desde, quantidade):
+        """
+        Os primeiros `quantidade` blocos do corpo da resposta SSE
+        """
+        async def ler():
+            corpo = transmitir(desde)
+            try:
+                return [await anext(corpo) for _ in range(quantidade)]
+            finally:
+                await corpo.aclose()
+
+        with mock.patch.object(eventos, 'hub_eventos', eventos.HubEventos()):
+            return async_to_sync(ler)()
+
+    def test_buscar_eventos_em_ordem_de_versao(self):
+        removido_id = self.produtos[0].id
+        self.produtos[0].delete()
+
+        lista, mais = eventos.buscar_eventos(self.produtos[1].versao - 1, limite=10)
+        self.assertFalse(mais)
+        self.assertEqual([versao for versao, _ in lista], sorted(versao for versao, _ in lista))
+        self.assertEqual(lista[-1][1].decode().splitlines()[:3], [
+            f'id: {versao_atual()}', 'event: removido', f'data: {{"id": {removido_id}}}'
+        ])
+        self.assertIn(b'event: produto', lista[0][1])
+
+        lista, mais = eventos.buscar_eventos(0, limite=1)
+        self.assertEqual(len(lista), 1)
+        self.assertTrue(mais)
+
+    def test_last_event_id_recebe_o_que_perdeu(self):
+        desde = self.produtos[0].versao
+        blocos = self.ler(desde, 3)
+        self.assertTrue(blocos[0].startswith(b'retry: '))
+        self.assertEqual(
+            [bloco.split(b'\n', 1)[0] for bloco in blocos[1:]],
+            [f'id: {produto.versao}'.encode() for produto in self.produtos[1:]]
+        )
+
+    def test_token_expirado_pede_resync(self):
+        desde = self.produtos[0].versao
+        self.produtos[1].delete()
+        ProdutoRemovido.objects.update(removido_em=timezone.now() - timedelta(days=2))
+        call_command('limpar_tombstones', dias=1, stdout=StringIO())
+
+        blocos = self.ler(desde, 2)
+        self.assertIn(b'event: resync', blocos[1])
+
+    def test_feed_requer_asgi(self):
+        resposta = APIClient().get('/produtos/eventos/')
+        self.assertEqual(resposta.status_code, 501)
+        self.assertIn('erro', resposta.json())
@@ -1,23 +1,55 @@
+import math
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from django.db.models import Q
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q, Avg, Count, Max, Min
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+)
+from django.utils.cache import patch_vary_headers
 
+from nucleo.compressao import cache_comprimido, negociar
+from nucleo.renderizacao import PARSERS_COM_MSGPACK, RENDERERS_COM_MSGPACK
+from produtos.contagem import contar_produtos
+from produtos.eventos import LimiteConexoes, transmitir
+from produtos.indice import ids_na_faixa
 from produtos.models import Produto
-from produtos.serializers import ProdutoSerializer
+from produtos.serializers import ProdutoSerializer, ProdutoSyncSerializer
+from produtos.snapshot import (
+    CATALOGO, FORMATOS as FORMATOS_SNAPSHOT, agendar_snapshot, caminho, diretorio,
+    indice_marcas, versao_disponivel
+)
+from produtos.sync import TokenExpirado, alteracoes_desde, versao_atual
+from tarefas.fila import enfileirar
+from tarefas.views import resposta_enfileirada
+
+# parâmetros da listagem por faixa de preço e marca
+FILTROS_FAIXA = {'preco_min', 'preco_max', 'marca'}
+
 
 class ProdutoViewSets(viewsets.ModelViewSet):  # ✅ HERDAR CORRETAMENTE
     """
     ViewSet completo para gerenciamento de produtos
+    (JSON ou MessagePack, pelo Accept/Content-Type)
     """
     queryset = Produto.objects.all()  # ✅ DEFINIR QUERYSET
     serializer_class = ProdutoSerializer  # ✅ DEFINIR SERIALIZER
     permission_classes = [IsAuthenticatedOrReadOnly]  # ✅ PERMISSÕES
+    renderer_classes = RENDERERS_COM_MSGPACK
+    parser_classes = PARSERS_COM_MSGPACK
+    # faixa "caro" do limite de requisições (nucleo.limites)
+    acoes_caras = {'buscar'}
+    parametros_caros = {'search'}
     
     # ============ ROTAS PERSONALIZADAS ============
     
     @action(detail=False, methods=['get'], url_path='buscar')
+    @cache_comprimido(versao_atual, coalescer=True)
     def buscar(self, request):
         """
         GET /produtos/buscar/ - Busca produtos por nome ou marca
@@ -32,7 +64,10 @@ class ProdutoViewSets(viewsets.ModelViewSet):  # ✅ HERDAR CORRETAMENTE
         if marca:
             queryset = queryset.filter(marca__icontains=marca)
         
-        total = queryset.count()
+        # a resposta traz todos os resultados: o total é o tamanho
+        # da lista, sem um COUNT(*) separado
+        produtos = self.get_serializer(queryset, many=True).data
+        total = len(produtos)
         
         if total == 0:
             return Response({
@@ -41,22 +76,26 @@ class ProdutoViewSets(viewsets.ModelViewSet):  # ✅ HERDAR CORRETAMENTE
                 'produtos': []
             }, status=status.HTTP_200_OK)
         
-        serializer = self.get_serializer(queryset, many=True)
-        
         return Response({
             'mensagem': f'Encontrados {total} produto(s)',
             'total': total,
-            'produtos': serializer.data
+            'produtos': produtos
         }, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=['get'], url_path='estatisticas')
+    @cache_comprimido(versao_atual, coalescer=True, entre_workers=True)
     def estatisticas(self, request):
         """
         GET /produtos/estatisticas/ - Estatísticas dos produtos
         """
-        from django.db.models import Avg, Max, Min, Count
-        
-        total = Produto.objects.count()
+        # total e preços na mesma varredura
+        estatisticas = Produto.objects.aggregate(
+            total=Count('id'),
+            preco_medio=Avg('preco'),
+            preco_maximo=Max('preco'),
+            preco_minimo=Min('preco')
+        )
+        total = estatisticas['total']
         
         if total == 0:
             return Response({
@@ -64,12 +103,6 @@ class ProdutoViewSets(viewsets.ModelViewSet):  # ✅ HERDAR CORRETAMENTE
                 'total_produtos': 0
             }, status=status.HTTP_200_OK)
         
-        estatisticas = Produto.objects.aggregate(
-            preco_medio=Avg('preco'),
-            preco_maximo=Max('preco'),
-            preco_minimo=Min('preco')
-        )
-        
         return Response({
             'mensagem': f'Estatísticas de {total} produto(s)',
             'total_produtos': total,
@@ -78,11 +111,65 @@ class ProdutoViewSets(viewsets.ModelViewSet):  # ✅ HERDAR CORRETAMENTE
             'preco_minimo': float(estatisticas['preco_minimo']) if estatisticas['preco_minimo'] else 0
         }, status=status.HTTP_200_OK)
     
+    @estatisticas.mapping.post
+    def recalcular_estatisticas(self, request):
+        """
+        POST /produtos/estatisticas/ - Recalcula as estatísticas em segundo
+        plano (tarefa produtos.estatisticas): a resposta da versão atual
+        do catálogo é gravada para o GET /produtos/estatisticas/ de todos
+        os workers; o acompanhamento fica em GET /jobs/{id}/
+        """
+        tarefa = enfileirar('produtos.estatisticas', usuario=request.user)
+        return resposta_enfileirada(request, tarefa)
+    
+    @action(detail=False, methods=['get'], url_path='sync')
+    def sync(self, request):
+        """
+        GET /produtos/sync/?desde=<token>&limite=<n>
+        Alterações do catálogo depois do token: produtos criados ou
+        alterados e ids removidos. Sem "desde", carga completa.
+        Repita com o token retornado enquanto "mais" for true
+        """
+        try:
+            desde = int(request.query_params.get('desde') or 0)
+            limite = int(request.query_params.get('limite') or 500)
+        except ValueError:
+            return Response({
+                'erro': 'Parâmetros "desde" e "limite" devem ser números inteiros'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if desde < 0 or limite < 1:
+            return Response({
+                'erro': 'Parâmetros "desde" e "limite" inválidos'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            produtos, removidos, token, mais = alteracoes_desde(desde, min(limite, 1000))
+        except TokenExpirado:
+            return Response({
+                'erro': 'Token de sincronização expirado: refaça a sincronização completa (desde=0)'
+            }, status=status.HTTP_410_GONE)
+
+        return Response({
+            'mensagem': f'{len(produtos)} alterado(s), {len(removidos)} removido(s)',
+            'produtos': ProdutoSyncSerializer(produtos, many=True).data,
+            'removidos': removidos,
+            'token': str(token),
+            'mais': mais
+        }, status=status.HTTP_200_OK)
+    
     # ============ SOBRESCREVER MÉTODOS PARA MELHOR CONTROLE ============
     
+    @cache_comprimido(versao_atual)
     def list(self, request):
         """
         GET /produtos/ - Lista todos os produtos
+        GET /produtos/?pagina=<n>&tamanho=<n>&contar=false - Paginado
+        GET /produtos/?preco_min=<v>&preco_max=<v>&marca=<marca> - Faixa
+        
+        Na listagem paginada o total vem do cache por filtro; em
+        catálogos grandes, é estimado ("total_estimado": true).
+        contar=false dispensa o total
         """
         search_param = request.query_params.get('search', None)
         queryset = self.get_queryset()
@@ -92,17 +179,134 @@ class ProdutoViewSets(viewsets.ModelViewSet):  # ✅ HERDAR CORRETAMENTE
                 Q(nome__icontains=search_param) | 
                 Q(marca__icontains=search_param)
             )
-            mensagem = f'Busca por "{search_param}" - {queryset.count()} resultado(s)'
+        
+        if FILTROS_FAIXA & request.query_params.keys():
+            return self.listar_faixa(request, queryset, search_param)
+        
+        if 'pagina' in request.query_params:
+            return self.listar_pagina(request, queryset, search_param)
+        
+        # todos os resultados na resposta: o total é o tamanho da lista
+        produtos = self.get_serializer(queryset, many=True).data
+        total = len(produtos)
+        
+        if search_param:
+            mensagem = f'Busca por "{search_param}" - {total} resultado(s)'
         else:
-            mensagem = f'Total de produtos: {queryset.count()}'
+            mensagem = f'Total de produtos: {total}'
         
-        serializer = self.get_serializer(queryset, many=True)
         return Response({
             'mensagem': mensagem,
-            'total': queryset.count(),
-            'produtos': serializer.data
+            'total': total,
+            'produtos': produtos
         }, status=status.HTTP_200_OK)
     
+    def ler_paginacao(self, request):
+        """
+        Retorna (pagina, tamanho, erro): erro é a Response 400 quando
+        os parâmetros são inválidos
+        """
+        try:
+            pagina = int(request.query_params['pagina'])
+            tamanho = int(
+                request.query_params.get('tamanho') or settings.REST_FRAMEWORK['PAGE_SIZE']
+            )
+        except ValueError:
+            return None, None, Response({
+                'erro': 'Parâmetros "pagina" e "tamanho" devem ser números inteiros'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if pagina < 1 or tamanho < 1:
+            return None, None, Response({
+                'erro': 'Parâmetros "pagina" e "tamanho" inválidos'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return pagina, min(tamanho, settings.PRODUTOS_TAMANHO_MAXIMO), None
+    
+    def listar_pagina(self, request, queryset, search_param):
+        pagina, tamanho, erro = self.ler_paginacao(request)
+        if erro:
+            return erro
+        
+        inicio = (pagina - 1) * tamanho
+        # um item a mais indica se existe a próxima página
+        produtos = list(queryset[inicio:inicio + tamanho + 1])
+        mais = len(produtos) > tamanho
+        produtos = produtos[:tamanho]
+        
+        dados = {}
+        if request.query_params.get('contar', '').lower() in ('false', '0', 'nao', 'não'):
+            dados['mensagem'] = f'Página {pagina}: {len(produtos)} produto(s)'
+        else:
+            total, estimado = contar_produtos(
+                queryset, f'search={search_param}' if search_param else ''
+            )
+            aproximado = 'cerca de ' if estimado else ''
+            if search_param:
+                dados['mensagem'] = f'Busca por "{search_param}" - {aproximado}{total} resultado(s)'
+            else:
+                dados['mensagem'] = f'Total de produtos: {aproximado}{total}'
+            dados['total'] = total
+            dados['total_estimado'] = estimado
+        
+        dados.update({
+            'pagina': pagina,
+            'tamanho': tamanho,
+            'mais': mais,
+            'produtos': self.get_serializer(produtos, many=True).data
+        })
+        return Response(dados, status=status.HTTP_200_OK)
+    
+    def listar_faixa(self, request, queryset, search_param):
+        """
+        Produtos por faixa de preço e marca, em ordem de preço. Sem
+        busca por texto, os ids vêm do índice colunar (produtos.indice)
+        e só a página pedida é lida do banco; o total é exato.
+        
+        O índice só é usado na versão atual do catálogo: depois de cada
+        gravação, as consultas vão ao banco (varredura SQL) até a tarefa
+        produtos.indice rodar, por pelo menos INDICE_ATRASO segundos, e
+        indefinidamente se nenhum rodar_worker estiver processando a fila
+        """
+        try:
+            minimo = request.query_params.get('preco_min')
+            maximo = request.query_params.get('preco_max')
+            # em centavos, arredondados para dentro da faixa
+            minimo = math.ceil(Decimal(minimo) * 100) if minimo else None
+            maximo = math.floor(Decimal(maximo) * 100) if maximo else None
+        except (InvalidOperation, ValueError, OverflowError):
+            return Response({
+                'erro': 'Parâmetros "preco_min" e "preco_max" devem ser números'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        marca = request.query_params.get('marca') or None
+        
+        ids = None if search_param else ids_na_faixa(minimo, maximo, marca)
+        if ids is None:
+            # busca por texto, ou o índice está sendo atualizado
+            if minimo is not None:
+                queryset = queryset.filter(preco__gte=Decimal(minimo) / 100)
+            if maximo is not None:
+                queryset = queryset.filter(preco__lte=Decimal(maximo) / 100)
+            if marca:
+                queryset = queryset.filter(marca__iexact=marca)
+            ids = list(queryset.order_by('preco', 'id').values_list('id', flat=True))
+        
+        total = len(ids)
+        dados = {'mensagem': f'{total} produto(s) na faixa', 'total': total}
+        if 'pagina' in request.query_params:
+            pagina, tamanho, erro = self.ler_paginacao(request)
+            if erro:
+                return erro
+            inicio = (pagina - 1) * tamanho
+            ids = ids[inicio:inicio + tamanho]
+            dados.update({'pagina': pagina, 'tamanho': tamanho, 'mais': total > inicio + tamanho})
+        
+        por_id = Produto.objects.in_bulk(ids)
+        produtos = [por_id[id_] for id_ in ids if id_ in por_id]
+        dados['produtos'] = self.get_serializer(produtos, many=True).data
+        return Response(dados, status=status.HTTP_200_OK)
+    
+    @cache_comprimido(versao_atual)
     def retrieve(self, request, pk=None):
         """
         GET /produtos/{id}/ - Busca produto por ID
@@ -198,4 +402,129 @@ class ProdutoViewSets(viewsets.ModelViewSet):  # ✅ HERDAR CORRETAMENTE
         except Produto.DoesNotExist:
             return Response({
                 'erro': 'Produto não encontrado'
-            }, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            }, status=status.HTTP_404_NOT_FOUND)
+
+
+async def eventos(request):
+    """
+    GET /produtos/eventos/ - Feed de alterações (Server-Sent Events)
+    Eventos "produto" (criado/alterado), "removido" e "resync".
+    Retoma do cabeçalho Last-Event-ID (ou ?desde=<versao>)
+    """
+    if request.method != 'GET':
+        return JsonResponse({'erro': 'Método não permitido'}, status=405)
+
+    # em WSGI o worker ficaria preso a uma conexão
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            'erro': 'O feed de eventos requer o servidor ASGI (setup.asgi)'
+        }, status=501)
+
+    desde = request.headers.get('Last-Event-ID') or request.GET.get('desde')
+    try:
+        desde = int(desde) if desde else None
+    except ValueError:
+        return JsonResponse({'erro': 'Last-Event-ID inválido'}, status=400)
+
+    try:
+        corpo = transmitir(desde)
+        # conecta já aqui para responder 503 antes de abrir o stream
+        primeiro = await anext(corpo)
+    except LimiteConexoes:
+        resposta = JsonResponse({'erro': 'Limite de conexões atingido'}, status=503)
+        resposta['Retry-After'] = '5'
+        return resposta
+
+    async def stream():
+        yield primeiro
+        async for parte in corpo:
+            yield parte
+
+    resposta = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    resposta['Cache-Control'] = 'no-cache'
+    resposta['X-Accel-Buffering'] = 'no'  # nginx: não bufferizar
+    return resposta
+
+
+def snapshot(request):
+    """
+    GET /produtos/snapshot/?formato=json|ndjson&marca=<marca>
+    Catálogo completo (ou de uma marca) do último snapshot gerado,
+    enviado direto do arquivo já comprimido (produtos.snapshot).
+    Pode estar alguns segundos atrás das últimas gravações.
+    Com ?versao=<n> (cabeçalho Snapshot-Versao), a resposta não muda
+    mais e fica no cache do cliente como imutável.
+    Antes do primeiro snapshot: 503 com Retry-After (geração na fila)
+    """
+    if request.method != 'GET':
+        return JsonResponse({'erro': 'Método não permitido'}, status=405)
+
+    padrao = 'ndjson' if 'application/x-ndjson' in request.headers.get('Accept', '') else 'json'
+    formato = request.GET.get('formato') or padrao
+    if formato not in FORMATOS_SNAPSHOT:
+        return JsonResponse({
+            'erro': f"Formato inválido: use {', '.join(sorted(FORMATOS_SNAPSHOT))}"
+        }, status=400)
+
+    fixa = 'versao' in request.GET
+    if fixa:
+        try:
+            versao = int(request.GET['versao'])
+        except ValueError:
+            return JsonResponse({'erro': 'Parâmetro "versao" deve ser um número inteiro'}, status=400)
+    else:
+        versao = versao_disponivel()
+        if versao is None:
+            # nenhum snapshot ainda: a geração vai para a fila de
+            # tarefas, nunca para a requisição
+            agendar_snapshot(atraso=0)
+            resposta = JsonResponse({
+                'erro': 'Snapshot do catálogo em geração. Tente novamente em instantes'
+            }, status=503)
+            resposta['Retry-After'] = '5'
+            return resposta
+
+    nome = CATALOGO
+    if 'marca' in request.GET:
+        try:
+            nome = indice_marcas(versao).get(request.GET['marca'])
+        except OSError:
+            nome = None
+        if nome is None:
+            return JsonResponse({'erro': 'Marca não encontrada no snapshot'}, status=404)
+
+    arquivo, codec = caminho(versao, nome, formato, negociar(request))
+    if arquivo is None:
+        return JsonResponse({
+            'erro': f'Snapshot da versão {versao} não disponível'
+        }, status=404)
+
+    etag = '"{}-{}-{}-{}"'.format(versao, nome, formato, codec.nome if codec else 'identity')
+    if request.headers.get('If-None-Match') == etag:
+        resposta = HttpResponseNotModified()
+    elif settings.SNAPSHOT_X_ACCEL:
+        # o nginx envia o arquivo; o worker fica livre na hora
+        resposta = HttpResponse(content_type=FORMATOS_SNAPSHOT[formato])
+        resposta['X-Accel-Redirect'] = '{}/{}'.format(
+            settings.SNAPSHOT_X_ACCEL.rstrip('/'), arquivo.relative_to(diretorio()).as_posix()
+        )
+    else:
+        # sendfile quando o servidor suporta (wsgi.file_wrapper do gunicorn)
+        resposta = FileResponse(
+            open(arquivo, 'rb'), content_type=FORMATOS_SNAPSHOT[formato],
+            filename=f'{nome}.{formato}'
+        )
+
+    if codec is not None:
+        resposta['Content-Encoding'] = codec.nome
+    patch_vary_headers(resposta, ('Accept', 'Accept-Encoding'))
+    resposta['ETag'] = etag
+    resposta['Snapshot-Versao'] = str(versao)
+    if fixa:
+        resposta['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        parametros = request.GET.copy()
+        parametros['versao'] = str(versao)
+        resposta['Content-Location'] = f'{request.path}?{parametros.urlencode()}'
+        resposta['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return resposta
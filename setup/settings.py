@@ -46,22 +46,58 @@ INSTALLED_APPS = [
 	# o que vc cria
 	'usuarios',
     'produtos',
+    'nucleo',
+    'tarefas',
 ]
 
 REST_FRAMEWORK = {
 	'DEFAULT_PAGINATION_CLASS': 
 	'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # API stateless: apenas Bearer token (JWT).
+    # SessionAuthentication é opt-in por rota (veja ROTAS_COM_SESSAO)
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'usuarios.authentication.CustomJWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # JSON com orjson quando instalado (mesma saída do JSONRenderer);
+    # sem ele, json da biblioteca padrão (veja nucleo/renderizacao.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'nucleo.renderizacao.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'nucleo.renderizacao.JSONRapidoParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # limite de requisições por faixa (GCRA, veja nucleo/limites.py)
+    'DEFAULT_THROTTLE_CLASSES': (
+        'nucleo.limites.AnonimoThrottle',
+        'nucleo.limites.UsuarioThrottle',
+        'nucleo.limites.CaroThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'anonimo': '300/min',  # por IP
+        'usuario': '1200/min',  # por usuário autenticado
+        'caro': '30/min',  # login, cadastro, senhas e buscas
+    },
 }
 
 
+# ============================================
+# Armazém do limite de requisições (nucleo.limites)
+# ============================================
+# "memoria": memória compartilhada entre os workers do gunicorn
+# (um servidor). "cache": o cache LIMITES_CACHE, para vários
+# servidores com um cache compartilhado (Redis)
+LIMITES_ARMAZEM = 'memoria'
+LIMITES_CACHE = 'default'
+LIMITES_SLOTS = 65536  # chaves (IPs/usuários) acompanhadas: 16 bytes cada
+
+
 # ============================================
 # Configurações do JWT
 # ============================================
@@ -85,15 +121,204 @@ SIMPLE_JWT = {
 }
 
 
+# ============================================
+# Configurações de E-mail
+# ============================================
+# Em desenvolvimento os e-mails são impressos no console.
+# Em produção use o backend SMTP:
+# EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'Tech Solutions <nao-responda@techsolutions.com.br>'
+
+# Fila de e-mails (outbox) processada pelo comando enviar_emails
+EMAIL_FILA_MAX_TENTATIVAS = 5  # depois disso o e-mail vai para "morto"
+EMAIL_FILA_ESPERA_BASE = 30  # segundos (dobra a cada tentativa)
+EMAIL_FILA_ESPERA_MAXIMA = 3600  # segundos
+EMAIL_FILA_LEASE = 300  # segundos que um lote fica reservado para um worker
+EMAIL_FILA_RETENCAO_DIAS = 7  # enviados ficam esse tempo na tabela (sem o corpo)
+
+
+# ============================================
+# Auditoria de autenticação (usuarios.auditoria)
+# ============================================
+# Os eventos ficam em um buffer em memória e são gravados em lote
+# por uma thread em segundo plano, fora do caminho da requisição
+AUDITORIA_ATIVA = True
+AUDITORIA_CAPACIDADE = 10000  # eventos no buffer (os mais antigos são descartados)
+AUDITORIA_TAMANHO_LOTE = 200  # grava quando atingir esse número de eventos...
+AUDITORIA_INTERVALO_MS = 1000  # ...ou a cada intervalo
+
+
+# ============================================
+# Fila de tarefas em segundo plano (app tarefas)
+# ============================================
+# Tarefas gravadas no banco e executadas pelo comando rodar_worker
+TAREFAS_MAX_TENTATIVAS = 3  # padrão, quando a tarefa não define
+TAREFAS_ESPERA_BASE = 10  # segundos (dobra a cada tentativa)
+TAREFAS_ESPERA_MAXIMA = 600  # segundos
+TAREFAS_LEASE = 300  # segundos sem sinal de progresso até outro worker assumir
+TAREFAS_INTERVALO_PROGRESSO = 1.0  # segundos entre gravações do progresso
+TAREFAS_MAX_POR_PROCESSO = 100  # tarefas antes de reciclar o processo do pool
+TAREFAS_DIRETORIO = BASE_DIR / 'arquivos'  # arquivos lidos e gravados pelas tarefas (importações e exportações)
+
+
+# ============================================
+# Snapshots do catálogo (GET /produtos/snapshot/, produtos.snapshot)
+# ============================================
+SNAPSHOT_DIRETORIO = BASE_DIR / 'snapshots'
+SNAPSHOT_ATRASO = 5  # segundos entre a gravação e a geração (agrupa alterações)
+SNAPSHOT_VERSOES_MANTIDAS = 2  # versões em disco (downloads em andamento)
+# com nginx: prefixo de uma location "internal" com alias para
+# SNAPSHOT_DIRETORIO; o nginx envia o arquivo (X-Accel-Redirect)
+SNAPSHOT_X_ACCEL = ''
+
+
+# ============================================
+# Índice colunar de preço e marca (produtos.indice)
+# ============================================
+INDICE_DIRETORIO = BASE_DIR / 'indices'  # arquivo mapeado por todos os workers
+# segundos entre a gravação e a atualização (agrupa alterações). Nesse
+# intervalo, e enquanto nenhum rodar_worker processar a tarefa, os
+# filtros de preço e marca vão ao banco
+INDICE_ATRASO = 1
+# acima disso, o índice é refeito do banco em vez de aplicar as alterações
+INDICE_ALTERACOES_MAXIMAS = 5000
+
+
+# ============================================
+# Requisições em lote (POST /batch/, nucleo.lote)
+# ============================================
+LOTE_MAXIMO = 20  # sub-requisições por lote
+LOTE_THREADS = 4  # leituras executadas ao mesmo tempo (por worker)
+
+
+# ============================================
+# Listagem paginada de produtos (GET /produtos/?pagina=, produtos.contagem)
+# ============================================
+PRODUTOS_TAMANHO_MAXIMO = 100  # produtos por página
+CONTAGEM_LIMITE_EXATO = 50000  # acima disso o total é estimado, sem COUNT(*)
+CONTAGEM_AMOSTRA = 5000  # produtos lidos para estimar o total de uma busca
+CONTAGEM_CACHE_TTL = 300  # segundos (a chave muda a cada gravação de produto)
+
+
+# ============================================
+# Feed de eventos do catálogo (GET /produtos/eventos/, produtos.eventos)
+# ============================================
+SSE_INTERVALO = 1.0  # segundos entre consultas (alterações de outros workers)
+SSE_HEARTBEAT = 15  # segundos sem eventos até enviar um comentário de keep-alive
+SSE_FILA_MAXIMA = 256  # eventos pendentes por conexão antes de desconectá-la
+SSE_MAXIMO_CONEXOES = 1000  # conexões abertas por worker
+SSE_RECONEXAO_MS = 3000  # espera sugerida ao navegador antes de reconectar
+
+
+# ============================================
+# Controle de admissão por worker (nucleo.admissao)
+# ============================================
+ADMISSAO_ATIVA = True
+# com gthread, o limite fica em no máximo metade das threads do worker
+# (GUNICORN_THREADS): a outra metade é a fila deste controle
+ADMISSAO_LIMITE_INICIAL = 16  # requisições simultâneas por worker
+ADMISSAO_LIMITE_MINIMO = 2
+ADMISSAO_LIMITE_MAXIMO = 64
+ADMISSAO_LATENCIA_ALVO = 0.5  # segundos; acima disso o limite cai
+ADMISSAO_FATOR_REDUCAO = 0.9
+ADMISSAO_FILA_MAXIMA = 64  # requisições esperando por worker
+ADMISSAO_ESPERA_MAXIMA = 1.0  # segundos na fila antes do 503
+# conexões longas (SSE) e o admin não ocupam o limite
+ADMISSAO_ROTAS_ISENTAS = ['/admin/', '/produtos/eventos/']
+
+
+# Sessão, autenticação por sessão, mensagens e CSRF só rodam
+# nas rotas de ROTAS_COM_SESSAO (nucleo.middleware). As rotas
+# da API usam uma cadeia enxuta, sem acessar django_session
 MIDDLEWARE = [
+    'nucleo.admissao.AdmissaoMiddleware',
+    'nucleo.perfilamento.PerfilamentoMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'nucleo.compressao.CompressaoMiddleware',
+    'nucleo.limites.CabecalhosLimiteMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'nucleo.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'nucleo.middleware.CsrfViewMiddleware',
+    'nucleo.middleware.AuthenticationMiddleware',
+    'nucleo.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'nucleo.idempotencia.IdempotenciaMiddleware',
+]
+
+# ============================================
+# Compressão das respostas (nucleo.compressao)
+# ============================================
+# Ordem de preferência entre os aceitos pelo cliente; br e zstd
+# só entram com os pacotes brotli/zstandard (ou Python 3.14)
+COMPRESSAO_CODECS = ['zstd', 'br', 'gzip']
+COMPRESSAO_TAMANHO_MINIMO = 860  # bytes; menores não compensam o cabeçalho
+COMPRESSAO_NIVEL_GZIP = 6
+COMPRESSAO_NIVEL_BROTLI = 5
+COMPRESSAO_NIVEL_ZSTD = 3
+# segundos que uma resposta de leitura de produtos fica no cache,
+# já comprimida (0 = desligado). A chave inclui a versão do catálogo
+COMPRESSAO_CACHE_TTL = 300
+
+# Single-flight das leituras caras (buscar, estatisticas; nucleo.coalescencia).
+# Entre workers, pela tabela respostas_compartilhadas, só as estatisticas
+COALESCENCIA_ESPERA = 5  # segundos esperando o cálculo de outra requisição
+COALESCENCIA_TRAVA = 30  # segundos até a trava de um worker que morreu vencer
+COALESCENCIA_SWR = True  # entrega a resposta anterior enquanto recalcula
+COALESCENCIA_MAXIMO_ANTERIORES = 1000  # respostas anteriores guardadas por worker
+COALESCENCIA_RETENCAO = 24 * 60 * 60  # segundos (veja: manage.py limpar_respostas)
+
+# Cache local de cada worker. Para compartilhar entre workers, use
+# 'django.core.cache.backends.redis.RedisCache' com LOCATION
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+}
+
+# ============================================
+# Idempotency-Key (nucleo.idempotencia)
+# ============================================
+IDEMPOTENCIA_TTL = 24 * 60 * 60  # segundos que a resposta fica guardada
+IDEMPOTENCIA_ESPERA = 10  # segundos esperando uma requisição repetida em andamento
+IDEMPOTENCIA_ABANDONO = 120  # segundos até uma chave "processando" ser considerada abandonada
+IDEMPOTENCIA_TAMANHO_MAXIMO = 1024 * 1024  # bytes; respostas maiores não são guardadas
+
+# ============================================
+# Perfilamento de requisições (nucleo.perfilamento)
+# ============================================
+# Fração das requisições perfiladas com cProfile (0.0 = desligado)
+PERFIL_TAXA_AMOSTRAGEM = 0.0
+# Requisições com o cabeçalho "X-Profile: <token>" são sempre
+# perfiladas. Vazio = desativado
+PERFIL_TOKEN = ''
+# Onde os arquivos .prof são salvos (veja: manage.py relatorio_perfil)
+PERFIL_DIRETORIO = BASE_DIR / 'perfis'
+
+# Orçamento de inicialização a frio de um worker, em ms
+# (verificado por: manage.py medir_inicializacao --verificar). Os
+# módulos que não podem ser importados na inicialização estão em
+# nucleo.inicializacao.MODULOS_ADIADOS (verificados também pelos testes)
+ORCAMENTO_INICIALIZACAO_MS = 3000
+
+# Funções executadas em cada worker do gunicorn logo após o fork
+# (veja: gunicorn.conf.py e nucleo/aquecimento.py). Só caches do
+# processo: uma conexão com o banco aberta aqui ficaria na thread do
+# post_fork, e as threads das requisições abrem as próprias
+AQUECIMENTO = [
+    'nucleo.aquecimento.aquecer_urls',
+    'nucleo.aquecimento.aquecer_serializers',
+    'nucleo.aquecimento.aquecer_indice',
+]
+
+# Rotas que usam sessão/cookies. Para aceitar login por sessão
+# em uma rota da API, adicione o prefixo aqui e inclua
+# 'rest_framework.authentication.SessionAuthentication' em
+# authentication_classes da view
+ROTAS_COM_SESSAO = [
+    '/admin/',
 ]
 
 # Configuração do CORS
@@ -121,6 +346,16 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-request-with',
+    'idempotency-key',
+]
+
+# cabeçalhos de resposta legíveis pelo JavaScript de outras origens
+CORS_EXPOSE_HEADERS = [
+    'ratelimit-limit',
+    'ratelimit-remaining',
+    'ratelimit-reset',
+    'ratelimit-policy',
+    'retry-after',
 ]
 
 
@@ -153,6 +388,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # a API e os processos do rodar_worker escrevem ao mesmo
+            # tempo: espera até 20s pelo lock de escrita (a reserva de
+            # tarefas é um único UPDATE, veja tarefas.fila.reservar)
+            'timeout': 20,
+        },
     }
 }
 
@@ -2,15 +2,22 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from produtos.views import ProdutoViewSets
+from produtos.views import ProdutoViewSets, eventos, snapshot
 from usuarios.views import UsuarioViewSets
+from tarefas.views import TarefaViewSet
+from nucleo.lote import LoteView
 
 # Criar apenas UM router para toda a aplicação
 router = DefaultRouter()
 router.register(r'usuarios', UsuarioViewSets, basename='usuarios')
 router.register(r'produtos', ProdutoViewSets, basename='produtos')
+router.register(r'jobs', TarefaViewSet, basename='jobs')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('batch/', LoteView.as_view(), name='batch'),
+    # antes do router: senão "eventos" seria lido como o {id} de um produto
+    path('produtos/eventos/', eventos, name='produtos-eventos'),
+    path('produtos/snapshot/', snapshot, name='produtos-snapshot'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,11 @@
+# tarefas/admin.py
+from django.contrib import admin
+from .models import Tarefa
+
+@admin.register(Tarefa)
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'status', 'prioridade', 'progresso', 'tentativas', 'criado')
+    list_filter = ('status', 'tipo')
+    search_fields = ('tipo', 'mensagem')
+    date_hierarchy = 'criado'
+    readonly_fields = ('reserva', 'resultado', 'ultimo_erro', 'criado', 'iniciado_em', 'concluido_em')
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class TarefasConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'tarefas'
+
+    def ready(self):
+        # registra as tarefas declaradas no módulo tarefas.py de cada app
+        # (ex: produtos/tarefas.py, usuarios/tarefas.py)
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('tarefas')
@@ -0,0 +1,229 @@
+# tarefas/fila.py
+import inspect
+import logging
+import random
+import time
+import traceback
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from tarefas import registro
+from tarefas.models import Tarefa
+
+logger = logging.getLogger(__name__)
+
+
+class TarefaPerdida(Exception):
+    """
+    O lease da tarefa venceu e ela foi reservada por outro worker
+    """
+
+
+def enfileirar(tipo, parametros=None, prioridade=0, usuario=None, max_tentativas=None,
+               executar_em=None):
+    """
+    Grava uma tarefa na fila e retorna o objeto criado.
+    Dentro de uma transação, a tarefa só fica visível para o
+    worker depois do commit. Com `executar_em`, só é reservada a
+    partir desse momento.
+    Lança TypeError se os parâmetros não servem para a tarefa
+    """
+    funcao = registro.obter(tipo)
+    inspect.signature(funcao).bind(None, **(parametros or {}))
+    return Tarefa.objects.create(
+        tipo=tipo,
+        parametros=parametros or {},
+        prioridade=prioridade,
+        usuario=usuario,
+        max_tentativas=(
+            max_tentativas or funcao.max_tentativas or settings.TAREFAS_MAX_TENTATIVAS
+        ),
+        proxima_tentativa=executar_em or timezone.now(),
+    )
+
+
+def caminho_no_diretorio(nome):
+    """
+    Caminho do arquivo `nome` (relativo a TAREFAS_DIRETORIO) usado
+    por uma tarefa. Lança ValueError se o caminho sai do diretório:
+    os parâmetros das tarefas vêm das requisições
+    """
+    base = Path(settings.TAREFAS_DIRETORIO).resolve()
+    caminho = (base / str(nome)).resolve()
+    if caminho == base or not caminho.is_relative_to(base):
+        raise ValueError(f'Arquivo fora do diretório das tarefas: {nome}')
+    return caminho
+
+
+def calcular_proxima_tentativa(tentativas, agora=None):
+    """
+    Backoff exponencial com jitter (mesma regra da fila de e-mails)
+    """
+    agora = agora or timezone.now()
+    espera = min(
+        settings.TAREFAS_ESPERA_MAXIMA,
+        settings.TAREFAS_ESPERA_BASE * (2 ** max(tentativas - 1, 0))
+    )
+    espera += random.uniform(0, espera * 0.1)
+    return agora + timedelta(seconds=espera)
+
+
+def reservar(quantidade):
+    """
+    Reserva até `quantidade` tarefas prontas, em ordem de prioridade.
+
+    Uma tarefa está pronta se estiver pendente, ou em execução com o
+    lease vencido (o worker que a reservou morreu). No PostgreSQL as
+    linhas são travadas com SELECT ... FOR UPDATE SKIP LOCKED; no
+    SQLite (sem SKIP LOCKED) a reserva é um único UPDATE, e só um
+    worker fica com cada tarefa
+    """
+    agora = timezone.now()
+    reserva = uuid.uuid4().hex
+    prontas = Tarefa.objects.filter(
+        status__in=[Tarefa.PENDENTE, Tarefa.EXECUTANDO],
+        proxima_tentativa__lte=agora
+    )
+
+    # lease vencido e sem tentativas restantes: não roda de novo
+    # (a tarefa provavelmente derruba o processo que a executa)
+    prontas.filter(
+        status=Tarefa.EXECUTANDO, tentativas__gte=F('max_tentativas')
+    ).update(
+        status=Tarefa.FALHOU,
+        reserva='',
+        ultimo_erro='Lease vencido: o worker parou durante a execução',
+        concluido_em=agora
+    )
+
+    candidatas = prontas.order_by('-prioridade', 'proxima_tentativa', 'id')
+    campos = {
+        'status': Tarefa.EXECUTANDO,
+        'reserva': reserva,
+        'proxima_tentativa': agora + timedelta(seconds=settings.TAREFAS_LEASE),
+        'tentativas': F('tentativas') + 1,
+        'iniciado_em': agora,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                candidatas.select_for_update(skip_locked=True).values_list('id', flat=True)[:quantidade]
+            )
+            if not ids:
+                return []
+            prontas.filter(id__in=ids).update(**campos)
+    else:
+        # SQLite: um único UPDATE com a subconsulta das candidatas.
+        # O lock de escrita é pedido no início do comando (sem uma
+        # transação que lê e depois tenta escrever, que falharia com
+        # "database is locked" em vez de esperar o timeout)
+        if not prontas.filter(id__in=candidatas.values('id')[:quantidade]).update(**campos):
+            return []
+
+    return list(
+        Tarefa.objects
+        .filter(reserva=reserva, status=Tarefa.EXECUTANDO)
+        .order_by('-prioridade', 'id')
+    )
+
+
+class Progresso:
+    """
+    Passado para a função da tarefa: progresso(percentual, mensagem).
+    Grava no banco no máximo a cada TAREFAS_INTERVALO_PROGRESSO
+    segundos e renova o lease da tarefa a cada gravação
+    """
+
+    def __init__(self, tarefa):
+        self.tarefa = tarefa
+        self._ultima_gravacao = 0.0
+
+    def __call__(self, percentual=None, mensagem=None, forcar=False):
+        if percentual is not None:
+            self.tarefa.progresso = max(0, min(100, int(percentual)))
+        if mensagem is not None:
+            self.tarefa.mensagem = str(mensagem)[:255]
+
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_gravacao < settings.TAREFAS_INTERVALO_PROGRESSO:
+            return
+        self._ultima_gravacao = agora
+
+        atualizadas = Tarefa.objects.filter(
+            id=self.tarefa.id, reserva=self.tarefa.reserva, status=Tarefa.EXECUTANDO
+        ).update(
+            progresso=self.tarefa.progresso,
+            mensagem=self.tarefa.mensagem,
+            proxima_tentativa=timezone.now() + timedelta(seconds=settings.TAREFAS_LEASE)
+        )
+        if not atualizadas:
+            raise TarefaPerdida(f'Tarefa {self.tarefa.id} reservada por outro worker')
+
+
+def executar(tarefa_id, reserva):
+    """
+    Executa uma tarefa reservada (nos processos do pool, via
+    tarefas.processo.executar).
+    Retorna o status final, ou None se a tarefa não pertence
+    mais a esta reserva
+    """
+    try:
+        tarefa = Tarefa.objects.get(id=tarefa_id, reserva=reserva, status=Tarefa.EXECUTANDO)
+    except Tarefa.DoesNotExist:
+        return None
+
+    try:
+        funcao = registro.obter(tarefa.tipo)
+        progresso = Progresso(tarefa)
+        resultado = funcao(progresso, **tarefa.parametros)
+    except TarefaPerdida:
+        logger.warning('Tarefa %s perdeu a reserva durante a execução', tarefa_id)
+        return None
+    except Exception as erro:
+        return registrar_falha(tarefa, erro)
+
+    atualizadas = Tarefa.objects.filter(id=tarefa.id, reserva=reserva).update(
+        status=Tarefa.CONCLUIDA,
+        progresso=100,
+        mensagem=tarefa.mensagem,
+        resultado=resultado,
+        reserva='',
+        ultimo_erro='',
+        concluido_em=timezone.now()
+    )
+    return Tarefa.CONCLUIDA if atualizadas else None
+
+
+def registrar_falha(tarefa, erro):
+    """
+    Reagenda a tarefa com backoff ou, sem tentativas restantes,
+    marca como falha definitiva
+    """
+    # tarefa desconhecida para este worker: tentar de novo não adianta
+    definitiva = (
+        isinstance(erro, registro.TarefaNaoRegistrada)
+        or tarefa.tentativas >= tarefa.max_tentativas
+    )
+
+    campos = {
+        'reserva': '',
+        'ultimo_erro': ''.join(traceback.format_exception(erro))[-4000:],
+    }
+    if definitiva:
+        campos.update(status=Tarefa.FALHOU, concluido_em=timezone.now())
+    else:
+        campos.update(
+            status=Tarefa.PENDENTE,
+            proxima_tentativa=calcular_proxima_tentativa(tarefa.tentativas)
+        )
+
+    atualizadas = Tarefa.objects.filter(id=tarefa.id, reserva=tarefa.reserva).update(**campos)
+    if not atualizadas:
+        return None
+    return campos['status']
@@ -0,0 +1,49 @@
+# tarefas/management/commands/enfileirar_tarefa.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tarefas import registro
+from tarefas.fila import enfileirar
+
+class Command(BaseCommand):
+    help = 'Coloca uma tarefa na fila (executada pelo comando rodar_worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tipo',
+            nargs='?',
+            help='Nome da tarefa (sem argumentos lista as tarefas registradas)'
+        )
+        parser.add_argument(
+            '--parametros',
+            default='{}',
+            help='Parâmetros da tarefa em JSON (ex: \'{"quantidade": 100}\')'
+        )
+        parser.add_argument(
+            '--prioridade',
+            type=int,
+            default=0,
+            help='Maior valor = executada primeiro (padrão: 0)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['tipo']:
+            for nome, funcao in sorted(registro.TAREFAS.items()):
+                descricao = (funcao.__doc__ or '').strip().splitlines()
+                self.stdout.write(f"{nome:<32} {descricao[0] if descricao else ''}")
+            return
+
+        try:
+            parametros = json.loads(options['parametros'])
+        except json.JSONDecodeError as erro:
+            raise CommandError(f'Parâmetros inválidos: {erro}')
+        if not isinstance(parametros, dict):
+            raise CommandError('Os parâmetros devem ser um objeto JSON')
+
+        try:
+            tarefa = enfileirar(options['tipo'], parametros, prioridade=options['prioridade'])
+        except (registro.TarefaNaoRegistrada, TypeError) as erro:
+            raise CommandError(str(erro))
+
+        self.stdout.write(self.style.SUCCESS(f'Tarefa {tarefa.id} ({tarefa.tipo}) enfileirada'))
@@ -0,0 +1,104 @@
+# tarefas/management/commands/rodar_worker.py
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tarefas.fila import registrar_falha, reservar
+from tarefas.processo import executar, inicializar_processo
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas da fila em um pool de processos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Tarefas executadas ao mesmo tempo (padrão: nº de CPUs)'
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Continua rodando e verificando a fila periodicamente'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera quando a fila está vazia (padrão: 2)'
+        )
+
+    def criar_pool(self, processos):
+        # "spawn": os processos não herdam a conexão com o banco do
+        # processo principal, e são reciclados após N tarefas
+        return ProcessPoolExecutor(
+            max_workers=processos,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=inicializar_processo,
+            max_tasks_per_child=settings.TAREFAS_MAX_POR_PROCESSO
+        )
+
+    def handle(self, *args, **options):
+        processos = options['processos']
+        totais = {}
+        em_execucao = {}
+        parar = False
+
+        def ao_sinal(numero, frame):
+            nonlocal parar
+            parar = True
+            self.stdout.write('Encerrando: aguardando as tarefas em execução...')
+
+        signal.signal(signal.SIGTERM, ao_sinal)
+        signal.signal(signal.SIGINT, ao_sinal)
+
+        pool = self.criar_pool(processos)
+        try:
+            while True:
+                livres = processos - len(em_execucao)
+                if livres and not parar:
+                    for tarefa in reservar(livres):
+                        futuro = pool.submit(executar, tarefa.id, tarefa.reserva)
+                        em_execucao[futuro] = tarefa
+                        self.stdout.write(f'▶ Tarefa {tarefa.id} ({tarefa.tipo}) iniciada')
+
+                if not em_execucao:
+                    if parar or not options['continuo']:
+                        break
+                    # não segura a conexão enquanto a fila está vazia
+                    connections.close_all()
+                    time.sleep(options['intervalo'])
+                    continue
+
+                concluidos, _ = wait(em_execucao, timeout=options['intervalo'],
+                                     return_when=FIRST_COMPLETED)
+                pool_quebrado = False
+                for futuro in concluidos:
+                    tarefa = em_execucao.pop(futuro)
+                    try:
+                        status = futuro.result() or 'reservada por outro worker'
+                    except BrokenProcessPool as erro:
+                        # o processo morreu (ex: falta de memória): conta
+                        # como uma tentativa e a tarefa volta para a fila
+                        status = registrar_falha(tarefa, erro) or 'interrompida'
+                        pool_quebrado = True
+                    except Exception as erro:
+                        status = f'erro no worker ({type(erro).__name__})'
+                    totais[status] = totais.get(status, 0) + 1
+                    self.stdout.write(f'■ Tarefa {tarefa.id} ({tarefa.tipo}): {status}')
+
+                if pool_quebrado:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self.criar_pool(processos)
+        finally:
+            pool.shutdown(wait=True)
+
+        resumo = ', '.join(f'{quantidade} {status}' for status, quantidade in totais.items())
+        self.stdout.write(self.style.SUCCESS(f'Worker finalizado. {resumo or "Nenhuma tarefa executada"}'))
@@ -0,0 +1,83 @@
+# tarefas/models.py
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Tarefa(models.Model):
+    """
+    Tarefa em segundo plano (fila no próprio banco, sem broker).
+    Gravada por tarefas.fila.enfileirar() e executada pelo
+    comando rodar_worker
+    """
+    PENDENTE = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDA = 'concluida'
+    FALHOU = 'falhou'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (EXECUTANDO, 'Executando'),
+        (CONCLUIDA, 'Concluída'),
+        (FALHOU, 'Falhou'),
+    ]
+
+    tipo = models.CharField(max_length=100,
+                    verbose_name='Tipo',
+                    help_text='Nome registrado da tarefa (ex: produtos.seed)')
+    parametros = models.JSONField(default=dict, blank=True,
+                    encoder=DjangoJSONEncoder,
+                    verbose_name='Parâmetros')
+    status = models.CharField(max_length=20,
+                    choices=STATUS_CHOICES,
+                    default=PENDENTE,
+                    verbose_name='Status')
+    prioridade = models.SmallIntegerField(default=0,
+                    verbose_name='Prioridade',
+                    help_text='Maior valor = executada primeiro')
+    tentativas = models.PositiveSmallIntegerField(default=0,
+                    verbose_name='Tentativas')
+    max_tentativas = models.PositiveSmallIntegerField(default=3,
+                    verbose_name='Máximo de tentativas')
+    # quando a tarefa pode ser (re)executada; durante a execução
+    # guarda o fim do lease do worker que reservou a tarefa
+    proxima_tentativa = models.DateTimeField(default=timezone.now,
+                    verbose_name='Próxima tentativa')
+    reserva = models.CharField(max_length=32, blank=True, default='',
+                    verbose_name='Reserva',
+                    help_text='Identificador do worker que reservou a tarefa')
+    progresso = models.PositiveSmallIntegerField(default=0,
+                    verbose_name='Progresso (%)')
+    mensagem = models.CharField(max_length=255, blank=True, default='',
+                    verbose_name='Mensagem')
+    resultado = models.JSONField(null=True, blank=True,
+                    encoder=DjangoJSONEncoder,
+                    verbose_name='Resultado')
+    ultimo_erro = models.TextField(blank=True, default='',
+                    verbose_name='Último erro')
+    usuario = models.ForeignKey('usuarios.Usuario',
+                    on_delete=models.SET_NULL,
+                    null=True, blank=True,
+                    related_name='tarefas',
+                    verbose_name='Usuário')
+    criado = models.DateTimeField(auto_now_add=True,
+                    verbose_name='Criado em')
+    iniciado_em = models.DateTimeField(null=True, blank=True,
+                    verbose_name='Iniciado em')
+    concluido_em = models.DateTimeField(null=True, blank=True,
+                    verbose_name='Concluído em')
+
+    class Meta:
+        db_table = 'tarefas'
+        verbose_name = 'Tarefa'
+        verbose_name_plural = 'Tarefas'
+        ordering = ['-criado']
+        indexes = [
+            # consulta do worker: status + prioridade + horário
+            models.Index(
+                fields=['status', '-prioridade', 'proxima_tentativa'],
+                name='tarefas_fila_idx'
+            ),
+        ]
+
+    def __repr__(self):
+        return f'<Tarefa {self.id} {self.tipo} {self.status}>'
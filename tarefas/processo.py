@@ -0,0 +1,24 @@
+# tarefas/processo.py
+"""
+Funções executadas nos processos do pool do worker.
+
+Os processos são criados com "spawn": este módulo é importado antes
+do Django estar configurado, então não pode importar modelos no
+nível do módulo
+"""
+import os
+
+import django
+
+
+def inicializar_processo():
+    """
+    Prepara o Django em cada processo do pool
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+    django.setup()
+
+
+def executar(tarefa_id, reserva):
+    from tarefas.fila import executar as executar_tarefa
+    return executar_tarefa(tarefa_id, reserva)
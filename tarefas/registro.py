@@ -0,0 +1,40 @@
+# tarefas/registro.py
+"""
+Registro das funções que podem ser executadas pela fila.
+
+Cada app declara as suas tarefas em um módulo tarefas.py
+(carregado em TarefasConfig.ready):
+
+    @tarefa('produtos.seed')
+    def seed(progresso, quantidade=10):
+        ...
+        progresso(50, 'Metade criada')
+        return {'criados': quantidade}
+
+A função recebe o objeto de progresso e os parâmetros gravados
+na tarefa; o retorno (serializável em JSON) vira o resultado
+"""
+
+TAREFAS = {}
+
+
+class TarefaNaoRegistrada(LookupError):
+    pass
+
+
+def tarefa(nome, max_tentativas=None):
+    def registrar(funcao):
+        if nome in TAREFAS and TAREFAS[nome] is not funcao:
+            raise ValueError(f'Tarefa já registrada: {nome}')
+        funcao.nome_tarefa = nome
+        funcao.max_tentativas = max_tentativas
+        TAREFAS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def obter(nome):
+    try:
+        return TAREFAS[nome]
+    except KeyError:
+        raise TarefaNaoRegistrada(f'Tarefa não registrada: {nome}')
@@ -0,0 +1,15 @@
+# tarefas/serializers.py
+from rest_framework import serializers
+
+from tarefas.models import Tarefa
+
+
+class TarefaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tarefa
+        fields = [
+            'id', 'tipo', 'status', 'prioridade', 'progresso', 'mensagem',
+            'resultado', 'ultimo_erro', 'tentativas', 'max_tentativas',
+            'criado', 'iniciado_em', 'concluido_em'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,179 @@
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from nucleo import coalescencia
+from nucleo.models import RespostaCompartilhada
+from produtos.models import Produto
+from produtos.sync import versao_atual
+from tarefas.fila import Progresso, TarefaPerdida, caminho_no_diretorio, enfileirar, executar, reservar
+from tarefas.models import Tarefa
+from tarefas.registro import tarefa
+from usuarios.models import Usuario
+
+
+@tarefa('testes.somar')
+def somar(progresso, a, b):
+    """Soma dois números (usada nos testes)"""
+    progresso(50, 'somando')
+    return {'soma': a + b}
+
+
+@tarefa('testes.falhar', max_tentativas=2)
+def falhar(progresso):
+    """Sempre falha (usada nos testes)"""
+    raise RuntimeError('falha proposital')
+
+
+class FilaTarefasTest(TestCase):
+    """
+    Reserva, lease, novas tentativas e falha definitiva (tarefas.fila)
+    """
+
+    def test_reserva_por_prioridade_uma_vez(self):
+        baixa = enfileirar('testes.somar', {'a': 1, 'b': 2})
+        alta = enfileirar('testes.somar', {'a': 3, 'b': 4}, prioridade=10)
+        enfileirar('testes.somar', {'a': 0, 'b': 0}, executar_em=timezone.now() + timedelta(hours=1))
+
+        reservadas = reservar(1)
+        self.assertEqual([item.id for item in reservadas], [alta.id])
+        self.assertEqual(reservadas[0].status, Tarefa.EXECUTANDO)
+        self.assertEqual(reservadas[0].tentativas, 1)
+
+        # a reservada e a agendada para depois não voltam
+        self.assertEqual([item.id for item in reservar(5)], [baixa.id])
+        self.assertEqual(reservar(5), [])
+
+        self.assertEqual(executar(alta.id, reservadas[0].reserva), Tarefa.CONCLUIDA)
+        alta.refresh_from_db()
+        self.assertEqual(alta.resultado, {'soma': 7})
+        self.assertEqual(alta.progresso, 100)
+
+    def test_parametros_invalidos(self):
+        with self.assertRaises(TypeError):
+            enfileirar('testes.somar', {'a': 1})
+
+    def test_lease_vencido_passa_para_outro_worker(self):
+        enfileirar('testes.somar', {'a': 1, 'b': 1})
+        primeira = reservar(1)[0]
+        self.assertEqual(reservar(1), [])
+
+        # o worker parou: o lease vence e outro worker assume
+        Tarefa.objects.filter(id=primeira.id).update(proxima_tentativa=timezone.now())
+        segunda = reservar(1)[0]
+        self.assertEqual(segunda.id, primeira.id)
+        self.assertNotEqual(segunda.reserva, primeira.reserva)
+        self.assertEqual(segunda.tentativas, 2)
+
+        # o primeiro worker perde a tarefa e não grava mais nada
+        with self.assertRaises(TarefaPerdida):
+            Progresso(primeira)(10, forcar=True)
+        self.assertIsNone(executar(primeira.id, primeira.reserva))
+
+    def test_nova_tentativa_com_backoff_e_falha_definitiva(self):
+        pendente = enfileirar('testes.falhar')
+
+        reservada = reservar(1)[0]
+        self.assertEqual(executar(reservada.id, reservada.reserva), Tarefa.PENDENTE)
+        pendente.refresh_from_db()
+        self.assertIn('falha proposital', pendente.ultimo_erro)
+        self.assertGreater(pendente.proxima_tentativa, timezone.now())
+        self.assertEqual(reservar(1), [])
+
+        Tarefa.objects.filter(id=pendente.id).update(proxima_tentativa=timezone.now())
+        reservada = reservar(1)[0]
+        self.assertEqual(executar(reservada.id, reservada.reserva), Tarefa.FALHOU)
+        pendente.refresh_from_db()
+        self.assertEqual(pendente.tentativas, 2)
+        self.assertIsNotNone(pendente.concluido_em)
+        self.assertEqual(reservar(1), [])
+
+    def test_lease_vencido_sem_tentativas_restantes(self):
+        enfileirar('testes.somar', {'a': 1, 'b': 1}, max_tentativas=1)
+        reservada = reservar(1)[0]
+        Tarefa.objects.filter(id=reservada.id).update(proxima_tentativa=timezone.now())
+
+        self.assertEqual(reservar(1), [])
+        reservada.refresh_from_db()
+        self.assertEqual(reservada.status, Tarefa.FALHOU)
+        self.assertIn('Lease vencido', reservada.ultimo_erro)
+
+
+@override_settings(AUDITORIA_ATIVA=False)
+class TarefasApiTest(TestCase):
+    """
+    Tarefas enfileiradas pela API e acompanhadas em /jobs/{id}/
+    """
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio, ignore_errors=True)
+        self.admin = Usuario.objects.create(nome='Admin', email='admin@email.com', senha='x',
+                                            administrador=True)
+        self.usuario = Usuario.objects.create(nome='Usuario', email='usuario@email.com', senha='x')
+        self.client = APIClient()
+
+    def executar_fila(self):
+        for item in reservar(10):
+            executar(item.id, item.reserva)
+
+    def test_exportacao_em_segundo_plano(self):
+        self.client.force_authenticate(self.admin)
+        with override_settings(TAREFAS_DIRETORIO=self.diretorio):
+            resposta = self.client.post('/usuarios/exportar/?formato=ndjson')
+            self.assertEqual(resposta.status_code, 202)
+            self.assertTrue(resposta['Location'].endswith(f"/jobs/{resposta.json()['tarefa']['id']}/"))
+            tarefa_ = Tarefa.objects.get()
+            self.assertEqual(tarefa_.usuario, self.admin)
+
+            self.executar_fila()
+            resposta = self.client.get(f'/jobs/{tarefa_.id}/')
+            self.assertEqual(resposta.json()['tarefa']['status'], Tarefa.CONCLUIDA)
+            self.assertEqual(resposta.json()['tarefa']['resultado']['total'], 2)
+
+            arquivo = self.client.get(f'/jobs/{tarefa_.id}/arquivo/')
+            self.assertEqual(arquivo.status_code, 200)
+            self.assertEqual(len(b''.join(arquivo.streaming_content).splitlines()), 2)
+
+        # outro usuário não vê a tarefa
+        self.client.force_authenticate(self.usuario)
+        self.assertEqual(self.client.get(f'/jobs/{tarefa_.id}/').status_code, 404)
+        self.assertEqual(self.client.post('/usuarios/exportar/').status_code, 403)
+
+    def test_estatisticas_em_segundo_plano(self):
+        self.client.force_authenticate(self.usuario)
+        resposta = self.client.post('/produtos/estatisticas/')
+        self.assertEqual(resposta.status_code, 202)
+
+        Produto.objects.create(nome='Produto', descricao='Descrição do produto',
+                               marca='Marca', preco='10.00')
+        self.executar_fila()
+        resposta = self.client.get(f"/jobs/{resposta.json()['tarefa']['id']}/")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['tarefa']['resultado']['total_produtos'], 1)
+
+        # a resposta da versão atual fica gravada para os leitores
+        self.assertTrue(RespostaCompartilhada.objects.exists())
+        self.assertFalse(RespostaCompartilhada.objects.exclude(versao=versao_atual()).exists())
+        cache.clear()
+        coalescencia._anteriores.clear()
+        with self.assertNumQueries(2):  # versão e a resposta compartilhada, sem agregação
+            resposta = self.client.get('/produtos/estatisticas/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_arquivos_somente_no_diretorio_das_tarefas(self):
+        with override_settings(TAREFAS_DIRETORIO=self.diretorio):
+            self.assertEqual(caminho_no_diretorio('a/b.csv').name, 'b.csv')
+            for nome in ('../fora.csv', '/etc/passwd', '.'):
+                with self.assertRaises(ValueError):
+                    caminho_no_diretorio(nome)
+
+            enfileirar('usuarios.importar', {'arquivo': '/etc/passwd'})
+            self.executar_fila()
+        self.assertEqual(Tarefa.objects.get().status, Tarefa.FALHOU)
+        self.assertIn('fora do diretório', Tarefa.objects.get().ultimo_erro)
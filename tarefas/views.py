@@ -0,0 +1,73 @@
+# tarefas/views.py
+from django.http import FileResponse
+from django.urls import reverse
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from tarefas.fila import caminho_no_diretorio
+from tarefas.models import Tarefa
+from tarefas.serializers import TarefaSerializer
+
+
+def resposta_enfileirada(request, tarefa):
+    """
+    202 Accepted para uma tarefa enfileirada por uma view, com o
+    endereço de acompanhamento (GET /jobs/{id}/) no Location
+    """
+    endereco = request.build_absolute_uri(reverse('jobs-detail', args=[tarefa.id]))
+    resposta = Response({
+        'mensagem': 'Tarefa enfileirada',
+        'tarefa': TarefaSerializer(tarefa).data,
+        'acompanhar': endereco
+    }, status=status.HTTP_202_ACCEPTED)
+    resposta['Location'] = endereco
+    return resposta
+
+
+class TarefaViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Acompanhamento das tarefas em segundo plano
+    """
+    serializer_class = TarefaSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # cada usuário vê apenas as próprias tarefas; administradores veem todas
+        queryset = Tarefa.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(usuario=self.request.user)
+        return queryset
+
+    def retrieve(self, request, pk=None):
+        """
+        GET /jobs/{id}/ - Status e progresso de uma tarefa
+        """
+        tarefa = self.get_object()
+        serializer = self.get_serializer(tarefa)
+        return Response({
+            'mensagem': f'Tarefa {tarefa.get_status_display().lower()}',
+            'tarefa': serializer.data
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='arquivo')
+    def arquivo(self, request, pk=None):
+        """
+        GET /jobs/{id}/arquivo/ - Arquivo gerado pela tarefa (ex: exportação)
+        """
+        tarefa = self.get_object()
+        resultado = tarefa.resultado if isinstance(tarefa.resultado, dict) else {}
+        if tarefa.status != Tarefa.CONCLUIDA or not resultado.get('arquivo'):
+            return Response({
+                'erro': 'Tarefa sem arquivo disponível'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            caminho = caminho_no_diretorio(resultado['arquivo'])
+            arquivo = open(caminho, 'rb')
+        except (ValueError, OSError):
+            return Response({
+                'erro': 'Arquivo da tarefa não encontrado'
+            }, status=status.HTTP_410_GONE)
+        return FileResponse(arquivo, as_attachment=True, filename=caminho.name)
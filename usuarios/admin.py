@@ -1,6 +1,6 @@
 # usuarios/admin.py
 from django.contrib import admin
-from .models import Usuario
+from .models import Usuario, EmailPendente, EventoAuditoria
 
 @admin.register(Usuario)
 class UsuarioAdmin(admin.ModelAdmin):
@@ -14,7 +14,7 @@ class UsuarioAdmin(admin.ModelAdmin):
             'fields': ('nome', 'email', 'telefone')
         }),
         ('Segurança', {
-            'fields': ('senha',)
+            'fields': ('senha', 'administrador')
         }),
         ('Datas', {
             'fields': ('criado', 'atualizado'),
@@ -22,4 +22,22 @@ class UsuarioAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ('criado', 'atualizado')
\ No newline at end of file
+    readonly_fields = ('criado', 'atualizado')
+
+
+@admin.register(EmailPendente)
+class EmailPendenteAdmin(admin.ModelAdmin):
+    list_display = ('assunto', 'destinatario', 'status', 'tentativas', 'proxima_tentativa')
+    list_filter = ('status',)
+    search_fields = ('destinatario', 'assunto')
+    readonly_fields = ('usuario', 'criado', 'enviado_em', 'ultimo_erro')
+
+
+
+@admin.register(EventoAuditoria)
+class EventoAuditoriaAdmin(admin.ModelAdmin):
+    list_display = ('tipo', 'usuario_id', 'email', 'ip', 'criado')
+    list_filter = ('tipo',)
+    search_fields = ('email',)
+    date_hierarchy = 'criado'
+    readonly_fields = ('usuario', 'email', 'tipo', 'ip', 'criado')
@@ -0,0 +1,131 @@
+# usuarios/auditoria.py
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from usuarios.models import EventoAuditoria
+
+logger = logging.getLogger(__name__)
+
+
+class BufferAuditoria:
+    """
+    Buffer em memória (ring buffer) para os eventos de auditoria.
+
+    registrar() apenas adiciona o evento na fila e retorna: não faz
+    I/O, não espera lock e não lança exceção. Uma thread em segundo
+    plano grava os eventos com bulk_create a cada AUDITORIA_TAMANHO_LOTE
+    eventos ou AUDITORIA_INTERVALO_MS milissegundos, e o que restar
+    é gravado na saída do processo.
+
+    Se o banco ficar indisponível e o buffer encher, os eventos mais
+    antigos são descartados (contados em self.descartados)
+    """
+
+    def __init__(self):
+        self._eventos = None
+        self._acordar = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock_inicio = threading.Lock()
+        self.descartados = 0
+        atexit.register(self.gravar)
+
+    def _iniciar(self):
+        """
+        Inicia a thread de gravação no processo atual.
+        Verifica o pid porque, após o fork dos workers (gunicorn),
+        a thread do processo pai não existe no filho
+        """
+        with self._lock_inicio:
+            if self._pid == os.getpid():
+                return
+            self._eventos = deque(maxlen=settings.AUDITORIA_CAPACIDADE)
+            self._acordar = threading.Event()
+            self._thread = threading.Thread(
+                target=self._executar, name='auditoria', daemon=True
+            )
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def registrar(self, tipo, usuario=None, email='', ip=None):
+        try:
+            if self._pid != os.getpid():
+                self._iniciar()
+
+            if len(self._eventos) == self._eventos.maxlen:
+                self.descartados += 1
+
+            self._eventos.append(EventoAuditoria(
+                usuario_id=getattr(usuario, 'id', None),
+                email=(email or getattr(usuario, 'email', ''))[:254],
+                tipo=tipo,
+                ip=ip,
+                criado=timezone.now()
+            ))
+
+            if len(self._eventos) >= settings.AUDITORIA_TAMANHO_LOTE:
+                self._acordar.set()
+        except Exception:
+            # a auditoria nunca pode derrubar a requisição
+            logger.exception('Falha ao registrar evento de auditoria')
+
+    def _executar(self):
+        intervalo = settings.AUDITORIA_INTERVALO_MS / 1000
+        while True:
+            self._acordar.wait(intervalo)
+            self._acordar.clear()
+            self.gravar()
+
+    def gravar(self):
+        """
+        Grava todos os eventos pendentes (um bulk_create por lote)
+        """
+        eventos = self._eventos
+        if not eventos or self._pid != os.getpid():
+            return
+
+        tamanho_lote = settings.AUDITORIA_TAMANHO_LOTE
+        while eventos:
+            lote = []
+            try:
+                while eventos and len(lote) < tamanho_lote:
+                    lote.append(eventos.popleft())
+            except IndexError:
+                pass
+
+            try:
+                EventoAuditoria.objects.bulk_create(lote)
+            except Exception:
+                logger.exception('Falha ao gravar %d evento(s) de auditoria', len(lote))
+                self.descartados += len(lote)
+                # descarta a conexão: pode ter ficado em estado inválido
+                connection.close()
+                return
+
+
+buffer_auditoria = BufferAuditoria()
+
+
+def obter_ip(request):
+    return request.META.get('REMOTE_ADDR') or None
+
+
+def registrar_evento(tipo, request=None, usuario=None, email=''):
+    """
+    Registra um evento de auditoria sem bloquear a requisição
+    """
+    if not settings.AUDITORIA_ATIVA:
+        return
+    buffer_auditoria.registrar(
+        tipo,
+        usuario=usuario,
+        email=email,
+        ip=obter_ip(request) if request is not None else None
+    )
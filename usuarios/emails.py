@@ -0,0 +1,188 @@
+# usuarios/emails.py
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from usuarios.models import EmailPendente
+
+
+def enfileirar_email_recuperacao(usuario):
+    """
+    Grava o e-mail de recuperação de senha na fila (outbox).
+    O token não fica na fila: é gerado no envio (enviar_lote), e só
+    o seu digest é salvo no usuário
+    """
+    corpo = (
+        f'Olá, {usuario.nome}!\n\n'
+        'Recebemos uma solicitação para redefinir a sua senha.\n'
+        f'Use o token abaixo em até 1 hora:\n\n{EmailPendente.TOKEN_MARCADOR}\n\n'
+        'Se você não fez essa solicitação, ignore este e-mail.'
+    )
+    return EmailPendente.objects.create(
+        destinatario=usuario.email,
+        assunto='Recuperação de senha',
+        corpo=corpo,
+        usuario=usuario
+    )
+
+
+def montar_corpo(email):
+    """
+    Corpo do e-mail para o envio. Para o e-mail de recuperação, gera
+    um token novo para o usuário (o de uma tentativa anterior deixa de
+    valer) e o coloca no lugar do marcador
+    """
+    if email.usuario is None:
+        return email.corpo
+    token = email.usuario.gerar_token_recuperacao()
+    return email.corpo.replace(EmailPendente.TOKEN_MARCADOR, token)
+
+
+def calcular_proxima_tentativa(tentativas, agora=None):
+    """
+    Backoff exponencial com jitter:
+    base * 2^(tentativas - 1), limitado ao máximo configurado
+    """
+    agora = agora or timezone.now()
+    base = settings.EMAIL_FILA_ESPERA_BASE
+    maximo = settings.EMAIL_FILA_ESPERA_MAXIMA
+    espera = min(maximo, base * (2 ** max(tentativas - 1, 0)))
+    # jitter de até 10% para não sincronizar os reenvios
+    espera += random.uniform(0, espera * 0.1)
+    return agora + timedelta(seconds=espera)
+
+
+def reservar_lote(tamanho):
+    """
+    Reserva um lote de e-mails prontos para envio e retorna a lista.
+    A reserva empurra proxima_tentativa para o futuro (lease), então
+    outro worker não pega os mesmos e-mails, e um worker que morrer
+    no meio do envio libera o lote quando o lease vencer
+    """
+    agora = timezone.now()
+    reserva = uuid.uuid4().hex
+
+    ids = list(
+        EmailPendente.objects
+        .filter(status=EmailPendente.PENDENTE, proxima_tentativa__lte=agora)
+        .order_by('proxima_tentativa')
+        .values_list('id', flat=True)[:tamanho]
+    )
+    if not ids:
+        return []
+
+    # UPDATE condicional: só reserva o que ainda estiver disponível
+    EmailPendente.objects.filter(
+        id__in=ids,
+        status=EmailPendente.PENDENTE,
+        proxima_tentativa__lte=agora
+    ).update(
+        reserva=reserva,
+        proxima_tentativa=agora + timedelta(seconds=settings.EMAIL_FILA_LEASE)
+    )
+    return list(
+        EmailPendente.objects.filter(reserva=reserva, status=EmailPendente.PENDENTE)
+        .select_related('usuario')
+    )
+
+
+def enviar_lote(tamanho=100, conexao=None):
+    """
+    Envia um lote de e-mails pendentes usando uma única conexão
+    com o servidor de e-mail.
+    Retorna um dicionário com o total de enviados, reagendados e mortos
+    """
+    resultado = {'enviados': 0, 'reagendados': 0, 'mortos': 0}
+
+    emails = reservar_lote(tamanho)
+    if not emails:
+        return resultado
+
+    conexao = conexao or get_connection()
+    try:
+        conexao.open()
+    except Exception as erro:
+        # servidor de e-mail fora do ar: a tentativa conta para todo o
+        # lote (reagendado com backoff em vez de esperar o lease vencer)
+        for email in emails:
+            registrar_falha(email, erro, resultado)
+        return resultado
+
+    try:
+        restantes = iter(emails)
+        for email in restantes:
+            mensagem = EmailMessage(
+                subject=email.assunto,
+                body=montar_corpo(email),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email.destinatario],
+                connection=conexao
+            )
+            try:
+                conexao.send_messages([mensagem])
+            except Exception as erro:
+                registrar_falha(email, erro, resultado)
+
+                # a conexão pode ter ficado em estado inválido
+                try:
+                    conexao.close()
+                    conexao.open()
+                except Exception as erro:
+                    for restante in restantes:
+                        registrar_falha(restante, erro, resultado)
+                    break
+                continue
+
+            # o corpo não fica no banco depois do envio
+            EmailPendente.objects.filter(id=email.id).update(
+                status=EmailPendente.ENVIADO,
+                enviado_em=timezone.now(),
+                reserva='',
+                corpo=''
+            )
+            resultado['enviados'] += 1
+    finally:
+        conexao.close()
+
+    return resultado
+
+
+def registrar_falha(email, erro, resultado):
+    """
+    Conta a tentativa do e-mail e o reagenda com backoff, ou o move
+    para "morto" depois de EMAIL_FILA_MAX_TENTATIVAS
+    """
+    email.tentativas += 1
+    email.ultimo_erro = f'{type(erro).__name__}: {erro}'
+    email.reserva = ''
+
+    if email.tentativas >= settings.EMAIL_FILA_MAX_TENTATIVAS:
+        email.status = EmailPendente.MORTO
+        # não vai mais ser entregue
+        email.corpo = ''
+        resultado['mortos'] += 1
+    else:
+        email.proxima_tentativa = calcular_proxima_tentativa(email.tentativas)
+        resultado['reagendados'] += 1
+
+    email.save(update_fields=[
+        'tentativas', 'ultimo_erro', 'reserva',
+        'status', 'proxima_tentativa', 'corpo'
+    ])
+
+
+def limpar_enviados(dias=None):
+    """
+    Remove os e-mails enviados há mais de EMAIL_FILA_RETENCAO_DIAS.
+    Retorna a quantidade removida
+    """
+    dias = settings.EMAIL_FILA_RETENCAO_DIAS if dias is None else dias
+    limite = timezone.now() - timedelta(days=dias)
+    removidos, _ = EmailPendente.objects.filter(
+        status=EmailPendente.ENVIADO, enviado_em__lt=limite
+    ).delete()
+    return removidos
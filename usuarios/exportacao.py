@@ -0,0 +1,86 @@
+# usuarios/exportacao.py
+import csv
+import json
+
+from nucleo.renderizacao import MSGPACK_DISPONIVEL, empacotar
+from usuarios.models import Usuario
+
+CAMPOS = ('id', 'nome', 'email', 'telefone', 'telefone_formatado', 'criado')
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+if MSGPACK_DISPONIVEL:
+    FORMATOS['msgpack'] = 'application/msgpack'
+
+# formatos gerados em bytes (arquivos abertos em modo binário)
+BINARIOS = {'msgpack'}
+
+
+class _Eco:
+    """
+    "Arquivo" que apenas devolve o que recebe: permite usar o
+    csv.writer para gerar linha a linha sem acumular em memória
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def formatar_data(valor):
+    """
+    Data no mesmo formato das respostas da API (ISO 8601, UTC com "Z")
+    """
+    texto = valor.isoformat()
+    if texto.endswith('+00:00'):
+        texto = texto[:-6] + 'Z'
+    return texto
+
+
+def linhas_usuarios(tamanho_lote=2000):
+    """
+    Percorre a tabela de usuários em ordem de id, trazendo do banco
+    tamanho_lote linhas por vez (memória constante)
+    """
+    return (
+        Usuario.objects
+        .order_by('id')
+        .values_list(*CAMPOS)
+        .iterator(chunk_size=tamanho_lote)
+    )
+
+
+def gerar_csv(linhas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(CAMPOS)
+    for linha in linhas:
+        *valores, criado = linha
+        yield escritor.writerow([*valores, formatar_data(criado)])
+
+
+def gerar_ndjson(linhas):
+    for linha in linhas:
+        registro = dict(zip(CAMPOS, linha))
+        registro['criado'] = formatar_data(registro['criado'])
+        yield json.dumps(registro, ensure_ascii=False) + '\n'
+
+
+def gerar_msgpack(linhas):
+    """
+    Um mapa MessagePack por usuário, em sequência (leia com
+    msgpack.Unpacker); "criado" vai como Timestamp
+    """
+    for linha in linhas:
+        yield empacotar(dict(zip(CAMPOS, linha)))
+
+
+def exportar(formato, tamanho_lote=2000):
+    """
+    Retorna um gerador com o conteúdo da exportação no formato pedido
+    (bytes nos formatos de BINARIOS, texto nos demais)
+    """
+    geradores = {'csv': gerar_csv, 'ndjson': gerar_ndjson, 'msgpack': gerar_msgpack}
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato} (use {', '.join(sorted(FORMATOS))})")
+    return geradores[formato](linhas_usuarios(tamanho_lote))
@@ -0,0 +1,175 @@
+# usuarios/importacao.py
+import csv
+import os
+from itertools import islice
+from pathlib import Path
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from usuarios.models import Usuario
+from usuarios.serializers import ImportacaoUsuarioSerializer
+
+COLUNAS = ('nome', 'email', 'telefone', 'senha')
+
+
+def inicializar_processo():
+    """
+    Prepara o Django em cada processo do pool
+    (necessário quando o processo é criado com "spawn", ex: Windows)
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+    django.setup()
+
+
+def gerar_hash_senha(senha):
+    """
+    Gera o hash da senha (PBKDF2). Roda nos processos do pool,
+    pois é a parte mais cara da importação
+    """
+    return make_password(senha)
+
+
+def ler_linhas(caminho):
+    """
+    Lê o arquivo CSV ou XLSX linha a linha (sem carregar tudo na memória)
+    Retorna tuplas (numero_da_linha, dicionario)
+    """
+    caminho = Path(caminho)
+    extensao = caminho.suffix.lower()
+
+    if extensao == '.csv':
+        with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+            for numero, linha in enumerate(csv.DictReader(arquivo), start=2):
+                yield numero, {coluna: linha.get(coluna) for coluna in COLUNAS}
+
+    elif extensao in ('.xlsx', '.xlsm'):
+        # import tardio: openpyxl só é necessário para planilhas
+        from openpyxl import load_workbook
+
+        planilha = load_workbook(caminho, read_only=True, data_only=True)
+        try:
+            linhas = planilha.active.iter_rows(values_only=True)
+            cabecalho = [str(celula).strip().lower() if celula else '' for celula in next(linhas, ())]
+            for numero, valores in enumerate(linhas, start=2):
+                linha = dict(zip(cabecalho, valores))
+                yield numero, {
+                    coluna: str(linha[coluna]) if linha.get(coluna) is not None else None
+                    for coluna in COLUNAS
+                }
+        finally:
+            planilha.close()
+
+    else:
+        raise ValueError(f'Formato não suportado: {extensao} (use .csv ou .xlsx)')
+
+
+def validar_lote(linhas, emails_vistos):
+    """
+    Valida um lote de linhas com as regras do cadastro.
+    Retorna (validos, erros, duplicados), onde validos é uma lista de
+    (numero, dados_validados)
+    """
+    validos = []
+    erros = []
+    duplicados = []
+
+    for numero, linha in linhas:
+        serializer = ImportacaoUsuarioSerializer(data=linha)
+        if not serializer.is_valid():
+            erros.append((numero, serializer.errors))
+            continue
+
+        dados = serializer.validated_data
+        # e-mail repetido dentro do próprio arquivo
+        if dados['email'] in emails_vistos:
+            duplicados.append((numero, dados['email']))
+            continue
+
+        emails_vistos.add(dados['email'])
+        validos.append((numero, dados))
+
+    # e-mails que já existem no banco: uma única consulta por lote
+    existentes = set(
+        Usuario.objects
+        .filter(email__in=[dados['email'] for _, dados in validos])
+        .values_list('email', flat=True)
+    )
+    if existentes:
+        duplicados.extend(
+            (numero, dados['email']) for numero, dados in validos
+            if dados['email'] in existentes
+        )
+        validos = [
+            (numero, dados) for numero, dados in validos
+            if dados['email'] not in existentes
+        ]
+
+    return validos, erros, duplicados
+
+
+def criar_usuarios(validos, hashes):
+    """
+    Cria os usuários do lote com um bulk_create.
+    As senhas já chegam com hash, então o save() do modelo
+    (que gera o hash) não é necessário; os campos que o save()
+    calcularia são preenchidos aqui
+    """
+    usuarios = []
+    for (_, dados), senha_hash in zip(validos, hashes):
+        usuario = Usuario(
+            nome=dados['nome'],
+            email=dados['email'],
+            telefone=dados.get('telefone') or None,
+            senha=senha_hash
+        )
+        usuario.preencher_campos_derivados()
+        usuarios.append(usuario)
+    Usuario.objects.bulk_create(usuarios, batch_size=500)
+    return len(usuarios)
+
+
+def importar(caminho, lote=1000, mapear=map, ao_erro=None, ao_processar=None):
+    """
+    Importa o arquivo em lotes: valida, gera os hashes das senhas
+    com `mapear` (ex: pool.map, para usar vários processos) e grava
+    cada lote em uma transação.
+
+    ao_erro(numero_da_linha, detalhes) é chamado para cada linha
+    inválida ou lote descartado; ao_processar(totais) após cada lote.
+    Retorna os totais (linhas, criados, duplicados, invalidos)
+    """
+    totais = {'linhas': 0, 'criados': 0, 'duplicados': 0, 'invalidos': 0}
+    emails_vistos = set()
+    linhas = ler_linhas(caminho)
+
+    while True:
+        bloco = list(islice(linhas, lote))
+        if not bloco:
+            break
+
+        totais['linhas'] += len(bloco)
+        validos, erros, duplicados = validar_lote(bloco, emails_vistos)
+        totais['invalidos'] += len(erros)
+        totais['duplicados'] += len(duplicados)
+
+        if ao_erro:
+            for numero, detalhes in erros:
+                ao_erro(numero, detalhes)
+
+        if validos:
+            hashes = list(mapear(gerar_hash_senha, [dados['senha'] for _, dados in validos]))
+            try:
+                with transaction.atomic():
+                    totais['criados'] += criar_usuarios(validos, hashes)
+            except IntegrityError as erro:
+                # outro processo cadastrou um dos e-mails no meio do lote
+                totais['invalidos'] += len(validos)
+                if ao_erro:
+                    ao_erro(validos[0][0], f'lote descartado: {erro}')
+
+        if ao_processar:
+            ao_processar(totais)
+
+    return totais
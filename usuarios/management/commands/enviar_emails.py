@@ -0,0 +1,67 @@
+# usuarios/management/commands/enviar_emails.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from usuarios.emails import enviar_lote, limpar_enviados
+
+class Command(BaseCommand):
+    help = 'Envia os e-mails pendentes da fila (outbox)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=100,
+            help='Quantidade de e-mails enviados por conexão (padrão: 100)'
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Continua rodando e verificando a fila periodicamente'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5.0,
+            help='Segundos de espera quando a fila está vazia (padrão: 5)'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        totais = {'enviados': 0, 'reagendados': 0, 'mortos': 0}
+
+        while True:
+            resultado = enviar_lote(lote)
+            for chave, valor in resultado.items():
+                totais[chave] += valor
+
+            processados = sum(resultado.values())
+            if processados:
+                self.stdout.write(
+                    f"Lote: {resultado['enviados']} enviado(s), "
+                    f"{resultado['reagendados']} reagendado(s), "
+                    f"{resultado['mortos']} com falha definitiva"
+                )
+
+            # lote cheio: provavelmente há mais e-mails esperando
+            if processados >= lote:
+                continue
+
+            # fila em dia: remove os enviados antigos
+            removidos = limpar_enviados()
+            if removidos:
+                self.stdout.write(f'{removidos} e-mail(s) enviado(s) antigo(s) removido(s)')
+
+            if not options['continuo']:
+                break
+
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Concluído! {totais['enviados']} enviado(s), "
+                f"{totais['reagendados']} reagendado(s), "
+                f"{totais['mortos']} com falha definitiva"
+            )
+        )
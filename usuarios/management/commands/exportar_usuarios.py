@@ -0,0 +1,51 @@
+# usuarios/management/commands/exportar_usuarios.py
+import sys
+
+from django.core.management.base import BaseCommand
+
+from usuarios.exportacao import BINARIOS, FORMATOS, exportar
+
+class Command(BaseCommand):
+    help = 'Exporta todos os usuários em CSV, NDJSON ou MessagePack (em streaming, memória constante)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--formato',
+            choices=sorted(FORMATOS),
+            default='csv',
+            help='Formato da exportação (padrão: csv)'
+        )
+        parser.add_argument(
+            '--saida',
+            help='Arquivo de saída (padrão: saída padrão)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Linhas lidas do banco por vez (padrão: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        conteudo = exportar(options['formato'], options['lote'])
+
+        binario = options['formato'] in BINARIOS
+
+        if not options['saida']:
+            saida = sys.stdout.buffer if binario else sys.stdout
+            for parte in conteudo:
+                saida.write(parte)
+            return
+
+        total = 0
+        modo = {'mode': 'wb'} if binario else {'mode': 'w', 'newline': '', 'encoding': 'utf-8'}
+        with open(options['saida'], **modo) as arquivo:
+            for parte in conteudo:
+                arquivo.write(parte)
+                total += 1
+
+        if options['formato'] == 'csv':
+            total -= 1  # cabeçalho
+        self.stderr.write(
+            self.style.SUCCESS(f"{total} usuário(s) exportado(s) para {options['saida']}")
+        )
@@ -0,0 +1,82 @@
+# usuarios/management/commands/importar_usuarios.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from usuarios.importacao import importar, inicializar_processo
+
+class Command(BaseCommand):
+    help = 'Importa usuários em lote a partir de um arquivo CSV ou XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'arquivo',
+            help='Arquivo .csv ou .xlsx com as colunas nome, email, telefone e senha'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Quantidade de linhas por lote (padrão: 1000)'
+        )
+        parser.add_argument(
+            '--processos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processos usados para gerar os hashes das senhas (padrão: nº de CPUs)'
+        )
+        parser.add_argument(
+            '--max-erros',
+            type=int,
+            default=20,
+            help='Quantidade máxima de erros exibidos (padrão: 20)'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        processos = options['processos']
+
+        if not os.path.exists(options['arquivo']):
+            raise CommandError(f"Arquivo não encontrado: {options['arquivo']}")
+
+        erros_exibidos = 0
+        inicio = time.perf_counter()
+
+        def ao_erro(numero, detalhes):
+            nonlocal erros_exibidos
+            if erros_exibidos < options['max_erros']:
+                self.stdout.write(self.style.WARNING(f'Linha {numero}: {detalhes}'))
+                erros_exibidos += 1
+
+        def ao_processar(totais):
+            self.stdout.write(
+                f"{totais['linhas']} linha(s) processada(s), "
+                f"{totais['criados']} usuário(s) criado(s)"
+            )
+
+        with ProcessPoolExecutor(max_workers=processos,
+                                 initializer=inicializar_processo) as pool:
+
+            def mapear(funcao, senhas):
+                # o hash (PBKDF2) é distribuído entre os processos
+                tamanho_pedaco = max(1, len(senhas) // (processos * 4))
+                return pool.map(funcao, senhas, chunksize=tamanho_pedaco)
+
+            try:
+                totais = importar(options['arquivo'], lote, mapear, ao_erro, ao_processar)
+            except ValueError as erro:
+                raise CommandError(str(erro))
+
+        duracao = time.perf_counter() - inicio
+        por_segundo = totais['linhas'] / duracao if duracao else 0
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nImportação concluída em {duracao:.1f}s ({por_segundo:.0f} linhas/s)\n"
+                f"  Criados: {totais['criados']}\n"
+                f"  Duplicados: {totais['duplicados']}\n"
+                f"  Inválidos: {totais['invalidos']}"
+            )
+        )
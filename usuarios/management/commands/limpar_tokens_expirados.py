@@ -0,0 +1,44 @@
+# usuarios/management/commands/limpar_tokens_expirados.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from usuarios.models import Usuario
+
+class Command(BaseCommand):
+    help = 'Remove os tokens de recuperação de senha expirados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Quantidade de usuários atualizados por UPDATE (padrão: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        agora = timezone.now()
+        total = 0
+
+        # Cada lote é um único UPDATE set-based, usando o índice
+        # de reset_token_expires para localizar os ids
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    Usuario.objects
+                    .filter(reset_token_expires__lte=agora)
+                    .order_by()
+                    .values_list('id', flat=True)[:lote]
+                )
+                if not ids:
+                    break
+
+                total += Usuario.objects.filter(id__in=ids).update(
+                    reset_token=None,
+                    reset_token_expires=None
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{total} token(s) expirado(s) removido(s)')
+        )
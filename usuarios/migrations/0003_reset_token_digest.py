@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-19 12:19
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def converter_tokens_para_digest(apps, schema_editor):
+    # Tokens pendentes eram salvos em texto puro:
+    # converte para o digest para que continuem válidos
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    pendentes = Usuario.objects.exclude(reset_token__isnull=True).exclude(reset_token='')
+    for usuario in pendentes.iterator():
+        usuario.reset_token = hashlib.sha256(usuario.reset_token.encode('utf-8')).hexdigest()
+        usuario.save(update_fields=['reset_token'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_usuario_reset_token_usuario_reset_token_expires'),
+    ]
+
+    operations = [
+        migrations.RunPython(converter_tokens_para_digest, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='usuario',
+            name='reset_token',
+            field=models.CharField(blank=True, db_index=True, help_text='Digest SHA-256 do token para recuperação de senha', max_length=64, null=True, verbose_name='Token de Recuperação'),
+        ),
+        migrations.AlterField(
+            model_name='usuario',
+            name='reset_token_expires',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Data e hora de expiração do token de recuperação', null=True, verbose_name='Expiração do Token'),
+        ),
+    ]
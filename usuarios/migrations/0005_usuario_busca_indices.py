@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-19 12:24
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def preencher_nome_busca(apps, schema_editor):
+    # mesma normalização de usuarios.models.normalizar_busca
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    for usuario in Usuario.objects.only('id', 'nome').iterator():
+        texto = unicodedata.normalize('NFKD', usuario.nome or '')
+        texto = ''.join(c for c in texto if not unicodedata.combining(c))
+        Usuario.objects.filter(id=usuario.id).update(nome_busca=' '.join(texto.lower().split()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_emailpendente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='nome_busca',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Nome normalizado (minúsculas, sem acentos), preenchido ao salvar', max_length=80, verbose_name='Nome para busca'),
+        ),
+        migrations.RunPython(preencher_nome_busca, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['nome', 'id'], name='usuarios_nome_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['nome_busca'], name='usuarios_nome_busca_idx'),
+        ),
+    ]
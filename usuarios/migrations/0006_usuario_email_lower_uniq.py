@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-19 12:26
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower, Trim
+
+
+def canonizar_emails(apps, schema_editor):
+    # e-mails passam a ser salvos sempre em minúsculas
+    Usuario = apps.get_model('usuarios', 'Usuario')
+
+    # contas que só diferem em maiúsculas/espaços virariam o mesmo
+    # e-mail: não dá para escolher qual manter aqui, então a migração
+    # para e lista as contas para serem unificadas antes
+    duplicados = list(
+        Usuario.objects
+        .annotate(canonico=Lower(Trim('email')))
+        .values('canonico')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+        .values_list('canonico', flat=True)
+    )
+    if duplicados:
+        contas = (
+            Usuario.objects
+            .annotate(canonico=Lower(Trim('email')))
+            .filter(canonico__in=duplicados[:20])
+            .order_by('canonico', 'id')
+        )
+        linhas = '\n'.join(f'  {conta.canonico}: id={conta.id} ({conta.email!r})' for conta in contas)
+        raise RuntimeError(
+            f'{len(duplicados)} e-mail(s) cadastrado(s) em mais de uma conta, '
+            'diferindo só em maiúsculas ou espaços. Unifique ou altere essas '
+            f'contas e rode a migração novamente:\n{linhas}'
+        )
+
+    Usuario.objects.update(email=Lower(Trim('email')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0005_usuario_busca_indices'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonizar_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='usuario',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='usuarios_email_lower_uniq'),
+        ),
+    ]
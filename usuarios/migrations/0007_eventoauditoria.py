@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 12:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0006_usuario_email_lower_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(blank=True, default='', max_length=254, verbose_name='E-mail informado')),
+                ('tipo', models.CharField(choices=[('login', 'Login'), ('login_falhou', 'Login com falha'), ('refresh', 'Refresh de token'), ('senha_alterada', 'Senha alterada'), ('recuperacao_solicitada', 'Recuperação de senha solicitada'), ('senha_redefinida', 'Senha redefinida')], max_length=30, verbose_name='Tipo')),
+                ('ip', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP')),
+                ('criado', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data do evento')),
+                ('usuario', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='usuarios.usuario', verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Evento de auditoria',
+                'verbose_name_plural': 'Eventos de auditoria',
+                'db_table': 'eventos_auditoria',
+                'ordering': ['-criado'],
+                'indexes': [models.Index(fields=['usuario', 'criado'], name='auditoria_usuario_idx'), models.Index(fields=['criado'], name='auditoria_criado_idx')],
+            },
+        ),
+    ]
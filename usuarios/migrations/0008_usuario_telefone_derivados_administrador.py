@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+def preencher_telefones(apps, schema_editor):
+    # mesma regra de Usuario.formatar_telefone
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    for usuario in Usuario.objects.exclude(telefone__isnull=True).exclude(telefone='').only('id', 'telefone').iterator():
+        numeros = ''.join(filter(str.isdigit, usuario.telefone))
+        formatado = usuario.telefone
+        if len(numeros) == 11:
+            formatado = f'({numeros[:2]}) {numeros[2:7]}-{numeros[7:]}'
+        Usuario.objects.filter(id=usuario.id).update(
+            telefone_numeros=numeros,
+            telefone_formatado=formatado
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0007_eventoauditoria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='administrador',
+            field=models.BooleanField(default=False, help_text='Pode acessar endpoints administrativos (ex: exportação)', verbose_name='Administrador'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='telefone_formatado',
+            field=models.CharField(blank=True, editable=False, max_length=15, null=True, verbose_name='Telefone formatado'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='telefone_numeros',
+            field=models.CharField(blank=True, default='', editable=False, max_length=15, verbose_name='Telefone (somente números)'),
+        ),
+        migrations.RunPython(preencher_telefones, migrations.RunPython.noop),
+    ]
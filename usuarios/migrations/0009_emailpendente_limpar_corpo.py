@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-19 16:02
+
+from django.db import migrations
+
+
+def limpar_corpo_enviados(apps, schema_editor):
+    # o corpo do e-mail de recuperação tem o token em texto puro:
+    # não fica no banco depois do envio (ou da falha definitiva)
+    EmailPendente = apps.get_model('usuarios', 'EmailPendente')
+    EmailPendente.objects.filter(status__in=['enviado', 'morto']).exclude(corpo='').update(corpo='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0008_usuario_telefone_derivados_administrador'),
+    ]
+
+    operations = [
+        migrations.RunPython(limpar_corpo_enviados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-19 21:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def remover_tokens_pendentes(apps, schema_editor):
+    # os e-mails de recuperação ainda na fila têm o token em texto puro
+    # no terceiro parágrafo do corpo: passa a ser o marcador, e o token
+    # é gerado de novo no envio
+    EmailPendente = apps.get_model('usuarios', 'EmailPendente')
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    pendentes = EmailPendente.objects.filter(
+        status='pendente', assunto='Recuperação de senha', usuario__isnull=True
+    )
+    for email in pendentes.iterator():
+        paragrafos = email.corpo.split('\n\n')
+        email.usuario = Usuario.objects.filter(email=email.destinatario).first()
+        if email.usuario is None or len(paragrafos) < 3:
+            email.status, email.corpo = 'morto', ''
+        else:
+            paragrafos[2] = '{token}'
+            email.corpo = '\n\n'.join(paragrafos)
+        email.save(update_fields=['usuario', 'status', 'corpo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0009_emailpendente_limpar_corpo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailpendente',
+            name='usuario',
+            field=models.ForeignKey(blank=True, help_text='Dono do token de recuperação, gerado só no envio', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='usuarios.usuario', verbose_name='Usuário'),
+        ),
+        migrations.RunPython(remover_tokens_pendentes, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,67 @@
 # usuarios/models.py
 from django.db import models
+from django.db.models.functions import Lower
 from django.core.validators import RegexValidator
 from django.contrib.auth.hashers import make_password, check_password
+import hashlib
 import secrets
+import unicodedata
 from datetime import timedelta
 from django.utils import timezone
 
+
+def gerar_digest_token(token):
+    """
+    Retorna o digest SHA-256 (hex) do token de recuperação.
+    Apenas o digest é salvo no banco, permitindo buscar
+    o usuário diretamente pelo índice sem expor o token
+    """
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def normalizar_email(email):
+    """
+    Forma canônica do e-mail (minúsculas, sem espaços nas pontas).
+    É a forma salva no banco e usada em todas as buscas
+    """
+    return (email or '').strip().lower()
+
+
+def normalizar_busca(texto):
+    """
+    Normaliza um texto para busca: minúsculas, sem acentos
+    e sem espaços repetidos. Ex: "  José  Álvares" -> "jose alvares"
+    """
+    if not texto:
+        return ''
+    sem_acentos = unicodedata.normalize('NFKD', texto)
+    sem_acentos = ''.join(c for c in sem_acentos if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().split())
+
+
+def filtro_prefixo(campo, prefixo):
+    """
+    Filtro de prefixo como intervalo (campo >= prefixo AND campo < prefixo + '\uffff').
+    Diferente do LIKE 'x%', o intervalo sempre usa o índice do campo
+    """
+    return models.Q(**{f'{campo}__gte': prefixo, f'{campo}__lt': prefixo + '\uffff'})
+
+
+class UsuarioQuerySet(models.QuerySet):
+
+    def buscar(self, termo):
+        """
+        Busca por prefixo do nome (normalizado) ou do e-mail,
+        usando os índices de nome_busca e email
+        """
+        termo = normalizar_busca(termo)
+        if not termo:
+            return self
+        return self.filter(
+            filtro_prefixo('nome_busca', termo) | filtro_prefixo('email', termo)
+        )
+
+
 class Usuario(models.Model):
     
     nome = models.CharField(max_length=80,
@@ -13,6 +69,13 @@ class Usuario(models.Model):
                     help_text='Nome completo do usuário',
                     null=False)
     
+    nome_busca = models.CharField(max_length=80,
+                    verbose_name='Nome para busca',
+                    help_text='Nome normalizado (minúsculas, sem acentos), preenchido ao salvar',
+                    blank=True,
+                    default='',
+                    editable=False)
+    
     email = models.EmailField(unique=True, 
                     verbose_name='E-mail',
                     help_text='E-mail do usuário',
@@ -32,6 +95,24 @@ class Usuario(models.Model):
         ]
     )
     
+    # campos derivados do telefone, calculados ao salvar
+    # (evita reformatar o telefone a cada serialização)
+    telefone_numeros = models.CharField(max_length=15,
+                    verbose_name='Telefone (somente números)',
+                    blank=True,
+                    default='',
+                    editable=False)
+    
+    telefone_formatado = models.CharField(max_length=15,
+                    verbose_name='Telefone formatado',
+                    blank=True,
+                    null=True,
+                    editable=False)
+    
+    administrador = models.BooleanField(default=False,
+                    verbose_name='Administrador',
+                    help_text='Pode acessar endpoints administrativos (ex: exportação)')
+    
     senha = models.CharField(max_length=255,
                     verbose_name='Senha',
                     help_text='Senha do usuário',
@@ -44,17 +125,19 @@ class Usuario(models.Model):
                     verbose_name='Atualizado em')
     
     reset_token = models.CharField(
-        max_length=100,
+        max_length=64,
         verbose_name='Token de Recuperação',
         blank=True,
         null=True,
-        help_text='Token para recuperação de senha'
+        db_index=True,
+        help_text='Digest SHA-256 do token para recuperação de senha'
     )
     
     reset_token_expires = models.DateTimeField(
         verbose_name='Expiração do Token',
         blank=True,
         null=True,
+        db_index=True,
         help_text='Data e hora de expiração do token de recuperação'
     )
     
@@ -64,6 +147,19 @@ class Usuario(models.Model):
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
         ordering = ['nome']  # ordena por nome (ordem alfabetica)
+        indexes = [
+            # listagem paginada por cursor (ordem: nome, id)
+            models.Index(fields=['nome', 'id'], name='usuarios_nome_id_idx'),
+            # busca por prefixo (?q=)
+            models.Index(fields=['nome_busca'], name='usuarios_nome_busca_idx'),
+        ]
+        constraints = [
+            # garante unicidade sem diferenciar maiúsculas, mesmo para
+            # escritas que não passam pelo save() (update, bulk_create)
+            models.UniqueConstraint(Lower('email'), name='usuarios_email_lower_uniq'),
+        ]
+    
+    objects = UsuarioQuerySet.as_manager()
     
     def __repr__(self):
         """
@@ -89,6 +185,15 @@ class Usuario(models.Model):
         self.senha.startswith('pbkdf2_sha256'):
             # se a senha for alterada
             self.senha = make_password(self.senha)
+        self.preencher_campos_derivados()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'nome' in update_fields:
+                update_fields.add('nome_busca')
+            if 'telefone' in update_fields:
+                update_fields |= {'telefone_numeros', 'telefone_formatado'}
+            kwargs['update_fields'] = update_fields
         # se a senha for criada ou atualizada
         # chama o save da superclasse
         super().save(*args, **kwargs)
@@ -116,6 +221,26 @@ class Usuario(models.Model):
         '''
         return False
     
+    def preencher_campos_derivados(self):
+        """
+        Preenche os campos calculados a partir de outros campos.
+        Chamado pelo save() e por quem grava sem o save() (bulk_create)
+        """
+        # e-mail sempre na forma canônica
+        self.email = normalizar_email(self.email)
+        # mantém o nome normalizado usado na busca
+        self.nome_busca = normalizar_busca(self.nome)
+        # telefone normalizado (apenas números) e formatado
+        self.telefone_numeros = ''.join(filter(str.isdigit, self.telefone or ''))
+        self.telefone_formatado = self.formatar_telefone() if self.telefone else None
+    
+    @property
+    def is_staff(self):
+        '''
+        Usado pela permissão IsAdminUser do DRF
+        '''
+        return self.administrador
+    
     def formatar_telefone(self):
         """
         Retorna o telefone formatado
@@ -131,12 +256,14 @@ class Usuario(models.Model):
     def gerar_token_recuperacao(self):
         """
         Gera um token único para recuperação de senha
+        O token em texto puro é retornado (para envio por e-mail)
+        e apenas o seu digest é salvo no banco
         """
         # Gera um token seguro
         token = secrets.token_urlsafe(50)
         
         # Define expiração (1 hora a partir de agora)
-        self.reset_token = token
+        self.reset_token = gerar_digest_token(token)
         self.reset_token_expires = timezone.now() + timedelta(hours=1)
         
         # Salva no banco
@@ -144,30 +271,214 @@ class Usuario(models.Model):
         
         return token
     
+    @classmethod
+    def buscar_por_token(cls, token, email=None):
+        """
+        Busca o usuário dono de um token válido (não expirado)
+        usando o índice do digest. Retorna None se não existir.
+        Não faz nenhuma escrita no banco: tokens expirados são
+        removidos pelo comando limpar_tokens_expirados
+        """
+        if not token:
+            return None
+        
+        filtros = {
+            'reset_token': gerar_digest_token(token),
+            'reset_token_expires__gt': timezone.now(),
+        }
+        if email is not None:
+            filtros['email'] = email
+        
+        return cls.objects.filter(**filtros).first()
+    
     def validar_token_recuperacao(self, token):
         """
         Verifica se o token é válido e não expirou
+        (somente leitura, sem efeitos colaterais)
         """
         if not self.reset_token or not self.reset_token_expires:
             return False
         
         # Verifica se o token corresponde e não expirou
-        if self.reset_token != token:
+        if not secrets.compare_digest(self.reset_token, gerar_digest_token(token)):
             return False
         
-        if timezone.now() > self.reset_token_expires:
-            # Token expirado - limpa os campos
-            self.reset_token = None
-            self.reset_token_expires = None
-            self.save(update_fields=['reset_token', 'reset_token_expires'])
-            return False
-        
-        return True
+        return timezone.now() <= self.reset_token_expires
     
-    def limpar_token_recuperacao(self):
+    def limpar_token_recuperacao(self, salvar=True):
         """
         Limpa os campos de token de recuperação
         """
         self.reset_token = None
         self.reset_token_expires = None
-        self.save(update_fields=['reset_token', 'reset_token_expires'])
\ No newline at end of file
+        if salvar:
+            self.save(update_fields=['reset_token', 'reset_token_expires'])
+
+
+class EmailPendente(models.Model):
+    """
+    Fila (outbox) de e-mails a serem enviados.
+    A linha é gravada na mesma transação que gerou o e-mail
+    e o envio é feito depois pelo comando enviar_emails.
+    O corpo nunca tem o token de recuperação: o marcador TOKEN_MARCADOR
+    é trocado por um token novo do usuário no envio
+    """
+    
+    TOKEN_MARCADOR = '{token}'
+    
+    PENDENTE = 'pendente'
+    ENVIADO = 'enviado'
+    MORTO = 'morto'  # excedeu o número de tentativas (dead letter)
+    
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (ENVIADO, 'Enviado'),
+        (MORTO, 'Falhou definitivamente'),
+    ]
+    
+    destinatario = models.EmailField(verbose_name='Destinatário')
+    
+    assunto = models.CharField(max_length=200,
+                    verbose_name='Assunto')
+    
+    corpo = models.TextField(verbose_name='Corpo')
+    
+    usuario = models.ForeignKey(Usuario,
+                    on_delete=models.CASCADE,
+                    null=True,
+                    blank=True,
+                    related_name='+',
+                    verbose_name='Usuário',
+                    help_text='Dono do token de recuperação, gerado só no envio')
+    
+    status = models.CharField(max_length=10,
+                    choices=STATUS_CHOICES,
+                    default=PENDENTE,
+                    verbose_name='Status')
+    
+    tentativas = models.PositiveSmallIntegerField(default=0,
+                    verbose_name='Tentativas')
+    
+    proxima_tentativa = models.DateTimeField(default=timezone.now,
+                    verbose_name='Próxima tentativa')
+    
+    reserva = models.CharField(max_length=32,
+                    blank=True,
+                    default='',
+                    verbose_name='Reserva',
+                    help_text='Identificador do worker que reservou o envio')
+    
+    ultimo_erro = models.TextField(blank=True,
+                    default='',
+                    verbose_name='Último erro')
+    
+    criado = models.DateTimeField(auto_now_add=True,
+                    verbose_name='Criado em')
+    
+    enviado_em = models.DateTimeField(null=True,
+                    blank=True,
+                    verbose_name='Enviado em')
+    
+    class Meta:
+        db_table = 'emails_pendentes'
+        verbose_name = 'E-mail pendente'
+        verbose_name_plural = 'E-mails pendentes'
+        ordering = ['proxima_tentativa']
+        indexes = [
+            # usado pelo worker para buscar o próximo lote
+            models.Index(fields=['status', 'proxima_tentativa'],
+                         name='emails_fila_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.assunto} -> {self.destinatario} ({self.status})'
+
+
+class EventoAuditoriaQuerySet(models.QuerySet):
+
+    def no_periodo(self, inicio=None, fim=None):
+        """
+        Filtra eventos no intervalo [inicio, fim)
+        """
+        if inicio is not None:
+            self = self.filter(criado__gte=inicio)
+        if fim is not None:
+            self = self.filter(criado__lt=fim)
+        return self
+
+    def do_usuario(self, usuario_id, inicio=None, fim=None):
+        """
+        Eventos de um usuário no período (índice usuario + criado),
+        do mais recente para o mais antigo
+        """
+        return (
+            self.filter(usuario_id=usuario_id)
+            .no_periodo(inicio, fim)
+            .order_by('-criado')
+        )
+
+
+class EventoAuditoria(models.Model):
+    """
+    Registro de eventos de autenticação.
+    Os eventos são gravados em lote pelo buffer de usuarios.auditoria
+    """
+    
+    LOGIN = 'login'
+    LOGIN_FALHOU = 'login_falhou'
+    REFRESH = 'refresh'
+    SENHA_ALTERADA = 'senha_alterada'
+    RECUPERACAO_SOLICITADA = 'recuperacao_solicitada'
+    SENHA_REDEFINIDA = 'senha_redefinida'
+    
+    TIPO_CHOICES = [
+        (LOGIN, 'Login'),
+        (LOGIN_FALHOU, 'Login com falha'),
+        (REFRESH, 'Refresh de token'),
+        (SENHA_ALTERADA, 'Senha alterada'),
+        (RECUPERACAO_SOLICITADA, 'Recuperação de senha solicitada'),
+        (SENHA_REDEFINIDA, 'Senha redefinida'),
+    ]
+    
+    # sem constraint no banco: o histórico continua
+    # mesmo depois que o usuário é removido
+    usuario = models.ForeignKey(Usuario,
+                    on_delete=models.DO_NOTHING,
+                    db_constraint=False,
+                    db_index=False,  # coberto por auditoria_usuario_idx
+                    null=True,
+                    blank=True,
+                    related_name='+',
+                    verbose_name='Usuário')
+    
+    email = models.CharField(max_length=254,
+                    blank=True,
+                    default='',
+                    verbose_name='E-mail informado')
+    
+    tipo = models.CharField(max_length=30,
+                    choices=TIPO_CHOICES,
+                    verbose_name='Tipo')
+    
+    ip = models.GenericIPAddressField(null=True,
+                    blank=True,
+                    verbose_name='IP')
+    
+    # preenchido no momento do evento (e não no INSERT em lote)
+    criado = models.DateTimeField(default=timezone.now,
+                    verbose_name='Data do evento')
+    
+    objects = EventoAuditoriaQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'eventos_auditoria'
+        verbose_name = 'Evento de auditoria'
+        verbose_name_plural = 'Eventos de auditoria'
+        ordering = ['-criado']
+        indexes = [
+            models.Index(fields=['usuario', 'criado'], name='auditoria_usuario_idx'),
+            models.Index(fields=['criado'], name='auditoria_criado_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.get_tipo_display()} - {self.email or self.usuario_id} ({self.criado})'
@@ -0,0 +1,86 @@
+# usuarios/pagination.py
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class UsuarioCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) da listagem pública de usuários.
+    O cursor guarda a posição (nome, id) do último item da página e a
+    próxima página é uma busca no índice (nome, id) a partir dela, sem
+    OFFSET (o CursorPagination do DRF guarda só o nome e desempata
+    nomes repetidos com OFFSET). O tamanho da página tem um limite fixo
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('nome', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        tamanho = self.get_page_size(request)
+        posicao, reverso = self.decodificar_cursor(request)
+
+        if reverso:
+            queryset = queryset.order_by('-nome', '-id')
+        else:
+            queryset = queryset.order_by('nome', 'id')
+        if posicao is not None:
+            nome, id_ = posicao
+            # "nome >= x" delimita a faixa no índice; o OR só desempata
+            # os nomes iguais ao do cursor
+            if reverso:
+                queryset = queryset.filter(nome__lte=nome).filter(Q(nome__lt=nome) | Q(id__lt=id_))
+            else:
+                queryset = queryset.filter(nome__gte=nome).filter(Q(nome__gt=nome) | Q(id__gt=id_))
+
+        resultados = list(queryset[:tamanho + 1])
+        mais = len(resultados) > tamanho
+        self.page = resultados[:tamanho]
+        if reverso:
+            self.page.reverse()
+
+        # links: o "próximo" parte do último item, o "anterior" do primeiro
+        self.proximo = self.page[-1] if self.page and (reverso or mais) else None
+        self.anterior = self.page[0] if self.page and (mais if reverso else posicao is not None) else None
+        return self.page
+
+    def get_next_link(self):
+        if self.proximo is None:
+            return None
+        return self.codificar_cursor(self.proximo, reverso=False)
+
+    def get_previous_link(self):
+        if self.anterior is None:
+            return None
+        return self.codificar_cursor(self.anterior, reverso=True)
+
+    def decodificar_cursor(self, request):
+        """
+        ((nome, id), reverso) do cursor da requisição, ou (None, False)
+        na primeira página
+        """
+        codificado = request.query_params.get(self.cursor_query_param)
+        if codificado is None:
+            return None, False
+
+        try:
+            tokens = parse.parse_qs(b64decode(codificado.encode('ascii')).decode('ascii'))
+            posicao = (tokens['p'][0], int(tokens['i'][0]))
+            reverso = tokens.get('r', ['0'])[0] == '1'
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return posicao, reverso
+
+    def codificar_cursor(self, usuario, reverso):
+        tokens = {'p': usuario.nome, 'i': usuario.id}
+        if reverso:
+            tokens['r'] = '1'
+        codificado = b64encode(parse.urlencode(tokens).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, codificado)
@@ -1,9 +1,13 @@
 # usuarios/serializers.py
 from rest_framework import serializers
-from usuarios.models import Usuario
+from django.db import IntegrityError, transaction
+from nucleo.renderizacao import TiposNativosMixin
+from usuarios.models import Usuario, normalizar_email
 import re
 
-class CadastroSerializer(serializers.ModelSerializer):
+EMAIL_JA_CADASTRADO = 'Este email já está cadastrado'
+
+class CadastroSerializer(TiposNativosMixin, serializers.ModelSerializer):
     # "equivale" ao to_dict do Flask 
     # (só que mais poderoso)
 
@@ -35,6 +39,11 @@ class CadastroSerializer(serializers.ModelSerializer):
         # Informar os campos de apenas leitura
         # Não podem ser modificados
         read_only_fields = ['id', 'criado', 'atualizado']
+        
+        # Sem o UniqueValidator automático (um SELECT a mais por
+        # cadastro e sujeito a corrida): a unicidade é garantida
+        # pela constraint do banco, tratada em create/update
+        extra_kwargs = {'email': {'validators': []}}
     
     def validate_nome(self, value):
         # validar o campo nome
@@ -46,14 +55,9 @@ class CadastroSerializer(serializers.ModelSerializer):
         return value
     
     def validate_email(self, value):
-        email_criacao = value.lower().strip()
-        # verificar se o email existe
-        if Usuario.objects.filter(
-            email=email_criacao).exists():
-            raise serializers.ValidationError(
-                'Este email já está cadastrado'
-            )
-        return email_criacao
+        # apenas normaliza: a verificação de duplicidade
+        # é feita pela constraint única no INSERT/UPDATE
+        return normalizar_email(value)
     
     def validate_senha(self, value):
         if value.isdigit():
@@ -114,7 +118,13 @@ class CadastroSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('senha_confirmacao', None)
-        return Usuario.objects.create(**validated_data)
+        try:
+            with transaction.atomic():
+                return Usuario.objects.create(**validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({
+                'email': [EMAIL_JA_CADASTRADO]
+            })
 
     def update(self, instance, validated_data):
         '''
@@ -142,10 +152,33 @@ class CadastroSerializer(serializers.ModelSerializer):
         # atualizar senha do usuario
         for campo, valor in validated_data.items():
             setattr(instance, campo, valor)
-        instance.save()
+        try:
+            with transaction.atomic():
+                instance.save()
+        except IntegrityError:
+            raise serializers.ValidationError({
+                'email': [EMAIL_JA_CADASTRADO]
+            })
         return instance
 
 
+class ImportacaoUsuarioSerializer(CadastroSerializer):
+    '''
+    Valida uma linha da importação em lote (comando importar_usuarios)
+    com as mesmas regras do cadastro.
+    A duplicidade de e-mail é verificada por lote, com uma única
+    consulta, e não linha a linha
+    '''
+    senha_confirmacao = None  # arquivos de importação não têm confirmação
+
+    class Meta(CadastroSerializer.Meta):
+        fields = ['id', 'nome', 'email', 'telefone', 'senha',
+                  'criado', 'atualizado']
+
+    def validate(self, data):
+        return data
+
+
 class LoginSerializer(serializers.Serializer):
     '''
     Essa classe não faz parte do Model
@@ -161,10 +194,11 @@ class LoginSerializer(serializers.Serializer):
     )
 
     def validate(self, data):
-        email_login = data.get('email').lower().strip()
+        email_login = normalizar_email(data.get('email'))
         senha_login = data.get('senha')
 
         # 1º passo -> buscar o usuário
+        # (uma única consulta no índice único do e-mail canônico)
         try:
             usuario = Usuario.objects.get(
                 email=email_login)
@@ -184,22 +218,15 @@ class LoginSerializer(serializers.Serializer):
         return data
 
 
-class UsuarioSerializer(serializers.ModelSerializer):
+class UsuarioSerializer(TiposNativosMixin, serializers.ModelSerializer):
     '''
     Serializer para retornar dados do usuário
     '''
-    telefone_formatado = serializers.SerializerMethodField()
-    
     class Meta:
         model = Usuario
+        # telefone_formatado é calculado ao salvar (Usuario.preencher_campos_derivados)
         fields = ['id', 'nome', 'email', 'telefone', 'telefone_formatado', 'criado']
-        read_only_fields = ['id', 'criado']
-    
-    def get_telefone_formatado(self, obj):
-        """
-        Retorna o telefone formatado
-        """
-        return obj.formatar_telefone() if obj.telefone else None
+        read_only_fields = ['id', 'criado', 'telefone_formatado']
 
 
 class LoginResponseSerializer(serializers.Serializer):
@@ -231,7 +258,7 @@ class EsqueciSenhaSerializer(serializers.Serializer):
         """
         Verifica se o e-mail existe no sistema
         """
-        email = value.lower().strip()
+        email = normalizar_email(value)
         
         if not Usuario.objects.filter(email=email).exists():
             # Por segurança, não revelamos se o e-mail existe ou não
@@ -258,17 +285,12 @@ class ValidarTokenSerializer(serializers.Serializer):
     )
     
     def validate(self, data):
-        email = data['email'].lower().strip()
+        email = normalizar_email(data['email'])
         token = data['token'].strip()
         
-        try:
-            usuario = Usuario.objects.get(email=email)
-        except Usuario.DoesNotExist:
-            raise serializers.ValidationError({
-                'email': 'Usuário não encontrado'
-            })
-        
-        if not usuario.validar_token_recuperacao(token):
+        # Busca direta pelo digest do token (indexado), sem escrita
+        usuario = Usuario.buscar_por_token(token, email=email)
+        if usuario is None:
             raise serializers.ValidationError({
                 'token': 'Token inválido ou expirado'
             })
@@ -330,7 +352,7 @@ class RedefinirSenhaSerializer(serializers.Serializer):
         return value
     
     def validate(self, data):
-        email = data['email'].lower().strip()
+        email = normalizar_email(data['email'])
         token = data['token'].strip()
         nova_senha = data['nova_senha']
         confirmar_senha = data['confirmar_senha']
@@ -341,15 +363,9 @@ class RedefinirSenhaSerializer(serializers.Serializer):
                 'confirmar_senha': 'As senhas não coincidem'
             })
         
-        # Verificar token e usuário
-        try:
-            usuario = Usuario.objects.get(email=email)
-        except Usuario.DoesNotExist:
-            raise serializers.ValidationError({
-                'email': 'Usuário não encontrado'
-            })
-        
-        if not usuario.validar_token_recuperacao(token):
+        # Verificar token e usuário (busca direta pelo digest do token)
+        usuario = Usuario.buscar_por_token(token, email=email)
+        if usuario is None:
             raise serializers.ValidationError({
                 'token': 'Token inválido ou expirado'
             })
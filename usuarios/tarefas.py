@@ -0,0 +1,62 @@
+# usuarios/tarefas.py
+"""
+Tarefas em segundo plano do app usuarios (veja: tarefas/registro.py)
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from tarefas.fila import caminho_no_diretorio
+from tarefas.registro import tarefa
+from usuarios.exportacao import BINARIOS, FORMATOS, exportar
+from usuarios.importacao import importar
+
+
+@tarefa('usuarios.importar', max_tentativas=1)
+def importar_usuarios(progresso, arquivo, lote=1000):
+    """Importa usuários de um arquivo CSV ou XLSX (em TAREFAS_DIRETORIO)"""
+    caminho = caminho_no_diretorio(arquivo)
+    # a tarefa já roda em um processo do pool do worker: os hashes
+    # são gerados neste processo (sem um pool dentro do pool)
+    erros = []
+
+    def ao_erro(numero, detalhes):
+        if len(erros) < 20:
+            erros.append({'linha': numero, 'detalhes': detalhes})
+
+    def ao_processar(totais):
+        progresso(mensagem=(
+            f"{totais['linhas']} linha(s) processada(s), "
+            f"{totais['criados']} usuário(s) criado(s)"
+        ))
+
+    progresso(0, f'Importando {caminho.name} ({caminho.stat().st_size} bytes)', forcar=True)
+    totais = importar(caminho, lote, ao_erro=ao_erro, ao_processar=ao_processar)
+    return {**totais, 'erros': erros}
+
+
+@tarefa('usuarios.exportar')
+def exportar_usuarios(progresso, formato='csv', saida=None, lote=2000):
+    """Exporta todos os usuários em CSV, NDJSON ou MessagePack para um arquivo (em TAREFAS_DIRETORIO)"""
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato não suportado: {formato}')
+
+    saida = caminho_no_diretorio(
+        saida or f"usuarios_{timezone.now():%Y%m%d_%H%M%S_%f}.{formato}"
+    )
+    saida.parent.mkdir(parents=True, exist_ok=True)
+
+    total = 0
+    modo = {'mode': 'wb'} if formato in BINARIOS else {'mode': 'w', 'newline': '', 'encoding': 'utf-8'}
+    with open(saida, **modo) as arquivo:
+        for parte in exportar(formato, lote):
+            arquivo.write(parte)
+            total += 1
+            if total % lote == 0:
+                progresso(mensagem=f'{total} linha(s) exportada(s)')
+
+    if formato == 'csv':
+        total -= 1  # cabeçalho
+    # nome relativo ao diretório: baixado por GET /jobs/{id}/arquivo/
+    return {'arquivo': str(saida.relative_to(Path(settings.TAREFAS_DIRETORIO).resolve())), 'total': total}
@@ -1,4 +1,30 @@
+import csv
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from smtplib import SMTPException
+from unittest import mock
+
 import requests
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from nucleo.limites import armazem
+from nucleo.models import RespostaIdempotente
+from usuarios.auditoria import BufferAuditoria, buffer_auditoria
+from usuarios.emails import enviar_lote, limpar_enviados
+from usuarios.importacao import importar
+from usuarios.models import EmailPendente, EventoAuditoria, Usuario, gerar_digest_token
+from usuarios.pagination import UsuarioCursorPagination
 
 # Configurações
 BASE_URL = "http://localhost:8080"
@@ -58,6 +84,456 @@ def main():
         print("Falha ao renovar token.")
         print(resp.json())
 
+
+# a auditoria grava em outra thread (outra conexão), fora da transação do teste
+@override_settings(AUDITORIA_ATIVA=False)
+class ConsultasLoginCadastroTest(TestCase):
+    """
+    Garante a quantidade de consultas SQL dos endpoints de login e cadastro
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.usuario = Usuario.objects.create(
+            nome='Usuario Teste',
+            email='teste@email.com',
+            senha=SENHA
+        )
+
+    def test_login_faz_uma_unica_consulta(self):
+        with self.assertNumQueries(1):
+            resp = self.client.post('/usuarios/login/', {
+                'email': 'TESTE@Email.com',
+                'senha': SENHA
+            }, format='json')
+        self.assertEqual(resp.status_code, 200)
+
+    def test_cadastro_nao_consulta_antes_do_insert(self):
+        # SAVEPOINT + INSERT + RELEASE SAVEPOINT (sem SELECT de verificação)
+        with self.assertNumQueries(3):
+            resp = self.client.post('/usuarios/cadastro/', {
+                'nome': 'Novo Usuario',
+                'email': 'Novo@Email.com',
+                'senha': 'SenhaForte123',
+                'senha_confirmacao': 'SenhaForte123'
+            }, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()['usuario']['email'], 'novo@email.com')
+
+    def test_cadastro_email_duplicado_sem_diferenciar_maiusculas(self):
+        resp = self.client.post('/usuarios/cadastro/', {
+            'nome': 'Outro Usuario',
+            'email': 'Teste@EMAIL.com',
+            'senha': 'SenhaForte123',
+            'senha_confirmacao': 'SenhaForte123'
+        }, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('email', resp.json()['erro'])
+        self.assertEqual(Usuario.objects.count(), 1)
+
+    def test_cadastro_repetido_com_idempotency_key(self):
+        dados = {
+            'nome': 'Novo Usuario',
+            'email': 'novo@email.com',
+            'senha': 'SenhaForte123',
+            'senha_confirmacao': 'SenhaForte123'
+        }
+        primeira = self.client.post('/usuarios/cadastro/', dados, format='json',
+                                    HTTP_IDEMPOTENCY_KEY='cadastro-1')
+        # a repetição não executa a view: só busca a resposta guardada
+        with self.assertNumQueries(1):
+            repetida = self.client.post('/usuarios/cadastro/', dados, format='json',
+                                        HTTP_IDEMPOTENCY_KEY='cadastro-1')
+
+        self.assertEqual(repetida.status_code, 201)
+        self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+        self.assertEqual(repetida.content, primeira.content)
+        self.assertEqual(Usuario.objects.count(), 2)
+
+        # sem token, a chave vale só para o mesmo IP e a mesma requisição
+        outra = self.client.post('/usuarios/cadastro/', {**dados, 'nome': 'Outro'},
+                                 format='json', HTTP_IDEMPOTENCY_KEY='cadastro-1')
+        self.assertFalse(outra.has_header('Idempotent-Replayed'))
+        self.assertEqual(outra.status_code, 400)
+        outro_ip = self.client.post('/usuarios/cadastro/', dados, format='json',
+                                    HTTP_IDEMPOTENCY_KEY='cadastro-1', REMOTE_ADDR='10.0.0.2')
+        self.assertFalse(outro_ip.has_header('Idempotent-Replayed'))
+
+    def test_idempotency_key_do_usuario_com_outra_requisicao(self):
+        token = f'Bearer {AccessToken.for_user(self.usuario)}'
+        produto = {'nome': 'Produto', 'descricao': 'Descrição do produto', 'marca': 'Marca', 'preco': '10.00'}
+        primeira = self.client.post('/produtos/', produto, format='json',
+                                    HTTP_AUTHORIZATION=token, HTTP_IDEMPOTENCY_KEY='produto-1')
+        self.assertEqual(primeira.status_code, 201)
+        outra = self.client.post('/produtos/', {**produto, 'preco': '20.00'}, format='json',
+                                 HTTP_AUTHORIZATION=token, HTTP_IDEMPOTENCY_KEY='produto-1')
+        self.assertEqual(outra.status_code, 422)
+
+    def test_login_com_idempotency_key_nao_guarda_os_tokens(self):
+        dados = {'email': 'teste@email.com', 'senha': SENHA}
+        primeira = self.client.post('/usuarios/login/', dados, format='json', HTTP_IDEMPOTENCY_KEY='login-1')
+        repetida = self.client.post('/usuarios/login/', dados, format='json', HTTP_IDEMPOTENCY_KEY='login-1')
+        self.assertEqual(primeira.status_code, 200)
+        self.assertFalse(repetida.has_header('Idempotent-Replayed'))
+        self.assertFalse(RespostaIdempotente.objects.exists())
+
+
+
+@override_settings(
+    AUDITORIA_ATIVA=False,
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'anonimo': '100/min', 'usuario': '100/min', 'caro': '2/min'},
+    }
+)
+class LimiteRequisicoesTest(TestCase):
+    """
+    Faixas de limite (nucleo.limites) e cabeçalhos RateLimit-*
+    """
+
+    def setUp(self):
+        armazem().limpar()
+        self.client = APIClient()
+        Usuario.objects.create(nome='Usuario Teste', email='teste@email.com', senha=SENHA)
+
+    def tearDown(self):
+        armazem().limpar()
+
+    def test_login_recusado_acima_da_faixa_cara(self):
+        dados = {'email': 'teste@email.com', 'senha': SENHA}
+        primeira = self.client.post('/usuarios/login/', dados, format='json')
+        self.assertEqual(primeira.status_code, 200)
+        self.assertEqual(primeira['RateLimit-Limit'], '2')
+        self.assertEqual(primeira['RateLimit-Remaining'], '1')
+        self.assertEqual(primeira['RateLimit-Policy'], '2;w=60')
+
+        self.assertEqual(self.client.post('/usuarios/login/', dados, format='json').status_code, 200)
+        recusada = self.client.post('/usuarios/login/', dados, format='json')
+        self.assertEqual(recusada.status_code, 429)
+        self.assertEqual(recusada['RateLimit-Remaining'], '0')
+        self.assertGreater(int(recusada['Retry-After']), 0)
+
+        # a faixa cara não limita as demais ações
+        self.assertEqual(self.client.get('/produtos/').status_code, 200)
+
+
+
+@override_settings(AUDITORIA_ATIVA=False)
+class TokenRecuperacaoTest(TestCase):
+    """
+    Tokens de recuperação salvos como digest e limpeza dos expirados
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.usuario = Usuario.objects.create(nome='Usuario Teste', email='teste@email.com', senha=SENHA)
+
+    def test_busca_pelo_digest_sem_salvar_o_token(self):
+        token = self.usuario.gerar_token_recuperacao()
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.reset_token, gerar_digest_token(token))
+        self.assertNotEqual(self.usuario.reset_token, token)
+
+        self.assertEqual(Usuario.buscar_por_token(token, email='teste@email.com'), self.usuario)
+        self.assertIsNone(Usuario.buscar_por_token(token, email='outro@email.com'))
+        self.assertIsNone(Usuario.buscar_por_token(self.usuario.reset_token))
+
+        resp = self.client.post('/usuarios/validar-token/', {
+            'email': 'Teste@Email.com', 'token': token
+        }, format='json')
+        self.assertEqual(resp.status_code, 200)
+
+        Usuario.objects.filter(pk=self.usuario.pk).update(
+            reset_token_expires=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertIsNone(Usuario.buscar_por_token(token))
+
+    def test_limpeza_remove_so_os_expirados(self):
+        outro = Usuario.objects.create(nome='Outro Usuario', email='outro@email.com', senha=SENHA)
+        self.usuario.gerar_token_recuperacao()
+        outro.gerar_token_recuperacao()
+        Usuario.objects.filter(pk=self.usuario.pk).update(
+            reset_token_expires=timezone.now() - timedelta(minutes=1)
+        )
+
+        call_command('limpar_tokens_expirados', lote=1, stdout=StringIO())
+
+        self.usuario.refresh_from_db()
+        outro.refresh_from_db()
+        self.assertIsNone(self.usuario.reset_token)
+        self.assertIsNone(self.usuario.reset_token_expires)
+        self.assertIsNotNone(outro.reset_token)
+
+
+
+class ConexaoForaDoAr:
+    """
+    Conexão de e-mail que falha ao abrir (servidor SMTP fora do ar)
+    """
+
+    def open(self):
+        raise ConnectionRefusedError('servidor fora do ar')
+
+    def close(self):
+        pass
+
+
+class ConexaoQueFalhaNoEnvio(ConexaoForaDoAr):
+    """
+    Conexão que abre, mas recusa as mensagens (guarda os corpos)
+    """
+
+    def __init__(self):
+        self.corpos = []
+
+    def open(self):
+        pass
+
+    def send_messages(self, mensagens):
+        self.corpos.extend(mensagem.body for mensagem in mensagens)
+        raise SMTPException('mensagem recusada')
+
+
+@override_settings(AUDITORIA_ATIVA=False, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class FilaEmailsTest(TestCase):
+    """
+    Fila de e-mails (usuarios.emails) com o backend locmem
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.usuario = Usuario.objects.create(nome='Usuario Teste', email='teste@email.com', senha=SENHA)
+
+    def solicitar_recuperacao(self):
+        resp = self.client.post('/usuarios/esqueci-senha/', {'email': 'teste@email.com'}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        return EmailPendente.objects.get()
+
+    def test_token_gerado_so_no_envio(self):
+        email = self.solicitar_recuperacao()
+        # na fila, só o marcador: nenhum token existe ainda
+        self.assertIn(EmailPendente.TOKEN_MARCADOR, email.corpo)
+        self.assertEqual(email.usuario, self.usuario)
+        self.usuario.refresh_from_db()
+        self.assertIsNone(self.usuario.reset_token)
+
+        self.assertEqual(enviar_lote(), {'enviados': 1, 'reagendados': 0, 'mortos': 0})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['teste@email.com'])
+
+        # o token do e-mail é válido, mas não fica na tabela
+        token = mail.outbox[0].body.split('\n\n')[2]
+        self.assertEqual(Usuario.buscar_por_token(token), self.usuario)
+        email = EmailPendente.objects.get()
+        self.assertEqual(email.status, EmailPendente.ENVIADO)
+        self.assertEqual(email.corpo, '')
+
+        self.assertEqual(limpar_enviados(), 0)
+        EmailPendente.objects.update(enviado_em=timezone.now() - timedelta(days=8))
+        self.assertEqual(limpar_enviados(), 1)
+
+    @override_settings(EMAIL_FILA_MAX_TENTATIVAS=2)
+    def test_servidor_fora_do_ar_reagenda_e_depois_desiste(self):
+        self.solicitar_recuperacao()
+
+        self.assertEqual(enviar_lote(conexao=ConexaoForaDoAr()), {'enviados': 0, 'reagendados': 1, 'mortos': 0})
+        email = EmailPendente.objects.get()
+        self.assertEqual(email.tentativas, 1)
+        self.assertEqual(email.reserva, '')
+        self.assertIn('ConnectionRefusedError', email.ultimo_erro)
+        self.assertGreater(email.proxima_tentativa, timezone.now())
+
+        EmailPendente.objects.update(proxima_tentativa=timezone.now())
+        self.assertEqual(enviar_lote(conexao=ConexaoForaDoAr()), {'enviados': 0, 'reagendados': 0, 'mortos': 1})
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailPendente.MORTO)
+        self.assertEqual(email.corpo, '')
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_reenvio_gera_outro_token(self):
+        self.solicitar_recuperacao()
+        conexao = ConexaoQueFalhaNoEnvio()
+        self.assertEqual(enviar_lote(conexao=conexao), {'enviados': 0, 'reagendados': 1, 'mortos': 0})
+        perdido = conexao.corpos[0].split('\n\n')[2]
+        self.assertNotIn(perdido, EmailPendente.objects.get().corpo)
+
+        EmailPendente.objects.update(proxima_tentativa=timezone.now())
+        self.assertEqual(enviar_lote(), {'enviados': 1, 'reagendados': 0, 'mortos': 0})
+        token = mail.outbox[0].body.split('\n\n')[2]
+        self.assertIsNone(Usuario.buscar_por_token(perdido))
+        self.assertEqual(Usuario.buscar_por_token(token), self.usuario)
+
+
+
+
+class ImportacaoUsuariosTest(TestCase):
+    """
+    Importação em lote (usuarios.importacao): linhas inválidas e e-mails repetidos
+    """
+
+    def test_linhas_invalidas_e_duplicadas(self):
+        Usuario.objects.create(nome='Ja Cadastrado', email='existe@email.com', senha=SENHA)
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = Path(pasta) / 'usuarios.csv'
+            caminho.write_text(
+                'nome,email,telefone,senha\n'
+                'Ana Souza,ana@email.com,(11) 98765-4321,SenhaForte123\n'
+                'Sem Email,email-invalido,,SenhaForte123\n'
+                'Ana Repetida,ANA@email.com,,SenhaForte123\n'
+                'Outro,Existe@Email.com,,SenhaForte123\n'
+                'Bruno Lima,bruno@email.com,,SenhaForte123\n',
+                encoding='utf-8'
+            )
+            erros = []
+            totais = importar(caminho, lote=2, ao_erro=lambda numero, detalhes: erros.append(numero))
+
+        self.assertEqual(totais, {'linhas': 5, 'criados': 2, 'duplicados': 2, 'invalidos': 1})
+        self.assertEqual(erros, [3])
+        ana = Usuario.objects.get(email='ana@email.com')
+        self.assertTrue(ana.verificar_senha('SenhaForte123'))
+        self.assertEqual(ana.telefone_numeros, '11987654321')
+        self.assertTrue(Usuario.objects.filter(email='bruno@email.com').exists())
+
+    def test_formato_nao_suportado(self):
+        with self.assertRaises(ValueError):
+            importar('usuarios.txt')
+
+
+
+class PaginacaoUsuariosTest(TestCase):
+    """
+    Paginação por cursor (nome, id) da listagem de usuários
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        for indice, nome in enumerate(['Bruno', 'Ana', 'Ana', 'Carla', 'Ana', 'Bruno', 'Davi']):
+            Usuario.objects.create(nome=nome, email=f'usuario{indice}@email.com', senha=SENHA)
+        self.esperado = list(Usuario.objects.order_by('nome', 'id').values_list('id', flat=True))
+
+    def test_paginas_seguem_nome_e_id_sem_offset(self):
+        ids, paginas, url = [], [], '/usuarios/?page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as consultas:
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            self.assertNotIn('OFFSET', consultas[-1]['sql'])
+            paginas.append([usuario['id'] for usuario in resp.json()['results']])
+            ids.extend(paginas[-1])
+            url = resp.json()['next']
+        self.assertEqual(ids, self.esperado)
+        self.assertEqual(len(paginas), 4)
+
+        # voltando pelos links "previous" a partir da última página
+        voltando, url = [], resp.json()['previous']
+        while url:
+            resp = self.client.get(url)
+            voltando.insert(0, [usuario['id'] for usuario in resp.json()['results']])
+            url = resp.json()['previous']
+        self.assertEqual(voltando, paginas[:-1])
+        self.assertIsNotNone(resp.json()['next'])
+
+    def test_tamanho_maximo_e_cursor_invalido(self):
+        resp = self.client.get('/usuarios/?page_size=1000')
+        self.assertEqual(len(resp.json()['results']), 7)
+        self.assertEqual(UsuarioCursorPagination.max_page_size, 100)
+        self.assertIsNone(resp.json()['next'])
+        self.assertIsNone(resp.json()['previous'])
+
+        self.assertEqual(self.client.get('/usuarios/?cursor=invalido').status_code, 404)
+
+
+
+@override_settings(AUDITORIA_ATIVA=True, AUDITORIA_CAPACIDADE=3,
+                   AUDITORIA_TAMANHO_LOTE=100, AUDITORIA_INTERVALO_MS=600000)
+class AuditoriaTest(TestCase):
+    """
+    Buffer de auditoria (usuarios.auditoria): descarte, gravação em lote e consulta
+    """
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nome='Usuario Teste', email='teste@email.com', senha=SENHA)
+
+    def test_buffer_descarta_os_mais_antigos_e_grava_em_lote(self):
+        buffer = BufferAuditoria()
+        for tipo in (EventoAuditoria.LOGIN, EventoAuditoria.REFRESH,
+                     EventoAuditoria.SENHA_ALTERADA, EventoAuditoria.LOGIN_FALHOU):
+            buffer.registrar(tipo, usuario=self.usuario, ip='10.0.0.1')
+        self.assertEqual(buffer.descartados, 1)
+
+        # a thread só acordaria no intervalo: grava aqui
+        with self.assertNumQueries(1):
+            buffer.gravar()
+        self.assertEqual(
+            set(EventoAuditoria.objects.values_list('tipo', flat=True)),
+            {EventoAuditoria.REFRESH, EventoAuditoria.SENHA_ALTERADA, EventoAuditoria.LOGIN_FALHOU}
+        )
+
+        agora = timezone.now()
+        EventoAuditoria.objects.create(usuario=self.usuario, tipo=EventoAuditoria.LOGIN,
+                                       criado=agora - timedelta(days=2))
+        eventos = EventoAuditoria.objects.do_usuario(self.usuario.id, inicio=agora - timedelta(days=1))
+        self.assertEqual(eventos.count(), 3)
+        self.assertEqual(EventoAuditoria.objects.do_usuario(self.usuario.id).count(), 4)
+        self.assertEqual(
+            EventoAuditoria.objects.do_usuario(self.usuario.id).last().criado,
+            agora - timedelta(days=2)
+        )
+
+    def test_login_com_corpo_invalido_nao_falha(self):
+        client = APIClient()
+        with mock.patch.object(buffer_auditoria, 'registrar') as registrar:
+            resp = client.post('/usuarios/login/', ['email', 'senha'], format='json')
+            self.assertEqual(resp.status_code, 401)
+            registrar.assert_called_once_with(
+                EventoAuditoria.LOGIN_FALHOU, usuario=None, email='', ip='127.0.0.1'
+            )
+
+            resp = client.post('/usuarios/login/', {'email': 'teste@email.com', 'senha': SENHA}, format='json')
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(registrar.call_args.args, (EventoAuditoria.LOGIN,))
+
+        self.assertEqual(client.post('/usuarios/refresh/', [1], format='json').status_code, 400)
+
+
+
+@override_settings(AUDITORIA_ATIVA=False)
+class ExportacaoUsuariosTest(TestCase):
+    """
+    Exportação em streaming (GET /usuarios/exportar/): permissão e formatos
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = Usuario.objects.create(nome='Admin', email='admin@email.com', senha=SENHA,
+                                            administrador=True)
+        self.usuario = Usuario.objects.create(nome='José Álvares', email='jose@email.com', senha=SENHA,
+                                              telefone='(11) 98765-4321')
+
+    def test_somente_administradores(self):
+        self.assertEqual(self.client.get('/usuarios/exportar/').status_code, 401)
+        self.client.force_authenticate(self.usuario)
+        self.assertEqual(self.client.get('/usuarios/exportar/').status_code, 403)
+
+    def test_formatos(self):
+        self.client.force_authenticate(self.admin)
+
+        resp = self.client.get('/usuarios/exportar/?formato=csv')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        linhas = list(csv.reader(StringIO(b''.join(resp.streaming_content).decode())))
+        self.assertEqual(linhas[0], ['id', 'nome', 'email', 'telefone', 'telefone_formatado', 'criado'])
+        self.assertEqual(linhas[2][1:5], ['José Álvares', 'jose@email.com', '(11) 98765-4321', '(11) 98765-4321'])
+        self.assertTrue(linhas[2][5].endswith('Z'))
+
+        resp = self.client.get('/usuarios/exportar/?formato=ndjson')
+        registros = [json.loads(linha) for linha in b''.join(resp.streaming_content).splitlines()]
+        self.assertEqual([registro['email'] for registro in registros], ['admin@email.com', 'jose@email.com'])
+        self.assertIn('attachment; filename="usuarios.ndjson"', resp['Content-Disposition'])
+
+        self.assertEqual(self.client.get('/usuarios/exportar/?formato=xml').status_code, 400)
+
+
 if __name__ == "__main__":
     try:
         main()
@@ -1,12 +1,20 @@
 # usuarios/views.py - VERSÃO COMPLETA E CORRIGIDA
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, serializers
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from rest_framework_simplejwt.exceptions import TokenError
+from django.http import StreamingHttpResponse
 
-from usuarios.models import Usuario
+from nucleo.renderizacao import PARSERS_COM_MSGPACK, RENDERERS_COM_MSGPACK
+from tarefas.fila import enfileirar
+from tarefas.views import resposta_enfileirada
+from usuarios.auditoria import registrar_evento
+from usuarios.emails import enfileirar_email_recuperacao
+from usuarios.exportacao import FORMATOS, exportar
+from usuarios.models import Usuario, EventoAuditoria
+from usuarios.pagination import UsuarioCursorPagination
 from usuarios.serializers import (
     UsuarioSerializer,
     LoginSerializer,
@@ -23,7 +31,7 @@ class UsuarioViewSets(viewsets.ModelViewSet):
     ViewSet para gerenciamento completo de usuários
     
     Endpoints disponíveis:
-    - GET /usuarios/ - Lista usuários (público)
+    - GET /usuarios/ - Lista usuários (público, paginado por cursor, busca com ?q=)
     - GET /usuarios/{id}/ - Detalhes do usuário (público)
     - POST /usuarios/cadastro/ - Cadastro de novo usuário (público)
     - POST /usuarios/login/ - Login (público)
@@ -35,11 +43,26 @@ class UsuarioViewSets(viewsets.ModelViewSet):
     - POST /usuarios/validar-token/ - Validação de token (público)
     - POST /usuarios/redefinir-senha/ - Redefinição de senha (público)
     - POST /usuarios/{id}/alterar-senha/ - Alteração de senha (privado, apenas próprio)
+    - GET /usuarios/exportar/ - Exportação CSV/NDJSON/MessagePack em streaming (apenas administradores)
+    - POST /usuarios/exportar/ - Exportação em segundo plano, acompanhada em /jobs/{id}/ (apenas administradores)
+
+    Todos aceitam e respondem JSON ou MessagePack
+    (Content-Type/Accept: application/msgpack)
     """
     
     # QUERYSET OBRIGATÓRIO para ModelViewSet
     queryset = Usuario.objects.all().order_by('nome')
     serializer_class = UsuarioSerializer
+    pagination_class = UsuarioCursorPagination
+    renderer_classes = RENDERERS_COM_MSGPACK
+    parser_classes = PARSERS_COM_MSGPACK
+    # faixa "caro" do limite de requisições (nucleo.limites):
+    # hash de senha (PBKDF2), e-mails e busca
+    acoes_caras = {
+        'login', 'cadastro', 'esqueci_senha', 'validar_token',
+        'redefinir_senha', 'alterar_senha'
+    }
+    parametros_caros = {'q'}
     
     def get_permissions(self):
         '''
@@ -54,10 +77,27 @@ class UsuarioViewSets(viewsets.ModelViewSet):
         if self.action in public_actions:
             permission_classes = [AllowAny]
         else:
-            permission_classes = [IsAuthenticated]
+            # IsAuthenticated (padrão) ou o que a action definir
+            permission_classes = self.permission_classes
         
         return [permission() for permission in permission_classes]
     
+    def list(self, request):
+        """
+        GET /usuarios/?q=<termo>&cursor=<cursor>&page_size=<n>
+        Lista usuários paginados por cursor, com busca opcional
+        por prefixo do nome ou do e-mail
+        """
+        queryset = self.get_queryset()
+        
+        termo = request.query_params.get('q', '').strip()
+        if termo:
+            queryset = queryset.buscar(termo)
+        
+        pagina = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(pagina, many=True)
+        return self.get_paginated_response(serializer.data)
+    
     # ========== ACTIONS PÚBLICAS ==========
     
     @action(detail=False, methods=['post'],
@@ -71,11 +111,17 @@ class UsuarioViewSets(viewsets.ModelViewSet):
         serializer = CadastroSerializer(data=request.data)
         
         if serializer.is_valid():
-            usuario = serializer.save()
+            try:
+                usuario = serializer.save()
+            except serializers.ValidationError as erro:
+                # e-mail duplicado detectado pela constraint do banco
+                return Response({
+                    'erro': erro.detail
+                }, status=status.HTTP_400_BAD_REQUEST)
             return Response(
                 {
                     'mensagem': 'Usuário cadastrado com sucesso',
-                    'usuario': UsuarioSerializer(usuario).data
+                    'usuario': UsuarioSerializer(usuario, context=self.get_serializer_context()).data
                 }, 
                 status=status.HTTP_201_CREATED
             )
@@ -101,13 +147,19 @@ class UsuarioViewSets(viewsets.ModelViewSet):
             refresh = RefreshToken.for_user(usuario)
             access = refresh.access_token
             
+            registrar_evento(EventoAuditoria.LOGIN, request, usuario=usuario)
+            
             return Response({
                 'mensagem': 'Login realizado com sucesso',
-                'usuario': UsuarioSerializer(usuario).data,
+                'usuario': UsuarioSerializer(usuario, context=self.get_serializer_context()).data,
                 'access': str(access),
                 'refresh': str(refresh)
             }, status=status.HTTP_200_OK)
         
+        # o corpo pode não ser um objeto (ex: uma lista em JSON)
+        email = request.data.get('email', '') if isinstance(request.data, dict) else ''
+        registrar_evento(EventoAuditoria.LOGIN_FALHOU, request, email=str(email))
+        
         return Response({
             'erro': serializer.errors
         }, status=status.HTTP_401_UNAUTHORIZED)
@@ -120,7 +172,7 @@ class UsuarioViewSets(viewsets.ModelViewSet):
         POST /usuarios/refresh/
         Gera novo token de acesso usando refresh token
         """
-        refresh_token = request.data.get('refresh')
+        refresh_token = request.data.get('refresh') if isinstance(request.data, dict) else None
         
         if not refresh_token:
             return Response({
@@ -134,9 +186,10 @@ class UsuarioViewSets(viewsets.ModelViewSet):
             usuario = Usuario.objects.get(id=user_id)
             
             # Gerar novo token de acesso
-            from rest_framework_simplejwt.tokens import AccessToken
             new_token_access = AccessToken.for_user(usuario)
             
+            registrar_evento(EventoAuditoria.REFRESH, request, usuario=usuario)
+            
             return Response({
                 'access': str(new_token_access)
             }, status=status.HTTP_200_OK)
@@ -169,18 +222,19 @@ class UsuarioViewSets(viewsets.ModelViewSet):
             try:
                 usuario = Usuario.objects.get(email=email)
                 
-                # Gerar token de recuperação
-                token = usuario.gerar_token_recuperacao()
+                # O token é gerado no envio, feito pelo comando
+                # enviar_emails: a resposta não depende do servidor de
+                # e-mail e o token em texto puro não passa pelo banco
+                enfileirar_email_recuperacao(usuario)
                 
-                # EM PRODUÇÃO: Enviar e-mail com o token
-                # enviar_email_recuperacao(usuario.email, token, usuario.nome)
+                registrar_evento(EventoAuditoria.RECUPERACAO_SOLICITADA, request, usuario=usuario)
                 
-                return Response({
+                resposta = {
                     'mensagem': 'Se o e-mail estiver cadastrado, você receberá um link de recuperação',
                     'email': usuario.email,
-                    'token': token,  # REMOVA EM PRODUÇÃO
-                    'instrucao': 'Em produção, este token seria enviado por e-mail'
-                }, status=status.HTTP_200_OK)
+                    'instrucao': 'O token de recuperação foi enviado por e-mail'
+                }
+                return Response(resposta, status=status.HTTP_200_OK)
                 
             except Usuario.DoesNotExist:
                 # Por segurança, não revelamos se o e-mail existe
@@ -231,12 +285,13 @@ class UsuarioViewSets(viewsets.ModelViewSet):
             usuario = serializer.validated_data['usuario']
             nova_senha = serializer.validated_data['nova_senha']
             
-            # Atualizar senha
+            # Atualizar senha e limpar token de recuperação
+            # em um único UPDATE
             usuario.senha = nova_senha
+            usuario.limpar_token_recuperacao(salvar=False)
             usuario.save()
             
-            # Limpar token de recuperação
-            usuario.limpar_token_recuperacao()
+            registrar_evento(EventoAuditoria.SENHA_REDEFINIDA, request, usuario=usuario)
             
             # Gerar novos tokens JWT
             refresh = RefreshToken.for_user(usuario)
@@ -244,7 +299,7 @@ class UsuarioViewSets(viewsets.ModelViewSet):
             
             return Response({
                 'mensagem': 'Senha redefinida com sucesso',
-                'usuario': UsuarioSerializer(usuario).data,
+                'usuario': UsuarioSerializer(usuario, context=self.get_serializer_context()).data,
                 'access': str(access),
                 'refresh': str(refresh)
             }, status=status.HTTP_200_OK)
@@ -274,7 +329,7 @@ class UsuarioViewSets(viewsets.ModelViewSet):
                     'erro': 'Usuário não autenticado'
                 }, status=status.HTTP_401_UNAUTHORIZED)
             
-            serializer = UsuarioSerializer(usuario)
+            serializer = UsuarioSerializer(usuario, context=self.get_serializer_context())
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -323,10 +378,15 @@ class UsuarioViewSets(viewsets.ModelViewSet):
         )
         
         if serializer.is_valid():
-            serializer.save()
+            try:
+                serializer.save()
+            except serializers.ValidationError as erro:
+                return Response({
+                    'erro': erro.detail
+                }, status=status.HTTP_400_BAD_REQUEST)
             return Response({
                 'mensagem': 'Usuário atualizado com sucesso',
-                'usuario': UsuarioSerializer(usuario).data
+                'usuario': UsuarioSerializer(usuario, context=self.get_serializer_context()).data
             }, status=status.HTTP_200_OK)
         
         return Response({
@@ -371,9 +431,11 @@ class UsuarioViewSets(viewsets.ModelViewSet):
                 usuario.senha = nova_senha
                 usuario.save()
                 
+                registrar_evento(EventoAuditoria.SENHA_ALTERADA, request, usuario=usuario)
+                
                 return Response({
                     'mensagem': 'Senha alterada com sucesso',
-                    'usuario': UsuarioSerializer(usuario).data
+                    'usuario': UsuarioSerializer(usuario, context=self.get_serializer_context()).data
                 }, status=status.HTTP_200_OK)
             
             return Response({
@@ -383,4 +445,38 @@ class UsuarioViewSets(viewsets.ModelViewSet):
         except Usuario.DoesNotExist:
             return Response({
                 'erro': 'Usuário não encontrado'
-            }, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            }, status=status.HTTP_404_NOT_FOUND)
+    
+    # ========== ACTIONS ADMINISTRATIVAS ==========
+    
+    @action(detail=False, methods=['get', 'post'],
+            url_path='exportar',
+            permission_classes=[IsAdminUser])
+    def exportar(self, request):
+        """
+        GET /usuarios/exportar/?formato=csv|ndjson|msgpack
+        Exporta todos os usuários em streaming (memória constante).
+        Sem ?formato, MessagePack se negociado pelo Accept; senão csv
+        
+        POST /usuarios/exportar/?formato=...
+        Gera o arquivo em segundo plano (tarefa usuarios.exportar):
+        acompanhe em GET /jobs/{id}/ e baixe em GET /jobs/{id}/arquivo/
+        """
+        padrao = 'msgpack' if request.accepted_renderer.format == 'msgpack' else 'csv'
+        formato = request.query_params.get('formato', padrao)
+        
+        if formato not in FORMATOS:
+            return Response({
+                'erro': f"Formato inválido. Use {', '.join(sorted(FORMATOS))}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if request.method == 'POST':
+            tarefa = enfileirar('usuarios.exportar', {'formato': formato}, usuario=request.user)
+            return resposta_enfileirada(request, tarefa)
+        
+        resposta = StreamingHttpResponse(
+            exportar(formato),
+            content_type=FORMATOS[formato]
+        )
+        resposta['Content-Disposition'] = f'attachment; filename="usuarios.{formato}"'
+        return resposta